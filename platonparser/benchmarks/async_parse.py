@@ -0,0 +1,49 @@
+"""Throughput of many concurrent parses with a slow resolver: async_parse_file with a coroutine resolver,
+compared with running parse_file in the default thread pool of the event loop with a blocking resolver
+
+Run with: python -m platonparser.benchmarks.async_parse
+"""
+import asyncio
+import os
+import time
+
+from platonparser.parser.parser import async_parse_file, parse_file
+from platonparser.parser.utils import FullPath, base_get_location
+
+FAKE_PL = os.path.join(os.path.dirname(__file__), '../tests/fake_pl')
+LATENCY = 0.005
+PARSES = 500
+
+
+async def async_get_location(*args):
+    await asyncio.sleep(LATENCY)
+    return base_get_location(*args)
+
+
+def blocking_get_location(*args):
+    time.sleep(LATENCY)
+    return base_get_location(*args)
+
+
+async def run_async(contents, path):
+    await asyncio.gather(*(async_parse_file(contents, path, 0, async_get_location, check_mandatory_keys=False) for _ in range(PARSES)))
+
+
+async def run_threaded(contents, path):
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(loop.run_in_executor(None, lambda: parse_file(contents, path, 0, blocking_get_location, check_mandatory_keys=False))
+                           for _ in range(PARSES)))
+
+
+def main():
+    path = FullPath(0, os.path.join(FAKE_PL, 'full.pl'))
+    with open(path.path, 'rb') as file:
+        contents = file.read()
+    for name, run in (('async_parse_file', run_async), ('threads', run_threaded)):
+        start = time.perf_counter()
+        asyncio.run(run(contents, path))
+        print(f'{name:<16}: {PARSES / (time.perf_counter() - start):8.1f} parses/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Cold start cost of parse_file on one file: import time reported by python -X importtime and wall time of a fresh
+interpreter importing the parser and parsing a file, the minimum over several runs. Modules imported with
+importlib.import_module (as parser modules are) are not reported by -X importtime, only their own imports are.
+
+Run with: python -m platonparser.benchmarks.cold_start
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+RUNS = 10
+TOP = 8
+
+SNIPPET = '''
+from platonparser.parser.parser import parse_file
+from platonparser.parser.utils import FullPath, base_get_location
+with open({path!r}, 'rb') as file:
+    parse_file(file.read(), FullPath(0, {path!r}), 0, base_get_location, check_mandatory_keys=False)
+'''
+
+
+def importtime(stderr: str) -> dict:
+    """Cumulative import time in microseconds of the modules imported at top level, by module"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name[1:].startswith(' '):
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'exercise.pl')
+        with open(path, 'w') as file:
+            file.write('title = Exercise\ntext ==\nSome text\n==\nform =: CodeEditor\n')
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.getcwd(), os.environ.get('PYTHONPATH')])))
+        best_wall, best_modules = None, None
+        for _ in range(RUNS):
+            start = time.perf_counter()
+            process = subprocess.run([sys.executable, '-X', 'importtime', '-c', SNIPPET.format(path=path)], env=env,
+                                     capture_output=True, text=True, check=True)
+            wall = time.perf_counter() - start
+            modules = importtime(process.stderr)
+            if best_modules is None or sum(modules.values()) < sum(best_modules.values()):
+                best_modules = modules
+            best_wall = wall if best_wall is None else min(best_wall, wall)
+    print(f'wall time of the interpreter: {best_wall * 1e3:6.1f} ms')
+    print(f'import time:                  {sum(best_modules.values()) / 1e3:6.1f} ms, of which:')
+    for name, cumulative in sorted(best_modules.items(), key=lambda item: -item[1])[:TOP]:
+        print(f'    {name:<40} {cumulative / 1e3:6.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
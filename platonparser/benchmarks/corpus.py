@@ -0,0 +1,29 @@
+"""Synthetic lines of a single .pl file used by the benchmarks (synthetic_lines). Generated corpora of exercises
+extending templates are in tests.generators"""
+import random
+from typing import List
+
+
+def synthetic_lines(count: int, seed: int = 0) -> List[str]:
+    """Returns count lines of a .pl file using the most common kinds of lines, without any
+    line referencing another file"""
+    rand = random.Random(seed)
+    lines = []
+    while len(lines) < count:
+        key = f'key{rand.randrange(1000)}.sub{rand.randrange(10)}'
+        choice = rand.random()
+        if choice < 0.4:
+            lines.append(f'{key} = value {rand.randrange(1000)}')
+        elif choice < 0.5:
+            lines.append(f'{key} % {{"a": {rand.randrange(100)}, "b": [1, 2, 3]}}')
+        elif choice < 0.6:
+            lines.append(f'# comment {rand.randrange(1000)}')
+        elif choice < 0.7:
+            lines.append('')
+        elif choice < 0.8:
+            lines.append(f'{key} =: CodeEditor')
+        else:
+            lines.append(f'{key} ==')
+            lines.extend(f'    print({i})' for i in range(rand.randrange(1, 10)))
+            lines.append('==')
+    return lines
@@ -0,0 +1,57 @@
+"""Parse time and peak memory of exercises extending the last template of a chain of templates, each one extending
+the previous one and overriding some of its keys, with the outputs of the templates shared in a TemplateCache.
+Outputs are flattened (the default) or kept layered over the outputs of the templates (layered=True).
+
+Run with: python -m platonparser.benchmarks.layered
+"""
+import time
+import tracemalloc
+
+import platonparser.parsers.pl as pl
+from platonparser.parser.cache import TemplateCache
+from platonparser.parser.utils import FullPath, LocationResult
+
+DEPTH = 10
+KEYS = 200
+EXERCISES = 50
+REPEATS = 5
+
+
+def template(level: int) -> str:
+    lines = [f'extends=template{level - 1}.pl'] if level else []
+    for i in range(KEYS):
+        if level == 0 or i % DEPTH == level:
+            lines.append(f'section{i % 20}.key{i}.value = {level}')
+            lines.append(f'section{i % 20}.key{i}.list % [{i}, {level}, "{"x" * 20}"]')
+    return '\n'.join(lines)
+
+
+def main():
+    files = {f'template{level}.pl': template(level).encode() for level in range(DEPTH)}
+    get_location = lambda uri, *_: LocationResult(files[uri], FullPath(0, uri), 0)
+    contents = f'extends=template{DEPTH - 1}.pl\nsection0.key0.value = exercise\n'.encode()
+    parse = lambda i, **options: pl.PLParser(contents, FullPath(0, f'exercise{i}.pl'), 0, get_location,
+                                             check_mandatory_keys=False, **options).parse()
+
+    best = min(timed(lambda: [parse(i) for i in range(EXERCISES)]) for _ in range(REPEATS))
+    print(f'without cache:            {best / EXERCISES * 1e3:7.3f} ms per exercise')
+    for layered in (False, True):
+        cache = TemplateCache()
+        parse(0, template_cache=cache)
+        best = min(timed(lambda: [parse(i, template_cache=cache, layered=layered) for i in range(EXERCISES)]) for _ in range(REPEATS))
+        tracemalloc.start()
+        outputs = [parse(i, template_cache=cache, layered=layered) for i in range(EXERCISES)]
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f'with cache, layered={layered!s:<5}: {best / EXERCISES * 1e3:7.3f} ms per exercise, '
+              f'peak memory {peak / 2 ** 20:6.2f} MiB for {len(outputs)} outputs')
+
+
+def timed(function) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Parse time of exercises extending a template full of large code blocks and JSON values, half of them being
+overridden by the exercises, with eager and lazy evaluation. Also compares the time to evaluate the code blocks
+with ast.literal_eval always tried, as before, and with evaluate_literal.
+
+Run with: python -m platonparser.benchmarks.lazy_values
+"""
+from ast import literal_eval
+import json
+import time
+
+import platonparser.parsers.pl as pl
+from platonparser.parser.utils import FullPath, LocationResult
+
+BLOCKS = 40
+BLOCK_LINES = 200
+EXERCISES = 20
+
+
+def template() -> str:
+    lines = []
+    for i in range(BLOCKS):
+        lines.append(f'code{i} ==')
+        lines.extend(f'    result_{j} = compute({j}, "{i}")' for j in range(BLOCK_LINES))
+        lines.append('==')
+        lines.append(f'json{i} %= ')
+        lines.append(json.dumps({f'k{j}': [j, str(j), {'v': j}] for j in range(BLOCK_LINES)}))
+        lines.append('==')
+    return '\n'.join(lines)
+
+
+def exercise() -> bytes:
+    lines = ['extends=template.pl']
+    lines.extend(f'code{i}=overridden\njson{i}%{{"overridden": true}}' for i in range(0, BLOCKS, 2))
+    return '\n'.join(lines).encode()
+
+
+def main():
+    files = {'template.pl': template().encode()}
+    get_location = lambda uri, *_: LocationResult(files[uri], FullPath(0, uri), 0)
+    contents = exercise()
+    for lazy in (False, True):
+        start = time.perf_counter()
+        for i in range(EXERCISES):
+            pl.PLParser(contents, FullPath(0, f'exercise{i}.pl'), 0, get_location, check_mandatory_keys=False, lazy=lazy).parse()
+        print(f'lazy={lazy!s:<5}: {(time.perf_counter() - start) / EXERCISES * 1e3:7.2f} ms per exercise')
+
+    blocks = [''.join(f'    result_{j} = compute({j}, "{i}")' for j in range(BLOCK_LINES)) for i in range(BLOCKS)]
+    start = time.perf_counter()
+    for block in blocks:
+        try:
+            literal_eval(block)
+        except (ValueError, TypeError, SyntaxError):
+            pass
+    middle = time.perf_counter()
+    for block in blocks:
+        pl.evaluate_literal(block)
+    end = time.perf_counter()
+    print(f'code blocks: literal_eval {(middle - start) * 1e3:7.2f} ms, evaluate_literal {(end - middle) * 1e3:7.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
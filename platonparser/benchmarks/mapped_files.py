@@ -0,0 +1,39 @@
+"""Peak memory allocated while parsing a file loading a large payload many times with =@,
+with base_get_location and with MappedFileResolver
+
+Run with: python -m platonparser.benchmarks.mapped_files
+"""
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import platonparser.parsers.pl as pl
+from platonparser.parser.resolvers import MappedFileResolver
+from platonparser.parser.utils import FullPath, base_get_location
+
+PAYLOAD_SIZE = 20 * 2**20
+REFERENCES = 5
+
+
+def main():
+    tmp = tempfile.mkdtemp()
+    try:
+        with open(os.path.join(tmp, 'payload.txt'), 'wb') as file:
+            file.write(b'x' * PAYLOAD_SIZE)
+        contents = ''.join(f'k{i}=@payload.txt\n' for i in range(REFERENCES)).encode()
+        for name, get_location in (('base_get_location', base_get_location), ('MappedFileResolver', MappedFileResolver())):
+            tracemalloc.start()
+            start = time.perf_counter()
+            pl.PLParser(contents, FullPath(0, os.path.join(tmp, 'a.pl')), 0, get_location, check_mandatory_keys=False).parse()
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f'{name:<18}: peak {peak / 2**20:7.1f} MiB, {elapsed * 1e3:7.1f} ms')
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""Memory kept by the outputs of a large corpus of exercises held resident, measured with tracemalloc, with comments
+and warnings collected (the default) or not.
+
+Run with: python -m platonparser.benchmarks.memory
+"""
+import gc
+import tracemalloc
+
+import platonparser.parsers.pl as pl
+from platonparser.benchmarks.corpus import synthetic_lines
+from platonparser.parser.utils import FullPath
+
+EXERCISES = 5000
+LINES = 100
+
+
+def corpus():
+    """Contents of the exercises, the last lines of each one overwriting keys of its first lines"""
+    for i in range(EXERCISES):
+        lines = synthetic_lines(LINES, seed=i)
+        lines += [line for line in lines[:LINES // 4] if ' = ' in line]
+        yield '\n'.join(lines).encode()
+
+
+def main():
+    contents = list(corpus())
+    get_location = lambda uri, *_: None
+    for options in ({}, {'collect_comments': False, 'collect_warnings': False}):
+        gc.collect()
+        tracemalloc.start()
+        outputs = [pl.PLParser(file, FullPath(0, f'exercise{i}.pl'), 0, get_location, check_mandatory_keys=False, **options).parse()
+                   for i, file in enumerate(contents)]
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        comments = sum(len(output.comments) for output in outputs)
+        warnings = sum(len(output.warnings) for output in outputs)
+        print(f'{str(options or "default"):<58}: {size / 2 ** 20:7.2f} MiB for {len(outputs)} outputs '
+              f'({comments} comments, {warnings} warnings)')
+        del outputs
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""Overhead of the parse metrics: time of parsing the exercises of a generated corpus (see tests.generators.generate_corpus)
+without metrics, then with a ParseMetrics shared by every parse, whose measures are printed in the Prometheus text
+format. To measure the cost of the disabled hook itself, run it on a checkout without metrics as well and compare the
+first times.
+
+Run with: python -m platonparser.benchmarks.metrics
+"""
+import time
+
+from platonparser.tests.generators import generate_corpus
+from platonparser.parser.parser import parse_file
+from platonparser.parser.utils import FullPath
+
+REPEATS = 5
+OPTIONS = {'check_mandatory_keys': False}
+
+
+def main():
+    corpus = generate_corpus()
+    print(f'{len(corpus.exercises)} exercises, {len(corpus.templates)} templates')
+
+    def parse_all(**options):
+        for path in corpus.exercises:
+            parse_file(corpus.files[path], FullPath(0, path), 0, corpus.get_location, **OPTIONS, **options)
+
+    disabled = min(timed(parse_all) for _ in range(REPEATS))
+    print(f'without metrics: {disabled * 1e3:8.1f} ms')
+    try:
+        from platonparser.parser.metrics import ParseMetrics, to_prometheus
+    except ImportError:
+        return
+    metrics = ParseMetrics()
+    enabled = min(timed(lambda: parse_all(metrics=metrics)) for _ in range(REPEATS))
+    print(f'with metrics   : {enabled * 1e3:8.1f} ms ({(enabled / disabled - 1) * 100:+.1f} %)')
+    print(to_prometheus(metrics), end='')
+
+
+def timed(function) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    main()
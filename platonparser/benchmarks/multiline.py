@@ -0,0 +1,23 @@
+"""Time spent parsing a single multiline block, per line, for blocks of growing size.
+The time per line should stay the same whatever the size of the block.
+
+Run with: python -m platonparser.benchmarks.multiline
+"""
+import time
+
+import platonparser.parsers.pl as pl
+from platonparser.parser.utils import FullPath, base_get_location
+
+
+def main():
+    for count in (10_000, 100_000, 1_000_000):
+        contents = ('block ==\n' + ''.join(f'line {i} of the block\n' for i in range(count)) + '==\n').encode()
+        parser = pl.PLParser(contents, FullPath(0, 'multiline.pl'), 0, base_get_location, check_mandatory_keys=False)
+        start = time.perf_counter()
+        parser.parse()
+        elapsed = time.perf_counter() - start
+        print(f'{count:>9,} lines: {elapsed:8.3f} s, {elapsed / count * 1e9:6.0f} ns/line')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Lines per second of the line classification, compared with the former chain of regexes
+
+Run with: python -m platonparser.benchmarks.parse_line
+"""
+import re
+import time
+
+import platonparser.parsers.pl as pl
+from platonparser.parser.utils import FullPath, base_get_location
+from platonparser.benchmarks.corpus import synthetic_lines
+
+
+# The grammar as it was before classify_line, frozen here so that later changes of the grammar of pl.py do not
+# change the baseline
+BAD_CHAR = r''.join(['/', ' ', '\t', '\n', ';', '#', '+', '&'])
+KEY = r'^(?P<key>[a-zA-Z_][a-zA-Z0-9_\.]*)\s*'
+COMMENT = r'(?P<comment>#.*)'
+VALUE = r'(?P<value>[^=@%#][^#]*?)\s*'
+FILE = r'(?P<file>([a-zA-Z0-9_]*:)?((\/)?[^' + \
+    BAD_CHAR + r']+)(\/[^' + BAD_CHAR + r']+)*)\s*'
+ALIAS = r'((\[\s*(?P<alias>[a-zA-Z_.][a-zA-Z0-9_.]*)\s*\])\s*?)?'
+
+COMPONENT_LINE = re.compile(
+    KEY + r'\s*(?P<operator>=:)\s*(?P<component>\w+)\s*' + COMMENT + r'?$')
+URL_LINE = re.compile(
+    KEY + r'(?P<operator>=\$)\s*' + FILE + COMMENT + r'?$')
+ONE_LINE = re.compile(
+    KEY + r'(?P<operator>=|\%|\+|\-)\s*' + VALUE + COMMENT + r'?$')
+FROM_FILE_LINE = re.compile(
+    KEY + r'(?P<operator>=@|\+=@|\-=@|\%@|\+@|\-@)\s*' + FILE + COMMENT + r'?$')
+EXTENDS_LINE = re.compile(
+    r'(extends|template)\s*=\s*' + FILE + COMMENT + r'?$')
+MULTI_LINE = re.compile(
+    KEY + r'(?P<operator>==|\+=|\-=|\%=)\s*' + COMMENT + r'?$')
+DEPENDENCY_FILE_LINE = re.compile(r'@\s*' + FILE + ALIAS + COMMENT + r'?$')
+COMMENT_LINE = re.compile(r'\s*' + COMMENT + r'$')
+EMPTY_LINE = re.compile(r'\s*$')
+
+
+def legacy_classify_line(line: str):
+    """Classification as done before classify_line: every pattern tried in order, and matched twice"""
+    if EXTENDS_LINE.match(line): return 'extends', EXTENDS_LINE.match(line)
+    elif FROM_FILE_LINE.match(line): return 'from_file', FROM_FILE_LINE.match(line)
+    elif URL_LINE.match(line): return 'url', URL_LINE.match(line)
+    elif COMPONENT_LINE.match(line): return 'component', COMPONENT_LINE.match(line)
+    elif DEPENDENCY_FILE_LINE.match(line): return 'dependency', DEPENDENCY_FILE_LINE.match(line)
+    elif COMMENT_LINE.match(line): return 'comment', COMMENT_LINE.match(line)
+    elif ONE_LINE.match(line): return 'one_line', ONE_LINE.match(line)
+    elif MULTI_LINE.match(line): return 'multi_line', MULTI_LINE.match(line)
+    elif EMPTY_LINE.match(line): return 'empty', EMPTY_LINE.match(line)
+    return None, None
+
+
+def lines_per_second(classify, lines, repeat=5) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            classify(line)
+        best = min(best, time.perf_counter() - start)
+    return len(lines) / best
+
+
+def main():
+    lines = synthetic_lines(100_000)
+    before = lines_per_second(legacy_classify_line, lines)
+    after = lines_per_second(pl.classify_line, lines)
+    print(f'chain of regexes: {before:,.0f} lines/s')
+    print(f'classify_line:    {after:,.0f} lines/s ({after / before:.2f}x)')
+
+    contents = '\n'.join(lines).encode()
+    start = time.perf_counter()
+    pl.PLParser(contents, FullPath(0, 'synthetic.pl'), 0, base_get_location, check_mandatory_keys=False).parse()
+    print(f'PLParser.parse:   {len(lines) / (time.perf_counter() - start):,.0f} lines/s')
+
+
+if __name__ == '__main__':
+    main()
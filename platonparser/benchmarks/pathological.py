@@ -0,0 +1,29 @@
+"""Time taken to classify hostile lines, made of long runs of the characters the grammar quantifies over.
+The time per character should stay the same whatever the length of the lines.
+
+Run with: python -m platonparser.benchmarks.pathological
+"""
+import time
+
+import platonparser.parsers.pl as pl
+from platonparser.tests.generators import pathological_lines
+
+
+def slowest_line(length: int):
+    """Returns the longest time spent classifying one of the pathological lines of the given length, and that line"""
+    slowest = (0.0, '')
+    for line in pathological_lines(length):
+        start = time.perf_counter()
+        pl.classify_line(line)
+        slowest = max(slowest, (time.perf_counter() - start, line))
+    return slowest
+
+
+def main():
+    for length in (1_000, 10_000, 100_000):
+        elapsed, line = slowest_line(length)
+        print(f'{length:>7,} characters: slowest line {elapsed * 1e3:8.3f} ms, {elapsed / length * 1e9:6.0f} ns/char ({line[:12]!r}...)')
+
+
+if __name__ == '__main__':
+    main()
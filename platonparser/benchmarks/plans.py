@@ -0,0 +1,40 @@
+"""Time of parsing again files already parsed, with their parse plans (see pl.ParsePlan) compiled again or taken
+from a PlanCache: exercises of synthetic lines extending a shared template, as in a serving path.
+
+Run with: python -m platonparser.benchmarks.plans
+"""
+import time
+
+import platonparser.parsers.pl as pl
+from platonparser.benchmarks.corpus import synthetic_lines
+from platonparser.parser.cache import PlanCache, TemplateCache
+from platonparser.parser.utils import FullPath, LocationResult
+
+EXERCISES = 200
+LINES = 200
+REPEATS = 5
+
+
+def main():
+    template = '\n'.join(synthetic_lines(LINES, seed=-1)).encode()
+    get_location = lambda uri, *_: LocationResult(template, FullPath(0, uri), 0)
+    exercises = [('extends=template.pl\n' + '\n'.join(synthetic_lines(LINES, seed=i))).encode() for i in range(EXERCISES)]
+
+    for name, plan_cache in (('plans compiled', None), ('plans from a PlanCache', PlanCache(2 * EXERCISES))):
+        template_cache = TemplateCache()
+        parse = lambda: [pl.PLParser(file, FullPath(0, f'exercise{i}.pl'), 0, get_location, check_mandatory_keys=False,
+                                     template_cache=template_cache, plan_cache=plan_cache).parse()
+                         for i, file in enumerate(exercises)]
+        parse()
+        best = min(timed(parse) for _ in range(REPEATS))
+        print(f'{name:<23}: {best / EXERCISES * 1e3:6.3f} ms per exercise')
+
+
+def timed(function) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    main()
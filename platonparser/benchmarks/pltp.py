@@ -0,0 +1,63 @@
+"""Parse time of an activity of 200 exercises inheriting a common template, resolved by a get_location taking
+LATENCY seconds per call (a remote store), compared to the parse time of its slowest exercise alone.
+Exercises are parsed by a pool of threads: the latencies of their get_location calls overlap, while the time spent
+parsing lines stays sequential (GIL): the row without latency is the floor of the concurrent parse. The last rows parse
+the exercises in a pool of processes (processes=True, one per CPU), in parallel: the time spent parsing lines is divided
+by the number of CPUs, but each process resolves the files of its exercises one after the other.
+
+Run with: python -m platonparser.benchmarks.pltp
+"""
+import os
+import tempfile
+import time
+
+from platonparser.parser.utils import FullPath, base_get_location
+from platonparser.parsers.pl import PLParser
+from platonparser.parsers.pltp import PLTPParser
+
+EXERCISES = 200
+LATENCY = 0.01
+REPEATS = 3
+
+
+def slow_get_location(*args):
+    time.sleep(LATENCY)
+    return base_get_location(*args)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, 'template.pl'), 'w') as f:
+            f.write('title=Template\ntext==\nShared statement\n==\n' + ''.join(f'key{i}=value{i}\n' for i in range(200)))
+        lines = ['title=Activity', 'introduction=Introduction']
+        for i in range(EXERCISES):
+            with open(os.path.join(directory, f'exercise{i}.pl'), 'w') as f:
+                f.write(f'extends=template.pl\nnumber={i}\n' + ''.join(f'own{j}={j}\n' for j in range(100)))
+            lines.append(f'@ exercise{i}.pl')
+        contents = '\n'.join(lines).encode()
+        path = FullPath(0, os.path.join(directory, 'activity.pltp'))
+
+        exercise = slow_get_location('exercise0.pl', directory, 0, 0)
+        single = min(timed(lambda: PLParser(exercise.file, exercise.path, 0, slow_get_location, check_mandatory_keys=False).parse())
+                     for _ in range(REPEATS))
+        print(f'{EXERCISES} exercises, get_location latency {LATENCY * 1e3:.0f} ms')
+        print(f'{"one exercise":<21}: {single * 1e3:8.1f} ms')
+        for name, workers, get_location, processes in (('sequential', 1, slow_get_location, False),
+                                                       ('concurrent', None, slow_get_location, False),
+                                                       ('no latency', None, base_get_location, False),
+                                                       ('processes', None, slow_get_location, True),
+                                                       ('processes, no latency', None, base_get_location, True)):
+            best = min(timed(lambda: PLTPParser(contents, path, 0, get_location, check_mandatory_keys=False,
+                                                max_workers=workers, processes=processes).parse())
+                       for _ in range(REPEATS))
+            print(f'{name:<21}: {best * 1e3:8.1f} ms')
+
+
+def timed(function) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""Parse time of a file referencing many other files with a slow resolver, with and without prefetching
+
+Run with: python -m platonparser.benchmarks.prefetch
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import platonparser.parsers.pl as pl
+from platonparser.parser.utils import FullPath, base_get_location
+
+FAKE_PL = os.path.join(os.path.dirname(__file__), '../tests/fake_pl')
+LATENCY = 0.005
+
+
+def slow_get_location(uri: str, working_directory: str, resource_id: int, circle_id: int):
+    """base_get_location with the latency of a round-trip to a storage"""
+    time.sleep(LATENCY)
+    return base_get_location(uri, working_directory, resource_id, circle_id)
+
+
+def main():
+    filenames = sorted(filename for filename in os.listdir(FAKE_PL) if filename.endswith('.pl'))[:15]
+    contents = ''.join(f'key{i}=@{filename}\n' for i, filename in enumerate(filenames)).encode()
+    path = FullPath(0, os.path.join(FAKE_PL, 'prefetch.pl'))
+    start = time.perf_counter()
+    pl.PLParser(contents, path, 0, slow_get_location, check_mandatory_keys=False).parse()
+    print(f'sequential resolution: {(time.perf_counter() - start) * 1e3:6.1f} ms')
+    with ThreadPoolExecutor(16) as executor:
+        start = time.perf_counter()
+        pl.PLParser(contents, path, 0, slow_get_location, check_mandatory_keys=False, prefetch_executor=executor).parse()
+        print(f'prefetched:            {(time.perf_counter() - start) * 1e3:6.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Round-trips and parse time for an inheritance chain stored in SQLite, resolved one URI at a time or in batches.
+A latency is added to every query to simulate a remote storage.
+
+Run with: python -m platonparser.benchmarks.resolvers
+"""
+import time
+
+import platonparser.parsers.pl as pl
+from platonparser.parser.resolvers import SQLiteResolver
+from platonparser.parser.utils import FullPath
+
+LATENCY = 0.002
+DEPTH = 5
+REFERENCES = 10
+
+
+class RemoteSQLiteResolver(SQLiteResolver):
+    def fetch(self, paths):
+        time.sleep(LATENCY)
+        return super().fetch(paths)
+
+
+def build_resolver() -> RemoteSQLiteResolver:
+    """Templates /t0.pl extends /t1.pl ... extends /t{DEPTH - 1}.pl, each loading REFERENCES files"""
+    resolver = RemoteSQLiteResolver()
+    for level in range(DEPTH):
+        lines = [f'extends=t{level + 1}.pl'] if level + 1 < DEPTH else []
+        for i in range(REFERENCES):
+            resolver.add_file(0, f'/data/{level}_{i}.txt', b'x' * 1000)
+            lines.append(f'k{level}_{i}=@data/{level}_{i}.txt')
+        resolver.add_file(0, f'/t{level}.pl', '\n'.join(lines).encode())
+    return resolver
+
+
+def main():
+    resolver = build_resolver()
+    contents = resolver('t0.pl', '/', 0, 0).file
+    single = lambda *args: resolver(*args)
+    for name, get_location in (('one URI at a time', single), ('batches', resolver)):
+        resolver.queries = 0
+        start = time.perf_counter()
+        pl.PLParser(contents, FullPath(0, '/t0.pl'), 0, get_location, check_mandatory_keys=False).parse()
+        print(f'{name:<18}: {resolver.queries:3} queries, {(time.perf_counter() - start) * 1e3:6.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Encode and decode time and size of a large parser output: asdict + JSON (as in test.py) against to_bytes / from_bytes.
+
+Run with: python -m platonparser.benchmarks.serialization
+"""
+from dataclasses import asdict
+import json
+import time
+
+import platonparser.parsers.pl as pl
+from platonparser.benchmarks.corpus import synthetic_lines
+from platonparser.parser.utils import FullPath, LocationResult, ParserOutput
+
+LINES = 20000
+DEPENDENCIES = 100
+REPEATS = 10
+
+
+class SetEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, set):
+            return list(obj)
+        return json.JSONEncoder.default(self, obj)
+
+
+def main():
+    lines = synthetic_lines(LINES)
+    lines += [f'@ lib{i}.py' for i in range(DEPENDENCIES)]
+    get_location = lambda uri, *_: LocationResult(b'', FullPath(0, uri), 0)
+    output = pl.PLParser('\n'.join(lines).encode(), FullPath(0, 'exercise.pl'), 0, get_location, check_mandatory_keys=False).parse()
+
+    paths = {
+        'asdict + json (indent=2)': (lambda: json.dumps(asdict(output), indent=2, cls=SetEncoder), json.loads),
+        'asdict + json': (lambda: json.dumps(asdict(output), cls=SetEncoder), json.loads),
+        'to_bytes / from_bytes': (output.to_bytes, ParserOutput.from_bytes),
+    }
+    for name, (encode, decode) in paths.items():
+        encoded = encode()
+        encode_time = min(timed(encode) for _ in range(REPEATS))
+        decode_time = min(timed(lambda: decode(encoded)) for _ in range(REPEATS))
+        print(f'{name:<25}: encode {encode_time * 1e3:7.2f} ms, decode {decode_time * 1e3:7.2f} ms, '
+              f'{len(encoded) / 2 ** 10:8.1f} KiB')
+    decoded = ParserOutput.from_bytes(output.to_bytes())
+    assert decoded == output and all(type(path) is FullPath for path, _ in decoded.dependencies)
+
+
+def timed(function) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    main()
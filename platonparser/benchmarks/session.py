@@ -0,0 +1,42 @@
+"""Time to update the output of a 5000 lines file after single line edits, with a PLSession and with a full parse.
+
+Run with: python -m platonparser.benchmarks.session
+"""
+import random
+import statistics
+import time
+
+import platonparser.parsers.pl as pl
+from platonparser.benchmarks.corpus import synthetic_lines
+from platonparser.parser.session import PLSession
+from platonparser.parser.utils import FullPath
+
+LINES = 5000
+EDITS = 1000
+
+
+def main():
+    lines = synthetic_lines(LINES)
+    path = FullPath(0, 'session.pl')
+    session = PLSession('\n'.join(lines).encode(), path, 0, None, check_mandatory_keys=False)
+    session.parse()
+    rand = random.Random(0)
+    editable = [i for i, line in enumerate(lines) if ' = value ' in line]
+    times = []
+    for _ in range(EDITS):
+        line = rand.choice(editable)
+        column = len(session.lines[line])
+        start = time.perf_counter()
+        session.edit(line, column, line, column, str(rand.randrange(10)))
+        times.append(time.perf_counter() - start)
+    times.sort()
+    print(f'session edit: median {statistics.median(times) * 1e3:.3f} ms, 99th percentile {times[int(len(times) * 0.99)] * 1e3:.3f} ms')
+
+    start = time.perf_counter()
+    expected = pl.PLParser(session.text.encode(), path, 0, None, check_mandatory_keys=False).parse()
+    print(f'full parse:   {(time.perf_counter() - start) * 1e3:.3f} ms')
+    assert expected == session.output
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Peak memory and time of parsing a large generated file read as a whole then parsed, or streamed from disk by
+parse_file_stream. Its lines keep overwriting the same keys, so that the output stays small and the peak is made of
+what parse stages before parsing: the bytes of the file, their decoded text and its list of lines.
+
+Run with: python -m platonparser.benchmarks.streaming
+"""
+import os
+import tempfile
+import time
+import tracemalloc
+
+from platonparser.parser.parser import parse_file, parse_file_stream
+from platonparser.parser.utils import FullPath, base_get_location
+
+LINES = 200_000
+KEYS = 100
+REPEATS = 3
+OPTIONS = {'check_mandatory_keys': False, 'collect_warnings': False}
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        path = FullPath(0, os.path.join(directory, 'generated.pl'))
+        with open(path.path, 'w') as file:
+            for i in range(LINES):
+                if i % 1000 == 0:
+                    file.write('text==\n' + 'Statement line\n' * 100 + '==\n')
+                file.write(f'key{i % KEYS}="value {i} {"x" * 60}"\n')
+        print(f'{os.path.getsize(path.path) / 2 ** 20:.1f} MiB file, {LINES} lines')
+
+        def whole():
+            with open(path.path, 'rb') as file:
+                return parse_file(file.read(), path, 0, base_get_location, **OPTIONS)
+
+        def streamed():
+            with open(path.path, 'rb') as file:
+                return parse_file_stream(file, path, 0, base_get_location, **OPTIONS)
+
+        assert whole() == streamed()
+        for name, function in (('whole file', whole), ('streamed', streamed)):
+            best = min(timed(function) for _ in range(REPEATS))
+            tracemalloc.start()
+            function()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f'{name:<10}: {best * 1e3:8.1f} ms, peak {peak / 2 ** 20:7.2f} MiB')
+
+
+def timed(function) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    main()
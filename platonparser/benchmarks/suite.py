@@ -0,0 +1,196 @@
+"""Benchmarks of the hot paths of the parser on a generated corpus (see tests.generators.generate_corpus), reporting for each
+of them throughput, latency percentiles and peak memory, printed and written to a JSON results file so that runs
+can be compared.
+
+Each benchmark yields the operations to measure one at a time, whatever they need being prepared between them,
+outside of the measures. Every operation is timed on its own (so latencies include the overhead of the timer, about
+a hundred nanoseconds), then the benchmark is run once more under tracemalloc: the peak memory of a benchmark is the
+largest amount of memory allocated during one of its operations (Python 3.9+).
+
+Run with: python -m platonparser.benchmarks.suite [-o results.json] [--only parse_file ...]
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from copy import deepcopy
+from dataclasses import asdict
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, List, Sequence
+
+import platonparser.parsers.pl as pl
+from platonparser.tests.generators import Corpus, CorpusSpec, generate_corpus
+from platonparser.parser.cache import TemplateCache
+from platonparser.parser.parser import parse_file
+from platonparser.parser.utils import FullPath, recursive_update
+
+PERCENTILES = (50, 90, 99)
+
+
+def new_parser(corpus: Corpus, path: str, **options) -> pl.PLParser:
+    return pl.PLParser(corpus.files[path], FullPath(0, path), 0, corpus.get_location, check_mandatory_keys=False, **options)
+
+
+def bench_parse_line(corpus: Corpus) -> Iterator[Callable[[], Any]]:
+    """PLParser.parse_line on every line of the exercises, in order (extends lines excluded)"""
+    for path in corpus.exercises:
+        parser = new_parser(corpus, path)
+        for line in str(corpus.files[path], encoding='utf-8').split('\n'):
+            if not line.startswith('extends'):
+                yield partial(parser.parse_line, line)
+
+
+def bench_end_multi_line(corpus: Corpus) -> Iterator[Callable[[], Any]]:
+    """PLParser.end_multi_line (through multi_line_end_match) on every multiline block of the exercises"""
+    for path in corpus.exercises:
+        parser = new_parser(corpus, path)
+        for kind, match, _, _ in pl.compile_plan(str(corpus.files[path], encoding='utf-8').split('\n')).steps:
+            if kind == 'multi_line':
+                parser.multi_line_match(match)
+            elif kind == 'multi_line_end':
+                yield partial(parser.multi_line_end_match, match)
+
+
+def extends_line_match(corpus: Corpus, template_cache: TemplateCache = None) -> Iterator[Callable[[], Any]]:
+    for path in corpus.exercises:
+        contents = str(corpus.files[path], encoding='utf-8')
+        if not contents.startswith('extends'): continue
+        _, match = pl.classify_line(contents.split('\n', 1)[0])
+        yield partial(new_parser(corpus, path, template_cache=template_cache).extends_line_match, match)
+
+
+def bench_extends_line_match(corpus: Corpus) -> Iterator[Callable[[], Any]]:
+    """PLParser.extends_line_match on the extends line of every exercise, parsing its whole chain of templates"""
+    return extends_line_match(corpus)
+
+
+def bench_extends_line_match_cached(corpus: Corpus) -> Iterator[Callable[[], Any]]:
+    """PLParser.extends_line_match on the extends line of every exercise, with a TemplateCache shared by all of them"""
+    return extends_line_match(corpus, TemplateCache())
+
+
+def bench_recursive_update(corpus: Corpus) -> Iterator[Callable[[], Any]]:
+    """recursive_update of a copy of the data of the parent template of every exercise with the data of the exercise"""
+    outputs = {path: new_parser(corpus, path, layered=False).parse().data for path in corpus.templates + corpus.exercises}
+    for path in corpus.exercises:
+        contents = str(corpus.files[path], encoding='utf-8')
+        if not contents.startswith('extends'): continue
+        parent = corpus.get_location(contents.split('\n', 1)[0].split('=', 1)[1].strip(), '/corpus', 0, 0).path.path
+        yield partial(recursive_update, deepcopy(outputs[parent]), outputs[path])
+
+
+def bench_parse_file(corpus: Corpus) -> Iterator[Callable[[], Any]]:
+    """parse_file on every exercise, parsing its whole chain of templates"""
+    for path in corpus.exercises:
+        yield partial(parse_file, corpus.files[path], FullPath(0, path), 0, corpus.get_location, check_mandatory_keys=False)
+
+
+def bench_parse_file_cached(corpus: Corpus) -> Iterator[Callable[[], Any]]:
+    """parse_file on every exercise, with a TemplateCache shared by all of them"""
+    cache = TemplateCache()
+    for path in corpus.exercises:
+        yield partial(parse_file, corpus.files[path], FullPath(0, path), 0, corpus.get_location, check_mandatory_keys=False,
+                      template_cache=cache)
+
+
+BENCHMARKS: Dict[str, Callable[[Corpus], Iterator[Callable[[], Any]]]] = {
+    'parse_line': bench_parse_line,
+    'end_multi_line': bench_end_multi_line,
+    'extends_line_match': bench_extends_line_match,
+    'extends_line_match_cached': bench_extends_line_match_cached,
+    'recursive_update': bench_recursive_update,
+    'parse_file': bench_parse_file,
+    'parse_file_cached': bench_parse_file_cached,
+}
+
+
+def percentile(samples: Sequence[float], p: float) -> float:
+    """Nearest-rank percentile of sorted samples"""
+    return samples[min(len(samples) - 1, max(0, round(p / 100 * len(samples)) - 1))]
+
+
+def run(name: str, benchmark: Callable[[Corpus], Iterator[Callable[[], Any]]], corpus: Corpus, repeat: int) -> Dict[str, Any]:
+    """Runs a benchmark repeat times, then once more to measure its peak memory, and returns its results"""
+    samples: List[int] = []
+    clock = time.perf_counter_ns
+    for _ in range(repeat):
+        for operation in benchmark(corpus):
+            start = clock()
+            operation()
+            samples.append(clock() - start)
+    samples.sort()
+    total = sum(samples)
+
+    peak = None
+    if hasattr(tracemalloc, 'reset_peak'):
+        peak = 0
+        tracemalloc.start()
+        for operation in benchmark(corpus):
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            operation()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+        tracemalloc.stop()
+
+    return {
+        'name': name,
+        'operations': len(samples),
+        'total_s': total / 1e9,
+        'throughput_per_s': len(samples) / (total / 1e9) if total else None,
+        'latency_us': dict({f'p{p}': percentile(samples, p) / 1e3 for p in PERCENTILES},
+                           mean=total / len(samples) / 1e3, max=samples[-1] / 1e3) if samples else None,
+        'peak_memory_bytes': peak,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m platonparser.benchmarks.suite')
+    parser.add_argument('-o', '--output', default='benchmark-results.json', help='JSON results file (default: benchmark-results.json)')
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), help='benchmarks to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each benchmark measured (default: 3)')
+    defaults = CorpusSpec()
+    parser.add_argument('--seed', type=int, default=defaults.seed)
+    parser.add_argument('--lines', type=int, default=defaults.lines, help='lines of each file, a multiline block counting as one')
+    parser.add_argument('--multiline-lines', type=int, nargs=2, default=defaults.multiline_lines, metavar=('MIN', 'MAX'),
+                        help='number of lines of the multiline blocks')
+    parser.add_argument('--depth', type=int, default=defaults.depth, help='templates above each exercise')
+    parser.add_argument('--fanout', type=int, default=defaults.fanout, help='files extending each template')
+    parser.add_argument('--payload-size', type=int, default=defaults.payload_size, help='size in bytes of the files read by =@')
+    parser.add_argument('--operator', nargs=2, action='append', default=[], metavar=('KIND', 'WEIGHT'),
+                        help=f'weight of a kind of line, among {", ".join(defaults.operators)}')
+    args = parser.parse_args(argv)
+
+    operators = dict(defaults.operators)
+    for kind, weight in args.operator:
+        if kind not in operators: parser.error(f'unknown kind of line {kind}')
+        operators[kind] = float(weight)
+    spec = CorpusSpec(seed=args.seed, lines=args.lines, operators=operators, multiline_lines=tuple(args.multiline_lines),
+                      depth=args.depth, fanout=args.fanout, payload_size=args.payload_size)
+    corpus = generate_corpus(spec)
+    print(f'{len(corpus.exercises)} exercises, {len(corpus.templates)} templates, '
+          f'{sum(map(len, corpus.files.values())) / 2 ** 20:.1f} MiB')
+
+    results = []
+    for name in args.only or BENCHMARKS:
+        result = run(name, BENCHMARKS[name], corpus, args.repeat)
+        results.append(result)
+        latency = result['latency_us'] or {}
+        peak = result['peak_memory_bytes']
+        print(f'{name:<26} {result["operations"]:>8} ops {result["throughput_per_s"] or 0:>12,.0f} ops/s  '
+              + '  '.join(f'{p} {latency[p]:9.1f} us' for p in ('p50', 'p99')) + ('' if peak is None else f'  peak {peak / 2 ** 10:9.1f} KiB'))
+
+    with open(args.output, 'w') as file:
+        json.dump({
+            'python': sys.version,
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'spec': asdict(spec),
+            'benchmarks': results,
+        }, file, indent=2)
+    print(f'results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
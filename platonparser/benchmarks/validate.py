@@ -0,0 +1,49 @@
+"""Time of checking a tree of 20k generated exercises extending a shared template with validate_many (no URI
+resolved, no value evaluated, one pool of processes), compared to parsing a sample of them, in the current process.
+
+Run with: python -m platonparser.benchmarks.validate
+"""
+import os
+import tempfile
+import time
+
+from platonparser.benchmarks.corpus import synthetic_lines
+from platonparser.parser.batch import read_file, tree_files, validate_many
+from platonparser.parser.parser import parse_file, validate_file
+from platonparser.parser.cache import TemplateCache
+from platonparser.parser.utils import base_get_location
+
+FILES = 20_000
+LINES = 60
+SAMPLE = 1000
+OPTIONS = {'check_mandatory_keys': False}
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, 'template.pl'), 'w') as file:
+            file.write('\n'.join(synthetic_lines(200, seed=-1)))
+        for i in range(FILES):
+            subdirectory = os.path.join(directory, f'dir{i // 1000}')
+            os.makedirs(subdirectory, exist_ok=True)
+            with open(os.path.join(subdirectory, f'exercise{i}.pl'), 'w') as file:
+                file.write('extends=../template.pl\n' + '\n'.join(synthetic_lines(LINES, seed=i)))
+        paths = list(tree_files(directory))
+        print(f'{len(paths)} files of {LINES} lines, {os.cpu_count()} CPUs')
+
+        sample = [(read_file(path), path) for path in paths[:SAMPLE]]
+        cache = TemplateCache()
+        for name, function in (('parse', lambda file, path: parse_file(file, path, 0, base_get_location, template_cache=cache, **OPTIONS)),
+                               ('validate', lambda file, path: validate_file(file, path, 0, **OPTIONS))):
+            start = time.perf_counter()
+            for file, path in sample:
+                function(file, path)
+            print(f'{name:<8}: {(time.perf_counter() - start) / SAMPLE * 1e6:8.1f} us per file (one process)')
+
+        start = time.perf_counter()
+        errors = sum(len(result.errors) for result in validate_many(paths, **OPTIONS))
+        print(f'validate_many: {time.perf_counter() - start:.2f} s for {len(paths)} files ({errors} errors)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""Cost of the warnings of lines overwriting large values: a JSON tree of about 1 MB, overwritten by a component line
+then mapped again, many times. Files are parsed lazily, so that overwritten trees are never decoded unless the warnings
+need them.
+
+Run with: python -m platonparser.benchmarks.warnings
+"""
+import json
+import time
+
+import platonparser.parsers.pl as pl
+from platonparser.parser.utils import FullPath
+
+OVERWRITES = 50
+REPEATS = 5
+
+
+def main():
+    tree = json.dumps({f'node{i}': {'values': list(range(20)), 'text': 'x' * 100} for i in range(5000)})
+    lines = []
+    for _ in range(OVERWRITES):
+        lines.append(f'form % {tree}')
+        lines.append('form =: CodeEditor')
+    contents = '\n'.join(lines).encode()
+    print(f'{len(tree) / 2 ** 20:.1f} MiB JSON value overwritten {OVERWRITES * 2} times')
+    for name, options in (('with warnings', {}), ('without warnings', {'collect_warnings': False})):
+        best = min(timed(lambda: pl.PLParser(contents, FullPath(0, 'exercise.pl'), 0, None, check_mandatory_keys=False, lazy=True, **options).parse())
+                   for _ in range(REPEATS))
+        print(f'{name:<17}: {best * 1e3:8.2f} ms')
+
+
+def timed(function) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    main()
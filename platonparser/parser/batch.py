@@ -0,0 +1,233 @@
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+import os
+
+from platonparser.parser.parser import parse_file, validate_file
+from platonparser.parser.parser_exceptions import ParserException, ParserUnexpectedError
+from platonparser.parser.utils import FullPath, LocationResult, ParserOutput, ParserOutputEncoder, base_get_location
+from platonparser.parser.cache import TemplateCache
+from platonparser.parser.depindex import DependencyIndex
+from platonparser.parser.metrics import ParseMetrics
+
+
+@dataclass
+class BatchResult:
+    """Result of the parse of one file of a batch, error is set instead of output if the parse failed (errors that are
+    not ParserExceptions being reported as ParserUnexpectedErrors, see unexpected_error).
+    dependencies: references of the file and of the files it depends on, if they were recorded
+    metrics: measures of the parse, if they were collected in a worker process (see the metrics option of parse_many)"""
+    path: FullPath
+    output: Optional[ParserOutput] = None
+    error: Optional[ParserException] = None
+    dependencies: Optional[DependencyIndex] = None
+    metrics: Optional[ParseMetrics] = None
+
+
+@dataclass
+class ValidationResult:
+    """Errors found in one file of a batch by validate_many, none if it is valid"""
+    path: FullPath
+    errors: List[ParserException]
+
+
+# Template cache and dependency index of a worker process, shared by all the parses done by that process
+_worker_template_cache = None
+_worker_dependency_index = None
+
+def _init_worker(template_cache_size: int, record_dependencies: bool = False):
+    global _worker_template_cache, _worker_dependency_index
+    _worker_template_cache = TemplateCache(template_cache_size) if template_cache_size else None
+    _worker_dependency_index = DependencyIndex() if record_dependencies else None
+
+
+def _parse_job(file: Optional[bytes], path: FullPath, circle_id: int, get_location: Callable, options: Dict[str, Any]) -> BatchResult:
+    """Parses a file inside a worker process. If file is None, it is read from path"""
+    if _worker_template_cache is not None:
+        options = dict(options, template_cache=_worker_template_cache)
+    if _worker_dependency_index is not None:
+        options = dict(options, dependency_index=_worker_dependency_index)
+    try:
+        if file is None:
+            with open(path.path, 'rb') as f:
+                file = f.read()
+        result = BatchResult(path, output=parse_file(file, path, circle_id, get_location, **options))
+    except ParserException as e:
+        result = BatchResult(path, error=e)
+    except Exception as e:
+        result = BatchResult(path, error=unexpected_error(path, e))
+    if _worker_dependency_index is not None:
+        result.dependencies = _worker_dependency_index.subgraph(path)
+    result.metrics = options.get('metrics')
+    return result
+
+
+def _validate_job(path: FullPath, circle_id: int, options: Dict[str, Any]) -> ValidationResult:
+    """Reads and validates a file, in a worker process or not"""
+    try:
+        with open(path.path, 'rb') as f:
+            file = f.read()
+        return ValidationResult(path, validate_file(file, path, circle_id, **options))
+    except ParserException as e:
+        return ValidationResult(path, [e])
+    except Exception as e:
+        return ValidationResult(path, [unexpected_error(path, e)])
+
+
+def unexpected_error(path: FullPath, error: Exception) -> ParserUnexpectedError:
+    """Error of a file of a batch that is not a ParserException, reported with its type and text: it may not be
+    picklable, and must not stop the other files of the batch"""
+    return ParserUnexpectedError(path, f'{type(error).__name__}: {error}')
+
+
+def _run(jobs: Iterable[Tuple[Optional[bytes], FullPath, int]], get_location: Callable, max_workers: Optional[int],
+         template_cache_size: int, dependency_index: Optional[DependencyIndex], options: Dict[str, Any]) -> Iterator[BatchResult]:
+    """Submits jobs to a process pool, keeping a bounded number of them pending, and yields results as they complete.
+    References recorded by the workers are added to dependency_index, their measures to the metrics option"""
+    max_workers = max_workers or os.cpu_count() or 1
+    metrics = options.get('metrics')
+    if metrics is not None:
+        # Each job measures its parse from scratch, its measures are added to metrics once it is done
+        options = dict(options, metrics=ParseMetrics())
+    initargs = (template_cache_size, dependency_index is not None)
+    with ProcessPoolExecutor(max_workers, initializer=_init_worker, initargs=initargs) as executor:
+        pending = set()
+        for file, path, circle_id in jobs:
+            pending.add(executor.submit(_parse_job, file, path, circle_id, get_location, options))
+            if len(pending) >= 4 * max_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from _completed(done, dependency_index, metrics)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            yield from _completed(done, dependency_index, metrics)
+
+
+def _completed(futures, dependency_index: Optional[DependencyIndex], metrics: Optional[ParseMetrics]) -> Iterator[BatchResult]:
+    for future in futures:
+        result = future.result()
+        if dependency_index is not None and result.dependencies is not None:
+            dependency_index.update(result.dependencies)
+        if metrics is not None and result.metrics is not None:
+            metrics.merge(result.metrics)
+        yield result
+
+
+def parse_many(jobs: Iterable[Tuple[bytes, FullPath, int]], get_location: Callable[[str, str, int, int], LocationResult],
+               max_workers: int = None, template_cache_size: int = 128, dependency_index: DependencyIndex = None,
+               **options) -> Iterator[BatchResult]:
+    """Parses files in parallel in a pool of processes and yields their results in completion order
+
+    jobs: tuples (file contents, path, circle id)
+    get_location: must be picklable (e.g. a module level function such as base_get_location)
+    max_workers: number of processes, defaults to the number of CPUs
+    template_cache_size: size of the TemplateCache of each worker process, 0 to disable it
+    dependency_index: if given, the files referenced by the parsed files are recorded in it
+    options are given to parse_file. The measures of a metrics option (see ParseMetrics) are collected by the worker
+    processes and added to it as results are yielded
+    """
+    yield from _run(jobs, get_location, max_workers, template_cache_size, dependency_index, options)
+
+
+def parse_tree(root: str, circle_id: int = 0, get_location: Callable[[str, str, int, int], LocationResult] = base_get_location,
+               extensions: Tuple[str, ...] = ('pl',), resource_id: int = 0, max_workers: int = None,
+               template_cache_size: int = 128, dependency_index: DependencyIndex = None, **options) -> Iterator[BatchResult]:
+    """Parses every file with one of the given extensions inside a directory tree, see parse_many.
+    Files are read by the worker processes. With resource_id -1, their paths are absolute like the ones of the files
+    resolved by base_get_location, so that the roots of dependency_index are found among the files they reference."""
+    if resource_id == -1:
+        root = os.path.abspath(root)
+    jobs = ((None, path, circle_id) for path in tree_files(root, extensions, resource_id))
+    yield from _run(jobs, get_location, max_workers, template_cache_size, dependency_index, options)
+
+
+def tree_files(root: str, extensions: Tuple[str, ...] = ('pl',), resource_id: int = 0) -> Iterator[FullPath]:
+    """Paths of the files with one of the given extensions inside a directory tree"""
+    suffixes = tuple('.' + ext for ext in extensions)
+    return (FullPath(resource_id, os.path.join(dirpath, filename))
+            for dirpath, _, filenames in os.walk(root) for filename in sorted(filenames) if filename.endswith(suffixes))
+
+
+def validate_many(paths: Iterable[FullPath], circle_id: int = 0, max_workers: int = None, chunksize: int = 64,
+                  **options) -> Iterator[ValidationResult]:
+    """Validates files (see Parser.validate) in parallel in a pool of processes, reading them from their paths on the
+    local file system, and yields their results in the order of the paths. Nothing is resolved: every file is
+    read and checked once, on its own. Files are sent to the processes chunksize at a time, there is no pool if
+    max_workers is 1 or if there are fewer files than that.
+
+    max_workers: number of processes, defaults to the number of CPUs
+    options are given to validate_file
+    """
+    paths = list(paths)
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(paths) <= chunksize:
+        yield from (_validate_job(path, circle_id, options) for path in paths)
+        return
+    with ProcessPoolExecutor(max_workers) as executor:
+        yield from executor.map(_validate_job, paths, [circle_id] * len(paths), [options] * len(paths), chunksize=chunksize)
+
+
+def read_file(path: FullPath) -> bytes:
+    """Reads a file from its path on the local file system"""
+    with open(path.path, 'rb') as f:
+        return f.read()
+
+
+def parse_affected(dependency_index: DependencyIndex, paths: Iterable[FullPath],
+                   get_location: Callable[[str, str, int, int], LocationResult], read: Callable[[FullPath], bytes] = read_file,
+                   **options) -> Iterator[BatchResult]:
+    """Parses again, in the current process, the roots of the index that are among the given changed files or depend
+    on one of them (see DependencyIndex.affected_by), updating their references in the index.
+    Roots that cannot be read anymore are removed from the index.
+
+    read: returns the contents of a file, raising OSError if it does not exist
+    options are given to parse_file
+    """
+    paths = set(paths)
+    affected = dependency_index.affected_by(*paths) | paths
+    for path in sorted(path for path in affected if path in dependency_index.roots):
+        circle_id = dependency_index.roots[path]
+        try:
+            file = read(path)
+        except OSError:
+            dependency_index.remove(path)
+            continue
+        try:
+            result = BatchResult(path, output=parse_file(file, path, circle_id, get_location, dependency_index=dependency_index, **options))
+        except ParserException as e:
+            result = BatchResult(path, error=e)
+        except Exception as e:
+            result = BatchResult(path, error=unexpected_error(path, e))
+        yield result
+
+
+class NDJSONWriter:
+    """Writes batch results to a text file as they come, one JSON object per line (NDJSON)"""
+    def __init__(self, file: TextIO, flush: bool = False):
+        """flush: flush the file after each result, for readers following it"""
+        self.file = file
+        self.flush = flush
+        self.encoder = ParserOutputEncoder()
+        self.written = 0
+        self.failed = 0
+
+
+    def write(self, result: BatchResult, **fields):
+        """Writes a result as a JSON object with its path, and its output or its error. fields are added to the object"""
+        record = dict(fields, path=result.path)
+        if result.output is not None:
+            record['output'] = result.output
+        elif result.error is not None:
+            record['error'] = {'type': type(result.error).__name__, 'message': str(result.error)}
+        self.file.write(self.encoder.encode(record) + '\n')
+        if self.flush:
+            self.file.flush()
+        self.written += 1
+        self.failed += result.error is not None
+
+
+    def write_all(self, results: Iterable[BatchResult]) -> int:
+        """Writes every result as it is produced and returns the number of failed parses among them"""
+        failed = self.failed
+        for result in results:
+            self.write(result)
+        return self.failed - failed
@@ -0,0 +1,340 @@
+from collections import OrderedDict, namedtuple
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple
+import hashlib
+import logging
+import os
+import pickle
+import threading
+
+from platonparser.parser.utils import FullPath, LocationRequest, LocationResult, ParserOutput
+
+logger = logging.getLogger(__name__)
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+# Parser options that do not change outputs, left out of the keys of DiskCache
+UNKEYED_OPTIONS = frozenset({'template_cache', 'plan_cache', 'prefetch_executor', 'dependency_index', 'max_workers', 'processes',
+                             'metrics'})
+
+
+def digest(contents: bytes) -> str:
+    """Digest of the contents of a file, used to detect changes"""
+    return hashlib.blake2b(contents, digest_size=16).hexdigest()
+
+
+class LRUCache:
+    """LRU cache of values shared between parsers, counting hits and misses. It can be shared between threads"""
+    def __init__(self, maxsize: int = 128):
+        """maxsize: maximum number of values kept, least recently used ones are evicted first"""
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.__values = OrderedDict()
+        self.__lock = threading.Lock()
+
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Returns the value cached for key, or None if there is none"""
+        with self.__lock:
+            value = self.__values.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.__values.move_to_end(key)
+            return value
+
+
+    def put(self, key: Hashable, value: Any):
+        """Caches value for key, evicting the least recently used value if needed"""
+        with self.__lock:
+            self.__values[key] = value
+            self.__values.move_to_end(key)
+            while len(self.__values) > self.maxsize:
+                self.evicted(*self.__values.popitem(last=False))
+
+
+    def evicted(self, key: Hashable, value: Any):
+        """Called with every value evicted by put, does nothing by default"""
+
+
+    def miss(self):
+        """Counts a miss, e.g. when a cached value is found to be out of date"""
+        with self.__lock:
+            self.misses += 1
+
+
+    def discard(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Removes the values whose key satisfies predicate, and returns their number"""
+        with self.__lock:
+            keys = [key for key in self.__values if predicate(key)]
+            for key in keys:
+                self.evicted(key, self.__values.pop(key))
+            return len(keys)
+
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Checks if a value is cached for key, without counting a hit or a miss"""
+        return key in self.__values
+
+
+    def clear(self):
+        """Removes every cached value and resets the counters"""
+        with self.__lock:
+            self.__values.clear()
+            self.hits = self.misses = 0
+
+
+    def cache_info(self) -> CacheInfo:
+        """Returns hits, misses, maximum and current size of the cache"""
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self.__values))
+
+
+    def __len__(self):
+        return len(self.__values)
+
+
+class TemplateCache(LRUCache):
+    """LRU cache of the outputs of parsed templates (files inherited with extends=), shared between parsers.
+
+    Outputs are stored and handed out without being copied, they must not be modified: PLParser lays them
+    over the data of the files inheriting them (see LayeredDict), whose outputs copy what they read from them.
+
+    An output is keyed by the contents of its template only. The get_location calls made while parsing it are
+    recorded with it, and replayed before handing it out (see get): a change in a file the template inherits from
+    or loads (extends=, =@, %@, @...) makes it out of date, like an entry of a DiskCache.
+    """
+    def __init__(self, maxsize: int = 128):
+        super().__init__(maxsize)
+        # get_location calls made while parsing cached templates, when they were recorded (see RecordingGetLocation)
+        self.calls: Dict[Hashable, Dict[Tuple[str, str, int, int], Optional[Tuple[FullPath, int, str]]]] = {}
+
+
+    def put(self, key: Hashable, value: ParserOutput, calls: Dict[Tuple[str, str, int, int], Optional[Tuple[FullPath, int, str]]] = None):
+        """Caches the output of a template, with the get_location calls made while parsing it and the files it
+        inherits from if they were recorded"""
+        if calls is None:
+            self.calls.pop(key, None)
+        else:
+            self.calls[key] = calls
+        super().put(key, value)
+
+
+    def get(self, key: Hashable, get_location: Callable[[str, str, int, int], LocationResult] = None) -> Optional[ParserOutput]:
+        """Returns the output cached for key, or None if there is none. If get_location is given, the recorded
+        get_location calls of the template are replayed with it first: the output is out of date (None is returned,
+        counted as a miss) if their results changed or if they were not recorded"""
+        if get_location is not None and key in self:
+            calls = self.calls.get(key)
+            if calls is None or not unchanged(calls, get_location):
+                self.miss()
+                return None
+        return super().get(key)
+
+
+    def evicted(self, key: Hashable, value: ParserOutput):
+        self.calls.pop(key, None)
+
+
+    def clear(self):
+        super().clear()
+        self.calls.clear()
+
+
+    def discard_paths(self, paths: Set[FullPath]) -> int:
+        """Removes the outputs of the given templates, e.g. because they or files they inherit from changed"""
+        return self.discard(lambda key: key[0] in paths)
+
+
+    @staticmethod
+    def key(location: LocationResult, lazy: bool = False) -> Hashable:
+        """Cache key of a template: its path, the digest of its contents, its circle and whether it was parsed in
+        lazy mode (its outputs then hold LazyValues, which eager parsers do not resolve)"""
+        return (location.path, digest(location.file), location.circle_id, lazy)
+
+
+class PlanCache(LRUCache):
+    """LRU cache of the parse plans of files (see pl.ParsePlan), keyed by the digest of their contents only:
+    files with the same contents share their plan whatever their path"""
+    def __init__(self, maxsize: int = 1024):
+        super().__init__(maxsize)
+
+
+    @staticmethod
+    def key(file: bytes) -> Hashable:
+        """Cache key of the contents of a file"""
+        return digest(file)
+
+
+
+class RecordingGetLocation:
+    """Wraps a get_location function and records every call made to it, with a summary of its result.
+    Batch calls are recorded as the equivalent single calls."""
+    def __init__(self, get_location: Callable[[str, str, int, int], LocationResult]):
+        self.get_location = get_location
+        self.calls: Dict[Tuple[str, str, int, int], Optional[Tuple[FullPath, int, str]]] = {}
+        if hasattr(get_location, 'get_locations'):
+            self.get_locations = self.__get_locations
+
+
+    def __call__(self, uri: str, working_directory: str, resource_id: int, circle_id: int) -> LocationResult:
+        result = self.get_location(uri, working_directory, resource_id, circle_id)
+        self.calls[(uri, working_directory, resource_id, circle_id)] = summarize_location(result)
+        return result
+
+
+    def __get_locations(self, requests: List[LocationRequest]) -> List[LocationResult]:
+        results = self.get_location.get_locations(requests)
+        for request, result in zip(requests, results):
+            self.calls[tuple(request)] = summarize_location(result)
+        return results
+
+
+def summarize_location(result: Optional[LocationResult]) -> Optional[Tuple[FullPath, int, str]]:
+    """Path, circle and digest of the contents of a get_location result (None if the URI was not resolved)"""
+    if not result: return None
+    return (result.path, result.circle_id, digest(result.file))
+
+
+def unchanged(calls: Dict[Tuple[str, str, int, int], Optional[Tuple[FullPath, int, str]]],
+              get_location: Callable[[str, str, int, int], LocationResult]) -> bool:
+    """Replays recorded get_location calls (in one batch if possible) and checks their results are unchanged"""
+    if hasattr(get_location, 'get_locations'):
+        results = get_location.get_locations([LocationRequest(*call) for call in calls])
+    else:
+        results = (get_location(*call) for call in calls)
+    return all(summarize_location(result) == summary for result, summary in zip(results, calls.values()))
+
+
+class DiskCache:
+    """Persistent cache of parser outputs, stored as one pickle file per entry inside a directory.
+
+    An entry is keyed by the path, circle and contents of the parsed file, and by the parser options changing
+    outputs (e.g. check_mandatory_keys or collect_comments, see UNKEYED_OPTIONS). It also records every call made to
+    get_location during the parse, including the ones made while parsing inherited files, with the path, circle
+    and digest of what each call resolved to. An entry is only used if replaying those calls still gives the
+    same results: a change in any file reached through extends=, =@, %@, =$ or @ (or a file that now resolves
+    differently) invalidates it. Entries written by another version of the cache format are ignored.
+
+    When the size of the directory goes over max_size bytes, least recently used entries are removed until it is
+    below low_water times max_size. The size is tracked as entries are written, the directory is only listed when
+    it goes over max_size (or on the first write), which also takes the entries written by other processes into account.
+    Entries are pickles: the directory must only be writable by trusted users.
+    """
+    VERSION = 2
+    SUFFIX = '.plcache'
+
+    def __init__(self, directory: str, max_size: int = 256 * 2**20, low_water: float = 0.9):
+        self.directory = directory
+        self.max_size = max_size
+        self.low_water = low_water
+        self.size: Optional[int] = None # Size of the entries, known once the directory was listed
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+
+    def key(self, file: bytes, path: FullPath, circle_id: int, options: Dict[str, Any] = None) -> str:
+        """Key of the entry of a file parsed with the given parser options"""
+        keyed = sorted((name, repr(value)) for name, value in (options or {}).items() if name not in UNKEYED_OPTIONS)
+        h = hashlib.sha256(f'{self.VERSION}:{path.resource_id}:{path.path}:{circle_id}:{keyed}:'.encode())
+        h.update(file)
+        return h.hexdigest()
+
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+
+    def get(self, key: str, get_location: Callable[[str, str, int, int], LocationResult]) -> Optional[ParserOutput]:
+        """Returns the output stored for key if all the files it was built from are unchanged, else None"""
+        entry_path = self.entry_path(key)
+        try:
+            with open(entry_path, 'rb') as file:
+                version, calls, output = pickle.load(file)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception as e:
+            logger.warning(f'Removing unreadable cache entry {entry_path}: {e}')
+            self.remove(key)
+            self.misses += 1
+            return None
+
+        if version != self.VERSION or not unchanged(calls, get_location):
+            self.remove(key)
+            self.misses += 1
+            return None
+        self.hits += 1
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return output
+
+
+    def put(self, key: str, calls: Dict[Tuple[str, str, int, int], Optional[Tuple[FullPath, int, str]]], output: ParserOutput):
+        """Stores output with the get_location calls it was built from, then evicts entries if needed"""
+        import tempfile # Only needed when writing, slow to import
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        entry_path = self.entry_path(key)
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                pickle.dump((self.VERSION, calls, output), file, protocol=pickle.HIGHEST_PROTOCOL)
+                size = file.tell()
+            try:
+                size -= os.stat(entry_path).st_size
+            except FileNotFoundError:
+                pass
+            os.replace(tmp_path, entry_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        if self.size is not None:
+            self.size += size
+        if self.size is None or self.size > self.max_size:
+            self.evict()
+
+
+    def remove(self, key: str):
+        """Removes an entry, if it exists"""
+        entry_path = self.entry_path(key)
+        try:
+            size = os.stat(entry_path).st_size
+            os.unlink(entry_path)
+        except FileNotFoundError:
+            return
+        if self.size is not None:
+            self.size -= size
+
+
+    def evict(self):
+        """Lists the entries and, if they take more than max_size bytes, removes least recently used ones until they
+        take less than low_water times max_size bytes"""
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(self.SUFFIX):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        if total > self.max_size:
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_size * self.low_water: break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+        self.size = total
+
+
+    def clear(self):
+        """Removes every entry of the cache"""
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(self.SUFFIX):
+                    os.unlink(entry.path)
+        self.size = 0
@@ -0,0 +1,103 @@
+"""Command line interface of the parser, run with `platonparser <command>` or `python -m platonparser.parser.cli <command>`"""
+import argparse
+import os
+import sys
+
+from platonparser.parser.batch import NDJSONWriter, parse_tree, tree_files, validate_many
+from platonparser.parser.depindex import DependencyIndex
+from platonparser.parser.parser_exceptions import ParserException, ParserExceptionLine
+from platonparser.parser.utils import FullPath
+from platonparser.parser.watch import Watcher
+
+
+def parse_command(args) -> int:
+    index = DependencyIndex() if args.index else None
+    # Files named like the ones of base_get_location, as in Watcher
+    results = parse_tree(args.root, args.circle_id, extensions=tuple(args.extensions), resource_id=-1, max_workers=args.jobs,
+                         dependency_index=index, check_mandatory_keys=not args.no_mandatory_keys)
+    failed = NDJSONWriter(args.output).write_all(results)
+    if index is not None:
+        index.save(args.index)
+    return 1 if failed else 0
+
+
+def watch_command(args) -> int:
+    watcher = Watcher(args.root, args.circle_id, extensions=tuple(args.extensions), interval=args.interval, debounce=args.debounce,
+                      max_workers=args.jobs, check_mandatory_keys=not args.no_mandatory_keys)
+    writer = NDJSONWriter(args.output, flush=True)
+    try:
+        for event in watcher.watch():
+            writer.write(event.result, event=event.kind)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def validate_command(args) -> int:
+    paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            paths.extend(tree_files(path, tuple(args.extensions)))
+        else:
+            paths.append(FullPath(0, path))
+    errors = invalid = 0
+    for result in validate_many(paths, args.circle_id, max_workers=args.jobs, check_mandatory_keys=not args.no_mandatory_keys):
+        for error in result.errors:
+            print(format_error(error), file=args.output)
+        errors += len(result.errors)
+        invalid += bool(result.errors)
+    print(f'{len(paths)} files checked, {errors} errors in {invalid} files', file=sys.stderr)
+    return 1 if errors else 0
+
+
+def format_error(error: ParserException) -> str:
+    """One line describing an error, starting with the path and line number of its file"""
+    if isinstance(error, ParserExceptionLine):
+        return f'{error.path.path}:{error.line_number}: {error.message} in "{error.line}"'
+    message = str(error)
+    prefix = f'{error.path}: '
+    return f'{error.path.path}: {message[len(prefix):] if message.startswith(prefix) else message}'
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='platonparser')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    parse = commands.add_parser('parse', help='parse every file of a directory tree, writing one JSON object per file (NDJSON)')
+    parse.add_argument('root', help='root of the directory tree')
+    parse.add_argument('-j', '--jobs', type=int, default=None, help='number of worker processes (default: number of CPUs)')
+    parse.add_argument('-e', '--extensions', nargs='+', default=['pl'], help='extensions of the files to parse (default: pl)')
+    parse.add_argument('--circle-id', type=int, default=0)
+    parse.add_argument('--no-mandatory-keys', action='store_true', help='do not check for mandatory keys')
+    parse.add_argument('-o', '--output', type=argparse.FileType('w'), default=sys.stdout, help='output file (default: stdout)')
+    parse.add_argument('--index', metavar='FILE', help='write the dependency index of the parsed files to FILE (JSON)')
+    parse.set_defaults(func=parse_command)
+
+    watch = commands.add_parser('watch', help='parse every file of a directory tree, then parse again the files that change '
+                                              'and the files depending on them, writing one JSON event per parse (NDJSON)')
+    watch.add_argument('root', help='root of the directory tree')
+    watch.add_argument('-j', '--jobs', type=int, default=None, help='number of worker processes of the first parse (default: number of CPUs)')
+    watch.add_argument('-e', '--extensions', nargs='+', default=['pl'], help='extensions of the files to parse (default: pl)')
+    watch.add_argument('--circle-id', type=int, default=0)
+    watch.add_argument('--no-mandatory-keys', action='store_true', help='do not check for mandatory keys')
+    watch.add_argument('--interval', type=float, default=0.5, help='seconds between two polls of the tree without watchdog (default: 0.5)')
+    watch.add_argument('--debounce', type=float, default=0.2, help='seconds without changes before parsing changed files (default: 0.2)')
+    watch.add_argument('-o', '--output', type=argparse.FileType('w'), default=sys.stdout, help='output file (default: stdout)')
+    watch.set_defaults(func=watch_command)
+
+    validate = commands.add_parser('validate', help='check the syntax of files without resolving nor evaluating anything, '
+                                                    'writing one line per error')
+    validate.add_argument('paths', nargs='+', help='files, or directory trees whose files with the given extensions are checked')
+    validate.add_argument('-j', '--jobs', type=int, default=None, help='number of worker processes (default: number of CPUs)')
+    validate.add_argument('-e', '--extensions', nargs='+', default=['pl'], help='extensions of the files of directory trees (default: pl)')
+    validate.add_argument('--circle-id', type=int, default=0)
+    validate.add_argument('--no-mandatory-keys', action='store_true', help='do not check for mandatory keys')
+    validate.add_argument('-o', '--output', type=argparse.FileType('w'), default=sys.stdout, help='output file (default: stdout)')
+    validate.set_defaults(func=validate_command)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+from typing import Dict, Set
+import json
+import os
+
+from platonparser.parser.utils import FullPath
+
+
+class DependencyIndex:
+    """Graph of the files referenced by parsed files through extends=, =@, =$ and @ lines, built while parsing
+    (see the dependency_index option of PLParser and parse_many).
+
+    Forward edges go from a file to the files it references, with the kinds of the lines referencing them
+    ('extends', 'from_file', 'url' or 'dependency'), reverse edges from a file to the files referencing it.
+    Roots are the files that were parsed themselves, not only inherited, with their circle: they are the ones
+    to parse again when a file they depend on changes (see affected_by and batch.parse_affected).
+    """
+    VERSION = 1
+
+    def __init__(self):
+        self.forward: Dict[FullPath, Dict[FullPath, Set[str]]] = {}
+        self.reverse: Dict[FullPath, Set[FullPath]] = {}
+        self.roots: Dict[FullPath, int] = {}
+
+
+    def __contains__(self, path: FullPath) -> bool:
+        """Checks if the edges from a file were recorded"""
+        return path in self.forward
+
+
+    def __len__(self):
+        return len(self.forward)
+
+
+    def reset(self, path: FullPath):
+        """Removes the edges from a file, before they are recorded again while parsing it"""
+        for target in self.forward.get(path, ()):
+            sources = self.reverse[target]
+            sources.discard(path)
+            if not sources: del self.reverse[target]
+        self.forward[path] = {}
+
+
+    def add(self, source: FullPath, target: FullPath, kind: str):
+        """Records that source references target with a line of the given kind"""
+        self.forward.setdefault(source, {}).setdefault(target, set()).add(kind)
+        self.reverse.setdefault(target, set()).add(source)
+
+
+    def add_root(self, path: FullPath, circle_id: int):
+        """Records that a file was parsed itself in the given circle"""
+        self.roots[path] = circle_id
+
+
+    def remove(self, path: FullPath):
+        """Forgets a file that does not exist anymore. Edges to it are kept, the files referencing it are still affected by it"""
+        self.reset(path)
+        del self.forward[path]
+        self.roots.pop(path, None)
+
+
+    def dependencies(self, path: FullPath) -> Dict[FullPath, Set[str]]:
+        """Files referenced by a file, with the kinds of the lines referencing them"""
+        return self.forward.get(path, {})
+
+
+    def dependents(self, path: FullPath) -> Set[FullPath]:
+        """Files referencing a file"""
+        return self.reverse.get(path, set())
+
+
+    def affected_by(self, *paths: FullPath) -> Set[FullPath]:
+        """Returns the files depending on one of the given files, directly or through other files"""
+        affected = set()
+        pending = list(paths)
+        while pending:
+            for source in self.reverse.get(pending.pop(), ()):
+                if source not in affected:
+                    affected.add(source)
+                    pending.append(source)
+        return affected
+
+
+    def subgraph(self, path: FullPath) -> 'DependencyIndex':
+        """Returns the index restricted to a file and the files it depends on, directly or through other files"""
+        index = DependencyIndex()
+        pending = [path]
+        while pending:
+            source = pending.pop()
+            if source in index or source not in self.forward: continue
+            index.forward[source] = {}
+            for target, kinds in self.forward[source].items():
+                for kind in kinds:
+                    index.add(source, target, kind)
+                pending.append(target)
+            if source in self.roots:
+                index.roots[source] = self.roots[source]
+        return index
+
+
+    def update(self, other: 'DependencyIndex'):
+        """Replaces the edges from the files of another index (e.g. built in another process) by the ones it recorded"""
+        for source, targets in other.forward.items():
+            self.reset(source)
+            for target, kinds in targets.items():
+                for kind in kinds:
+                    self.add(source, target, kind)
+        self.roots.update(other.roots)
+
+
+    def to_dict(self) -> dict:
+        """Returns the index as a JSON serializable dictionary"""
+        return {
+            'version': self.VERSION,
+            'roots': [[path.resource_id, path.path, circle_id] for path, circle_id in self.roots.items()],
+            'files': [[source.resource_id, source.path, [[target.resource_id, target.path, sorted(kinds)]
+                                                         for target, kinds in targets.items()]]
+                      for source, targets in self.forward.items()],
+        }
+
+
+    @classmethod
+    def from_dict(cls, d: dict) -> 'DependencyIndex':
+        """Builds an index from the output of to_dict. Raises ValueError if it was written by another version"""
+        if d.get('version') != cls.VERSION:
+            raise ValueError(f'Unsupported dependency index version {d.get("version")}')
+        index = cls()
+        for resource_id, path, targets in d['files']:
+            source = FullPath(resource_id, path)
+            index.forward[source] = {}
+            for target_resource_id, target_path, kinds in targets:
+                for kind in kinds:
+                    index.add(source, FullPath(target_resource_id, target_path), kind)
+        for resource_id, path, circle_id in d['roots']:
+            index.roots[FullPath(resource_id, path)] = circle_id
+        return index
+
+
+    def save(self, filename: str):
+        """Writes the index as JSON, atomically"""
+        directory = os.path.dirname(os.path.abspath(filename))
+        import tempfile # Only needed when writing, slow to import
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.to_dict(), f)
+            os.replace(tmp, filename)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+    @classmethod
+    def load(cls, filename: str) -> 'DependencyIndex':
+        """Reads an index written by save"""
+        with open(filename) as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,213 @@
+"""Measures of parses, collected when a ParseMetrics object is given to a parser (metrics option of PLParser and
+parse_file), and their export in the Prometheus text format"""
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import math
+import threading
+
+from platonparser.parser.utils import LocationRequest, LocationResult
+
+# Upper bounds in seconds of the buckets of the histogram of resolver latencies
+RESOLVER_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, math.inf)
+
+
+@dataclass
+class ParseMetrics:
+    """Measures of parses, added up over every parse it is given to (inherited files included), and safe to share
+    between threads. Phases are disjoint, nested parses of inherited files being counted in their own phases:
+        compile: decoding files and classifying their lines (regular expressions)
+        evaluate: literal_eval of values
+        json: JSON decoding of values (%, %=, %@)
+        merge: laying the data of inherited files over the data of the files inheriting them
+        resolve: get_location calls
+        finish: completing the outputs (flattening inherited data, evaluating lazy values, checking mandatory keys)
+    The rest of the time of the parses (seconds) is spent running the handlers of the lines.
+    Values evaluated lazily are counted in the finish phase, or not at all if they are evaluated after the parse.
+    """
+    parses: int = 0 # Files parsed, inherited files included
+    seconds: float = 0.0 # Time spent in parses of files that are not inherited
+    phases: Dict[str, float] = field(default_factory=dict) # Seconds spent in each phase
+    lines: Dict[str, int] = field(default_factory=dict) # Parsed lines by kind (see classify_line), a multiline block being one 'multi_line' line
+    resolver_calls: int = 0 # Calls to get_location, or to its get_locations method
+    resolver_seconds: float = 0.0
+    resolver_max_seconds: float = 0.0
+    resolver_buckets: List[int] = field(default_factory=lambda: [0] * len(RESOLVER_BUCKETS)) # Calls by latency (see RESOLVER_BUCKETS), not cumulative
+    bytes_loaded: int = 0 # Size of the files returned by get_location
+    inheritance_depth: int = 0 # Length of the longest chain of inherited files
+    template_cache_hits: int = 0 # Inherited files whose output was taken from a template cache
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # The lock cannot be pickled, e.g. to be sent to the worker processes of parse_many
+        with self._lock:
+            return {name: value for name, value in self.__dict__.items() if name != '_lock'}
+
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+    def timed(self, phase: str, function: Callable, *args) -> Any:
+        """Calls function, adding the time it took to the given phase"""
+        start = perf_counter()
+        try:
+            return function(*args)
+        finally:
+            self.add_phase(phase, perf_counter() - start)
+
+
+    def add_phase(self, phase: str, seconds: float):
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+
+    def add_phases(self, phases: Dict[str, float]):
+        """Adds the seconds of several phases"""
+        with self._lock:
+            for phase, seconds in phases.items():
+                self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+
+    def add_parse(self, depth: int, seconds: float, lines: Dict[Optional[str], int]):
+        """Records a parse of a file inherited through depth files (0 if it is not inherited) and the kinds of its lines"""
+        with self._lock:
+            self.parses += 1
+            if depth == 0:
+                self.seconds += seconds
+            self.inheritance_depth = max(self.inheritance_depth, depth)
+            for kind, count in lines.items():
+                kind = kind or 'unknown'
+                self.lines[kind] = self.lines.get(kind, 0) + count
+
+
+    def add_resolution(self, seconds: float, results: List[Optional[LocationResult]]):
+        """Records a call to get_location (or get_locations) and its results"""
+        size = sum(len(result.file) for result in results if result)
+        with self._lock:
+            self.resolver_calls += 1
+            self.resolver_seconds += seconds
+            self.resolver_max_seconds = max(self.resolver_max_seconds, seconds)
+            self.resolver_buckets[next(i for i, bound in enumerate(RESOLVER_BUCKETS) if seconds <= bound)] += 1
+            self.bytes_loaded += size
+            self.phases['resolve'] = self.phases.get('resolve', 0.0) + seconds
+
+
+    def add_template_cache_hit(self):
+        with self._lock:
+            self.template_cache_hits += 1
+
+
+    def merge(self, other: 'ParseMetrics'):
+        """Adds the measures of another ParseMetrics, e.g. collected in another process"""
+        measures = other.as_dict()
+        with self._lock:
+            self.parses += measures['parses']
+            self.seconds += measures['seconds']
+            for phase, seconds in measures['phases'].items():
+                self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+            for kind, count in measures['lines'].items():
+                self.lines[kind] = self.lines.get(kind, 0) + count
+            self.resolver_calls += measures['resolver_calls']
+            self.resolver_seconds += measures['resolver_seconds']
+            self.resolver_max_seconds = max(self.resolver_max_seconds, measures['resolver_max_seconds'])
+            self.resolver_buckets = [a + b for a, b in zip(self.resolver_buckets, measures['resolver_buckets'])]
+            self.bytes_loaded += measures['bytes_loaded']
+            self.inheritance_depth = max(self.inheritance_depth, measures['inheritance_depth'])
+            self.template_cache_hits += measures['template_cache_hits']
+
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Plain dictionary of the measures, e.g. to be encoded in JSON"""
+        with self._lock:
+            return {
+                'parses': self.parses, 'seconds': self.seconds, 'phases': dict(self.phases), 'lines': dict(self.lines),
+                'resolver_calls': self.resolver_calls, 'resolver_seconds': self.resolver_seconds,
+                'resolver_max_seconds': self.resolver_max_seconds, 'resolver_buckets': list(self.resolver_buckets),
+                'bytes_loaded': self.bytes_loaded, 'inheritance_depth': self.inheritance_depth,
+                'template_cache_hits': self.template_cache_hits,
+            }
+
+
+class MeasuredGetLocation:
+    """Wraps a get_location function to record its calls in a ParseMetrics, batch calls included"""
+    def __init__(self, get_location: Callable[[str, str, int, int], LocationResult], metrics: ParseMetrics):
+        self.get_location = get_location
+        self.metrics = metrics
+        if hasattr(get_location, 'get_locations'):
+            self.get_locations = self.__get_locations
+
+
+    def __call__(self, uri: str, working_directory: str, resource_id: int, circle_id: int) -> LocationResult:
+        start = perf_counter()
+        result = self.get_location(uri, working_directory, resource_id, circle_id)
+        self.metrics.add_resolution(perf_counter() - start, [result])
+        return result
+
+
+    def __get_locations(self, requests: List[LocationRequest]) -> List[LocationResult]:
+        start = perf_counter()
+        results = self.get_location.get_locations(requests)
+        self.metrics.add_resolution(perf_counter() - start, results)
+        return results
+
+
+def measured_async(get_location: Callable, metrics: ParseMetrics) -> Callable:
+    """Wraps a coroutine function get_location to record its calls in a ParseMetrics"""
+    async def measured(uri: str, working_directory: str, resource_id: int, circle_id: int) -> LocationResult:
+        start = perf_counter()
+        result = await get_location(uri, working_directory, resource_id, circle_id)
+        metrics.add_resolution(perf_counter() - start, [result])
+        return result
+    return measured
+
+
+def to_prometheus(metrics: ParseMetrics, prefix: str = 'platonparser', labels: Dict[str, str] = None) -> str:
+    """Formats the measures in the Prometheus text exposition format, with the given labels added to every sample"""
+    measures = metrics.as_dict()
+    base = [(name, value) for name, value in (labels or {}).items()]
+
+    def sample(name: str, value: float, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = base + list(extra)
+        text = '{' + ','.join(f'{k}="{escape(str(v))}"' for k, v in pairs) + '}' if pairs else ''
+        return f'{prefix}_{name}{text} {format_value(value)}'
+
+    lines = []
+    def family(name: str, kind: str, help: str, samples: List[str]):
+        lines.append(f'# HELP {prefix}_{name} {help}')
+        lines.append(f'# TYPE {prefix}_{name} {kind}')
+        lines.extend(samples)
+
+    family('parses_total', 'counter', 'Files parsed, inherited files included', [sample('parses_total', measures['parses'])])
+    family('parse_seconds_total', 'counter', 'Time spent parsing files that are not inherited',
+           [sample('parse_seconds_total', measures['seconds'])])
+    family('phase_seconds_total', 'counter', 'Time spent in each phase of the parses',
+           [sample('phase_seconds_total', seconds, (('phase', phase),)) for phase, seconds in sorted(measures['phases'].items())])
+    family('lines_total', 'counter', 'Parsed lines by kind',
+           [sample('lines_total', count, (('kind', kind),)) for kind, count in sorted(measures['lines'].items())])
+    cumulative = 0
+    buckets = []
+    for bound, count in zip(RESOLVER_BUCKETS, measures['resolver_buckets']):
+        cumulative += count
+        buckets.append(sample('resolver_seconds_bucket', cumulative, (('le', '+Inf' if bound == math.inf else format_value(bound)),)))
+    family('resolver_seconds', 'histogram', 'Latency of the calls to get_location',
+           buckets + [sample('resolver_seconds_sum', measures['resolver_seconds']),
+                      sample('resolver_seconds_count', measures['resolver_calls'])])
+    family('bytes_loaded_total', 'counter', 'Size of the files returned by get_location', [sample('bytes_loaded_total', measures['bytes_loaded'])])
+    family('inheritance_depth_max', 'gauge', 'Length of the longest chain of inherited files',
+           [sample('inheritance_depth_max', measures['inheritance_depth'])])
+    family('template_cache_hits_total', 'counter', 'Inherited files whose output was taken from a template cache',
+           [sample('template_cache_hits_total', measures['template_cache_hits'])])
+    return '\n'.join(lines) + '\n'
+
+
+def escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
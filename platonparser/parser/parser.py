@@ -1,42 +1,64 @@
-from typing import Dict, Callable
+from typing import Awaitable, BinaryIO, Dict, Callable, Iterable, List, Optional, Union
 import os
 import sys
 import os.path
+import importlib
 import importlib.util
 import logging
 from functools import lru_cache
 
-from platonparser.parser.utils import ParserImport, ParserOutput
+from platonparser.parser.utils import LocationResult, Parser, ParserImport, ParserOutput
+from platonparser.parser.cache import DiskCache, RecordingGetLocation
 from platonparser.parser.parser_exceptions import *
 
 logger = logging.getLogger(__name__)
 
 PARSERS_ROOT = os.path.join(os.path.dirname(__file__), '../parsers')
 
+# Group of the entry points declaring the parsers of other packages: the name of an entry point is an extension,
+# its value a module with a get_parser() function, or a function returning a ParserImport ('module:function')
+ENTRY_POINT_GROUP = 'platonparser.parsers'
+
+# Modules of the parsers of the parsers directory by extension, a parser added there must be declared here
+PARSERS_MANIFEST = {
+    'pl': 'platonparser.parsers.pl',
+    'pltp': 'platonparser.parsers.pltp',
+}
+
+
 def load_parser_from_module(path: str):
     """Loads a parser from a path
     Calls the get_parser() function in the module to so"""
     filename = os.path.basename(path)
     module_name = os.path.splitext(filename)[0]
-    spec = importlib.util.spec_from_file_location(module_name, path)
-    module = importlib.util.module_from_spec(spec)
-    sys.modules[module_name] = module
-    spec.loader.exec_module(module)
+    if os.path.samefile(os.path.dirname(path), PARSERS_ROOT):
+        module = importlib.import_module(f'platonparser.parsers.{module_name}')
+    else:
+        # Modules are not registered under their bare name, which could shadow other modules
+        spec = importlib.util.spec_from_file_location(f'platonparser.plugins.{module_name}', path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[spec.name] = module
+        spec.loader.exec_module(module)
+    return call_get_parser(module, 'get_parser', filename)
+
+
+def call_get_parser(module, function: str, name: str) -> Optional[ParserImport]:
+    """Calls the function of a module returning a ParserImport, logs an error and returns None if it fails"""
     try:
-        parser_import = module.get_parser()
+        parser_import = getattr(module, function)()
         if type(parser_import) != ParserImport:
-            logger.error(f'get_parser() function from file {filename} returned {type(parser_import)} object instead of expected ParserImport')
+            logger.error(f'{function}() function from {name} returned {type(parser_import)} object instead of expected ParserImport')
             return None
         return parser_import
     except AttributeError:
-        logger.error(f'get_parser() function from file {filename} is not defined')
+        logger.error(f'{function}() function from {name} is not defined')
     except Exception as e:
-        logger.exception(f'Could not import parser {filename}: {e}')
+        logger.exception(f'Could not import parser {name}: {e}')
 
 
 @lru_cache
 def get_parsers(parsers_root: str) -> Dict[str, ParserImport]:
-    """Loads parsers contained inside a given folder"""
+    """Loads parsers contained inside a given folder, see ParserRegistry to only load the parsers needed"""
     parsers = {}
     filenames = [filename for filename in os.listdir(parsers_root) if filename.endswith('.py') and '__' not in filename]
     for filename in filenames:
@@ -49,12 +71,99 @@ def get_parsers(parsers_root: str) -> Dict[str, ParserImport]:
     return parsers
 
 
-def parse_file(file: bytes, path: FullPath, circle_id: int, get_location: Callable[[str, str, int, int], str]) -> ParserOutput:
-    """Parses a file and returns the output"""
-    parsers = get_parsers(PARSERS_ROOT)
+class ParserRegistry:
+    """Parsers by extension, the module of a parser being only imported when its extension is first requested.
+    Extensions are looked up in a manifest (extension to module), then in the entry points of a group (see
+    ENTRY_POINT_GROUP), which are only read if an extension is not in the manifest."""
+    def __init__(self, manifest: Dict[str, str] = PARSERS_MANIFEST, group: str = ENTRY_POINT_GROUP):
+        self.manifest = dict(manifest)
+        self.group = group
+        self.parsers: Dict[str, Optional[ParserImport]] = {}
+        self.entry_points: Optional[Dict[str, str]] = None
+
+
+    def get(self, extension: str) -> Optional[ParserImport]:
+        """Parser of an extension, None if no parser is declared for it"""
+        if extension in self.parsers:
+            return self.parsers[extension]
+        target = self.manifest.get(extension) or self.declared().get(extension)
+        parser_import = None
+        if target is not None:
+            module_name, _, function = target.partition(':')
+            try:
+                module = importlib.import_module(module_name)
+            except Exception as e:
+                logger.exception(f'Could not import parser {target}: {e}')
+            else:
+                parser_import = call_get_parser(module, function or 'get_parser', target)
+        self.parsers[extension] = parser_import
+        return parser_import
+
+
+    def add(self, parser_import: ParserImport):
+        """Registers a parser for its extensions, over the declared ones"""
+        for ext in parser_import.extensions:
+            self.parsers[ext] = parser_import
+
+
+    def declared(self) -> Dict[str, str]:
+        """Targets of the entry points of the group by extension, read on the first call"""
+        if self.entry_points is None:
+            from importlib.metadata import entry_points
+            if sys.version_info >= (3, 10):
+                found = entry_points(group=self.group)
+            else:
+                found = entry_points().get(self.group, ())
+            self.entry_points = {entry_point.name: entry_point.value for entry_point in found}
+        return self.entry_points
+
+
+# Registry used by create_parser
+PARSERS = ParserRegistry()
+
+def create_parser(file: bytes, path: FullPath, circle_id: int, get_location: Callable, **options) -> Parser:
+    """Creates the parser corresponding to the extension of the file"""
     extension = os.path.basename(path.path).split('.')[-1]
-    if extension not in parsers:
+    parser_import = PARSERS.get(extension)
+    if parser_import is None:
         raise NoParserError(path, extension)
-    parser = parsers[extension].parser(file, path, circle_id, get_location)
-    output = parser.parse()
-    return output
\ No newline at end of file
+    return parser_import.parser(file, path, circle_id, get_location, **options)
+
+
+def parse_file(file: bytes, path: FullPath, circle_id: int, get_location: Callable[[str, str, int, int], str],
+               disk_cache: DiskCache = None, **options) -> ParserOutput:
+    """Parses a file and returns the output
+    disk_cache: persistent cache, the output is taken from it if neither the file nor any file it depends on changed
+        (and, if a dependency_index option is given, if the references of the file are already recorded in it)
+    options are given as keyword arguments to the parser (e.g. template_cache for .pl files)"""
+    if disk_cache is not None:
+        key = disk_cache.key(file, path, circle_id, options)
+        dependency_index = options.get('dependency_index')
+        output = disk_cache.get(key, get_location) if dependency_index is None or path in dependency_index else None
+        if output is not None:
+            return output
+        get_location = RecordingGetLocation(get_location)
+    output = create_parser(file, path, circle_id, get_location, **options).parse()
+    if disk_cache is not None:
+        disk_cache.put(key, get_location.calls, output)
+    return output
+
+
+def validate_file(file: bytes, path: FullPath, circle_id: int = 0, **options) -> List[ParserException]:
+    """Checks a file without resolving any URI nor evaluating any value (see Parser.validate), and returns every
+    error found, an empty list if the file is valid. options are given as keyword arguments to the parser"""
+    return create_parser(file, path, circle_id, None, **options).validate()
+
+
+def parse_file_stream(stream: Union[BinaryIO, Iterable[bytes]], path: FullPath, circle_id: int,
+                      get_location: Callable[[str, str, int, int], LocationResult], **options) -> ParserOutput:
+    """Parses a file read from stream (a binary file object or an iterable of byte chunks) without loading it
+    as a whole, see Parser.parse_stream. There is no disk cache, its keys depend on the whole contents of files"""
+    return create_parser(None, path, circle_id, get_location, **options).parse_stream(stream)
+
+
+async def async_parse_file(file: bytes, path: FullPath, circle_id: int, get_location: Callable[[str, str, int, int], Awaitable[LocationResult]],
+                           **options) -> ParserOutput:
+    """Parses a file with a coroutine function as get_location, without blocking the event loop while resolving URIs
+    options are given as keyword arguments to the parser"""
+    return await create_parser(file, path, circle_id, get_location, **options).parse_async()
@@ -65,7 +65,7 @@ class ParserInheritanceLoopError(ParserException):
         self.path = path
     
     def __str__(self):
-        return f'{self.path}: Infinite inheritance loop detected, inheritance traceback is:' + ', '.join(self.inheritances)
+        return f'{self.path}: Infinite inheritance loop detected, inheritance traceback is: ' + ', '.join(str(path) for path in self.inheritances)
     
 class ParserMissingKey(ParserException):
     """Represents missing mandatory key"""
@@ -84,4 +84,14 @@ class NoParserError(ParserException):
         self.path = path
     
     def __str__(self):
-        return f'{self.path}: No parser for extension .{self.extension}'
\ No newline at end of file
+        return f'{self.path}: No parser for extension .{self.extension}'
+
+class ParserUnexpectedError(ParserException):
+    """Represents an error other than a ParserException raised while reading or parsing a file in a batch (e.g. an
+    OSError, or a TypeError from values of the wrong types), reported with its text instead of stopping the batch"""
+    def __init__(self, path: FullPath, error: str):
+        self.path = path
+        self.error = error
+
+    def __str__(self):
+        return f'{self.path}: {self.error}'
@@ -0,0 +1,145 @@
+from typing import Callable, List, Optional
+import mmap
+import os
+import stat
+import posixpath
+import sqlite3
+import threading
+
+from platonparser.parser.cache import LRUCache
+from platonparser.parser.utils import FullPath, LocationRequest, LocationResult
+
+
+class BatchResolver:
+    """Turns a function resolving a list of LocationRequests into a get_location function,
+    usable one URI at a time by callers that do not know about batches"""
+    def __init__(self, get_locations: Callable[[List[LocationRequest]], List[Optional[LocationResult]]]):
+        self.get_locations = get_locations
+
+
+    def __call__(self, uri: str, working_directory: str, resource_id: int, circle_id: int) -> Optional[LocationResult]:
+        return self.get_locations([LocationRequest(uri, working_directory, resource_id, circle_id)])[0]
+
+
+class SQLiteResolver:
+    """Reference resolver whose files are stored in an SQLite database, resolving a whole batch of URIs in one query.
+
+    A file is identified by its resource id and its absolute path inside that resource ('/dir/file.pl').
+    URIs are paths relative to the working directory, or absolute inside the resource of the parsed file.
+    """
+    SCHEMA = '''CREATE TABLE IF NOT EXISTS files (
+        resource_id INTEGER NOT NULL,
+        path TEXT NOT NULL,
+        circle_id INTEGER NOT NULL,
+        contents BLOB NOT NULL,
+        PRIMARY KEY (resource_id, path))'''
+    # Bounded by the maximum number of variables of a statement of old SQLite versions (999)
+    BATCH_SIZE = 400
+
+    def __init__(self, database: str = ':memory:'):
+        self.connection = sqlite3.connect(database, check_same_thread=False)
+        self.connection.execute(self.SCHEMA)
+        self.lock = threading.Lock()
+        self.queries = 0
+
+
+    def add_file(self, resource_id: int, path: str, contents: bytes, circle_id: int = 0):
+        """Adds or replaces a file"""
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)', (resource_id, path, circle_id, contents))
+
+
+    def add_tree(self, root: str, resource_id: int, circle_id: int = 0):
+        """Adds every file of a directory tree, root being the / of the resource"""
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                with open(path, 'rb') as file:
+                    contents = file.read()
+                self.add_file(resource_id, '/' + os.path.relpath(path, root).replace(os.sep, '/'), contents, circle_id)
+
+
+    @staticmethod
+    def target(request: LocationRequest) -> Optional[FullPath]:
+        """FullPath the request refers to, None for URIs this resolver does not support (e.g. lib:file)"""
+        if ':' in request.uri: return None
+        return FullPath(request.resource_id, posixpath.normpath(posixpath.join('/', request.working_directory, request.uri)))
+
+
+    def __call__(self, uri: str, working_directory: str, resource_id: int, circle_id: int) -> Optional[LocationResult]:
+        return self.get_locations([LocationRequest(uri, working_directory, resource_id, circle_id)])[0]
+
+
+    def get_locations(self, requests: List[LocationRequest]) -> List[Optional[LocationResult]]:
+        """Resolves requests with one query per BATCH_SIZE distinct files"""
+        targets = [self.target(request) for request in requests]
+        found = {}
+        wanted = list({target for target in targets if target is not None})
+        for start in range(0, len(wanted), self.BATCH_SIZE):
+            found.update(self.fetch(wanted[start:start + self.BATCH_SIZE]))
+        return [found.get(target) for target in targets]
+
+
+    def fetch(self, paths: List[FullPath]):
+        conditions = ' OR '.join(['(resource_id = ? AND path = ?)'] * len(paths))
+        parameters = [value for path in paths for value in path]
+        with self.lock:
+            self.queries += 1
+            rows = self.connection.execute(f'SELECT resource_id, path, circle_id, contents FROM files WHERE {conditions}', parameters).fetchall()
+        return {FullPath(resource_id, path): LocationResult(contents, FullPath(resource_id, path), circle_id)
+                for resource_id, path, circle_id, contents in rows}
+
+
+class MappedFileResolver:
+    """get_location function for local files, resolving URIs like base_get_location but returning the contents of
+    files of at least min_size bytes as read-only memoryviews of memory-mapped files instead of bytes copies (mapping
+    smaller files saves nothing). The parser only decodes them when a value is loaded from a file, in lazy mode when
+    the value is evaluated.
+
+    A mapped file must not be truncated or rewritten in place while its contents are in use: reading the pages past
+    its new end kills the process with SIGBUS, which Python cannot catch. Files replaced atomically (written to a new
+    file then renamed, as git and most editors do) are safe, a mapping keeps the file it was made from.
+
+    Results are cached while the size, modification time and inode of a file are unchanged, so a file referenced
+    many times is only read or mapped once. Directories and other non regular files are not resolved.
+    At most maxsize results are cached (each mapping holds a file descriptor and counts in vm.max_map_count): the
+    mappings of the least recently used ones are dropped, and unmapped once no parser or output uses them anymore.
+    """
+    def __init__(self, maxsize: int = 1024, min_size: int = 2 ** 16):
+        self.results = LRUCache(maxsize)
+        self.min_size = min_size
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+
+    def __call__(self, uri: str, working_directory: str, resource_id: int, circle_id: int) -> Optional[LocationResult]:
+        path = uri if os.path.isabs(uri) else os.path.abspath(os.path.join(working_directory, uri))
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode): return None
+        signature = (st.st_size, st.st_mtime_ns, st.st_ino)
+
+        with self.lock:
+            cached = self.results.get(path)
+            if cached is not None and cached[0] == signature:
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+            with open(path, 'rb') as file:
+                # Empty files cannot be mapped
+                if st.st_size and st.st_size >= self.min_size:
+                    contents = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+                else:
+                    contents = file.read()
+            result = LocationResult(contents, FullPath(-1, path), -1)
+            self.results.put(path, (signature, result))
+            return result
+
+
+    def clear(self):
+        """Forgets every mapping, they are unmapped once no output or parser uses them anymore"""
+        with self.lock:
+            self.results.clear()
@@ -0,0 +1,290 @@
+from copy import deepcopy
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from platonparser.parser.cache import TemplateCache
+from platonparser.parser.parser_exceptions import ParserInvalidFile, ParserMissingKey
+from platonparser.parser.utils import FullPath, LocationResult, ParserOutput, ParserWarning, flatten, recursive_update
+from platonparser.parsers.pl import PLParser, END_MULTI_LINE, MANDATORY_KEYS, classify_line
+
+# Kinds of lines writing a key of the data section
+KEYED_KINDS = ('from_file', 'url', 'component', 'one_line', 'multi_line')
+
+
+@dataclass(eq=False)
+class Statement:
+    """Lines of a file parsed together: a single line, or a whole multiline block.
+    Keeps what parsing it last added to the output besides data"""
+    start: int # Index of the first line
+    length: int
+    kind: Optional[str] # None if the line does not correspond to any pattern
+    key: Optional[str] = None
+    closed: bool = True # False for a multiline block going on until the end of the file
+    roots: Tuple[str, ...] = () # Top level keys of the data section written by the statement
+    template: Optional[ParserOutput] = None # Output of the inherited file of an extends statement
+    dependencies: Set[Tuple[FullPath, str]] = field(default_factory=set)
+    comments: List[str] = field(default_factory=list)
+    warnings: List[ParserWarning] = field(default_factory=list)
+
+
+def segment(lines: List[str], start: int = 0) -> Iterator[Statement]:
+    """Splits lines into statements, from the line at index start (which must not be inside a multiline block)"""
+    count = len(lines)
+    while start < count:
+        kind, match = classify_line(lines[start])
+        statement = Statement(start, 1, kind)
+        if kind in KEYED_KINDS:
+            statement.key = match.group('key')
+            statement.roots = (statement.key.split('.', 1)[0],)
+        if kind == 'multi_line':
+            end = start + 1
+            while end < count and END_MULTI_LINE.match(lines[end]) is None:
+                end += 1
+            statement.closed = end < count
+            statement.length = min(end + 1, count) - start
+        yield statement
+        start += statement.length
+
+
+def has_key(data: Dict[str, Any], key: str) -> bool:
+    """Checks if a dotted key exists in a nested dictionary"""
+    for k in key.split('.'):
+        if type(data) != dict or k not in data: return False
+        data = data[k]
+    return True
+
+
+class SessionParser(PLParser):
+    """PLParser keeping the output of the file inherited by the last extends line it parsed, with flattened data"""
+    template = None
+
+    def extends_line_match(self, match):
+        template = self.load_template(match)
+        self.template = replace(template, data=flatten(template.data))
+        self.output.merge_output(deepcopy(self.template))
+
+
+class PLSession:
+    """Incremental parse of a .pl file being edited.
+
+    The file is kept split into statements (see Statement), indexed by the top level keys they write. After an edit,
+    only the statements around the edited lines are classified again, and only the top level keys written by
+    the old or new statements are rebuilt, by parsing again the statements writing them. Files resolved and
+    inherited are kept from a parse to the other (see refresh). Edits of extends lines, lines not corresponding
+    to any pattern and unclosed multiline blocks lead to a parse of the whole file.
+
+    The output is the same as the one of parse_file on the edited contents, ParserExceptions are raised
+    the same way.
+    """
+    def __init__(self, file: bytes, path: FullPath, circle_id: int, get_location: Callable[[str, str, int, int], LocationResult],
+                 check_mandatory_keys=True, template_cache: TemplateCache = None):
+        """file, path, circle_id, get_location, check_mandatory_keys: same as PLParser
+        template_cache: cache of the outputs of inherited files, a new one is used if not given
+        """
+        try:
+            self.lines = str(file, encoding='utf-8').split('\n')
+        except UnicodeError:
+            raise ParserInvalidFile(path)
+        self.path = path
+        self.circle_id = circle_id
+        self.resolve = get_location
+        self.check_mandatory_keys = check_mandatory_keys
+        self.template_cache = TemplateCache() if template_cache is None else template_cache
+        self.locations: Dict[Tuple, LocationResult] = {}
+        self.statements: List[Statement] = []
+        self.roots: Dict[str, List[Statement]] = {}
+        self.output = ParserOutput(path, circle_id, 'pl')
+        self.valid = False
+        self.parser = None
+
+
+    @property
+    def text(self) -> str:
+        """Current contents of the file"""
+        return '\n'.join(self.lines)
+
+
+    def get_location(self, uri: str, working_directory: str, resource_id: int, circle_id: int) -> LocationResult:
+        """get_location remembering its results until refresh is called"""
+        args = (uri, working_directory, resource_id, circle_id)
+        result = self.locations.get(args)
+        if result is None:
+            result = self.locations[args] = self.resolve(*args)
+        return result
+
+
+    def parse(self) -> ParserOutput:
+        """Parses the whole file and returns the output"""
+        self.valid = False
+        self.parser = SessionParser(b'', self.path, self.circle_id, self.get_location, check_mandatory_keys=self.check_mandatory_keys,
+                                    template_cache=self.template_cache)
+        self.statements = list(segment(self.lines))
+        self.output = ParserOutput(self.path, self.circle_id, 'pl')
+        self.roots = {}
+        for statement in self.statements:
+            self.run(statement, self.output.data)
+            for root in statement.roots:
+                self.roots.setdefault(root, []).append(statement)
+        self.collect()
+        self.parser.output = self.output
+        self.parser.finish()
+        self.valid = True
+        return self.output
+
+
+    def refresh(self) -> ParserOutput:
+        """Parses the whole file again, resolving again every referenced file"""
+        self.locations.clear()
+        return self.parse()
+
+
+    def edit(self, start_line: int, start_column: int, end_line: int, end_column: int, text: str) -> ParserOutput:
+        """Replaces the text between two positions (line and column indexes, starting at 0) by text and
+        returns the updated output"""
+        lines = self.lines
+        if not (0 <= start_line <= end_line < len(lines)):
+            raise ValueError(f'Lines {start_line} to {end_line} are out of the file')
+        new_lines = (lines[start_line][:start_column] + text + lines[end_line][end_column:]).split('\n')
+        if not self.valid:
+            lines[start_line:end_line + 1] = new_lines
+            return self.parse()
+
+        first = self.statement_index(start_line)
+        last = self.statement_index(end_line)
+        end = self.statements[last].start + self.statements[last].length
+        lines[start_line:end_line + 1] = new_lines
+        delta = len(new_lines) - (end_line - start_line + 1)
+
+        # Classifies lines again until the statements are the same as before the edit
+        added = []
+        following = last + 1
+        for statement in segment(lines, self.statements[first].start):
+            added.append(statement)
+            position = statement.start + statement.length
+            while following < len(self.statements) and self.statements[following].start + delta < position:
+                following += 1
+            if position >= end + delta and following < len(self.statements) and self.statements[following].start + delta == position:
+                break
+        else:
+            following = len(self.statements)
+        removed = self.statements[first:following]
+        shifted = False
+        if delta:
+            for statement in self.statements[following:]:
+                statement.start += delta
+                # Warnings of inherited files are about lines of those files
+                if statement.warnings and statement.template is None:
+                    statement.warnings = [replace(w, line=w.line + delta) for w in statement.warnings]
+                    shifted = True
+        self.statements[first:following] = added
+
+        if any(s.kind in ('extends', None) or not s.closed for s in removed + added):
+            return self.parse()
+        try:
+            self.update(removed, added, shifted)
+        except Exception:
+            # Raises the error of the first line in the file, which may not be the one found
+            return self.parse()
+        if self.check_mandatory_keys:
+            for key in MANDATORY_KEYS:
+                if key not in self.output.data: raise ParserMissingKey(self.path, key)
+        return self.output
+
+
+    def update(self, removed: List[Statement], added: List[Statement], shifted: bool = False):
+        """Rebuilds the top level keys written by statements replaced by others
+        shifted: warnings of statements following them were moved to other lines"""
+        roots = {}
+        for statement in removed + added:
+            for root in statement.roots:
+                if root not in roots:
+                    statements = self.roots.get(root)
+                    roots[root] = statements[0] if statements else None
+        for statement in removed:
+            for root in statement.roots:
+                self.roots[root] = [s for s in self.roots[root] if s is not statement]
+        changed = shifted or any(s.dependencies or s.comments or s.warnings for s in removed)
+        for statement in added:
+            if not statement.roots:
+                changed = self.run(statement, {}) or changed
+            for root in statement.roots:
+                self.roots.setdefault(root, []).append(statement)
+
+        # Top level keys are ordered by the first statement writing them, as in a full parse,
+        # they only have to be ordered again if the first statement of one of them moved
+        data = self.output.data
+        reorder = False
+        for root, first in roots.items():
+            statements = self.roots[root]
+            statements.sort(key=lambda s: s.start)
+            rebuilt = {}
+            for statement in statements:
+                if statement.template is not None:
+                    recursive_update(rebuilt, {root: deepcopy(statement.template.data[root])})
+                else:
+                    changed = self.run(statement, rebuilt) or changed
+            if root in rebuilt:
+                data[root] = rebuilt[root]
+                moved = statements[0] is not first and not (first in removed and statements[0].start == first.start)
+                reorder = reorder or moved
+            else:
+                data.pop(root, None)
+                del self.roots[root]
+        if reorder:
+            self.output.data = {root: data[root] for root in sorted(data, key=self.root_position)}
+        if changed:
+            self.collect()
+
+
+    def run(self, statement: Statement, data: Dict[str, Any]) -> bool:
+        """Parses a statement, writing into data. Returns True if its dependencies, comments or warnings changed"""
+        previous = (statement.dependencies, statement.comments, statement.warnings)
+        statement.dependencies, statement.comments, statement.warnings = set(), [], []
+        self.parser.output = ParserOutput(self.path, self.circle_id, 'pl', statement.dependencies, statement.comments,
+                                          statement.warnings, data)
+        self.parser.parse_lines(self.lines[statement.start:statement.start + statement.length], statement.start + 1)
+        if statement.kind == 'extends':
+            statement.template = self.parser.template
+            statement.roots = tuple(statement.template.data)
+        return previous != (statement.dependencies, statement.comments, statement.warnings)
+
+
+    def collect(self):
+        """Gathers dependencies, comments and warnings of the statements in the output"""
+        output = self.output
+        output.dependencies = set().union(*(s.dependencies for s in self.statements if s.dependencies))
+        output.comments = [c for s in self.statements if s.comments for c in s.comments]
+        output.warnings = [w for s in self.statements if s.warnings for w in s.warnings]
+
+
+    def statement_index(self, line: int) -> int:
+        """Index of the statement the line at the given index is part of"""
+        low, high = 0, len(self.statements) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.statements[middle].start <= line:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+
+    def root_position(self, root: str) -> Tuple[int, int]:
+        """Position of a top level key in the data section of a full parse"""
+        statement = self.roots[root][0]
+        if statement.template is None:
+            return statement.start, 0
+        return statement.start, list(statement.template.data).index(root)
+
+
+    def origin(self, key: str) -> Optional[Tuple[FullPath, Optional[int]]]:
+        """Returns the path of the file and the number of the line of the statement that last wrote key (or a key
+        inside it). If the value was inherited, the path is the one of the inherited file and the line number None.
+        Returns None if no statement wrote key"""
+        for statement in reversed(self.roots.get(key.split('.', 1)[0], ())):
+            if statement.template is not None:
+                if has_key(statement.template.data, key):
+                    return statement.template.path, None
+            elif statement.key == key or key.startswith(statement.key + '.') or statement.key.startswith(key + '.'):
+                return self.path, statement.start + 1
+        return None
@@ -1,9 +1,17 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Set, Tuple, Callable
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Callable, Union
 from abc import ABC, abstractmethod
 from collections import namedtuple
+from collections.abc import MutableMapping
+from copy import deepcopy
+from functools import partial
+import codecs
+import json
+import marshal
 import os.path
+import struct
+import sys
 
 def base_get_location(uri: str, working_directory: str, resource_id: int, circle_id: int) -> LocationResult:
     """Simple get_location function, URIs are simple file paths, nothing else"""
@@ -16,12 +24,41 @@ def base_get_location(uri: str, working_directory: str, resource_id: int, circle
         contents = file.read()
     return LocationResult(contents, FullPath(-1, path), -1)
 
+def iter_lines(stream: Union[BinaryIO, Iterable[bytes]], chunk_size: int = 2 ** 16) -> Iterator[str]:
+    """Decodes a binary file object (read chunk_size bytes at a time) or an iterable of byte chunks as UTF-8, and yields
+    its lines without their newline character, like str.split('\\n'). Only the current chunk and line are kept in memory.
+    Raises UnicodeDecodeError when reaching invalid UTF-8"""
+    if hasattr(stream, 'read'):
+        stream = iter(partial(stream.read, chunk_size), b'')
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    parts = [] # Beginning of the current line
+    for chunk in stream:
+        text = decoder.decode(chunk)
+        if '\n' not in text:
+            parts.append(text)
+            continue
+        lines = text.split('\n')
+        parts.append(lines[0])
+        lines[0] = ''.join(parts)
+        parts = [lines.pop()]
+        yield from lines
+    parts.append(decoder.decode(b'', final=True))
+    yield ''.join(parts)
+
+# Options making dataclasses slotted (without a __dict__ per instance) where it is supported
+SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
 # FullPath represents a full path, composed of two segments: the resource id, and the relative path inside that resource.
 FullPath = namedtuple('FullPath', ['resource_id', 'path'])
 
-@dataclass
+# LocationRequest represents the arguments of a call to a get_location function.
+# A get_location function can also resolve many of them in a single call if it has a
+# get_locations(requests: List[LocationRequest]) -> List[LocationResult] method, results being in the same order
+LocationRequest = namedtuple('LocationRequest', ['uri', 'working_directory', 'resource_id', 'circle_id'])
+
+@dataclass(**SLOTS)
 class LocationResult:
-    """Represents the output of a get_location function"""
+    """Represents the output of a get_location function, file can be any bytes-like object (e.g. a memoryview)"""
     file: bytes
     path: FullPath
     circle_id: int
@@ -46,8 +83,49 @@ class Parser(ABC):
         """Parses the file and returns the output of that parse"""
         pass
 
+    async def parse_async(self) -> ParserOutput:
+        """Parses the file like parse, get_location being a coroutine function"""
+        raise NotImplementedError(f'{type(self).__name__} does not support asynchronous parsing')
 
-@dataclass
+    def parse_stream(self, stream: Union[BinaryIO, Iterable[bytes]]) -> ParserOutput:
+        """Parses the file read from stream (a binary file object or an iterable of byte chunks) instead of file"""
+        raise NotImplementedError(f'{type(self).__name__} does not support parsing streams')
+
+    def validate(self) -> List[Exception]:
+        """Checks the file without resolving any URI nor evaluating any value, returns every error found"""
+        raise NotImplementedError(f'{type(self).__name__} does not support validation')
+
+
+# Texts of the warnings, by code
+WARNING_MESSAGES = {
+    'overwrite': 'Overwriting existing value at key "{key}"',
+    'limit': '{size} more warnings were left out',
+}
+
+@dataclass(**SLOTS)
+class ParserWarning:
+    """Warning about a line of a parsed file, its text is only formatted when it is converted to str.
+    It keeps the size of the value concerned rather than the value, so that warnings cost the same whatever the values"""
+    code: str # Key of WARNING_MESSAGES
+    key: str
+    line: Optional[int]
+    path: Optional[FullPath] = None # File of the line
+    # Size of the overwritten value (see value_size), number of warnings left out for 'limit'.
+    # Not compared, values are not evaluated when parsing lazily
+    size: Optional[int] = field(default=None, compare=False)
+
+
+    def __str__(self):
+        return WARNING_MESSAGES[self.code].format(key=self.key, line=self.line, size=self.size)
+
+
+def value_size(value: Any) -> Optional[int]:
+    """Size of a value of the data section: length of a string, number of items of a container,
+    None for other values and values not evaluated yet"""
+    return len(value) if type(value) in SIZED else None
+
+
+@dataclass(**SLOTS)
 class ParserOutput:
     """Represents the output of a parser"""
     # Metadata
@@ -56,32 +134,360 @@ class ParserOutput:
     format: str
     dependencies: Set[Tuple[FullPath, str]] = field(default_factory=set) # Tuples (path, alias)
     comments: List[str] = field(default_factory=list)
-    warnings: List[str] = field(default_factory=list)
+    warnings: List[ParserWarning] = field(default_factory=list)
     data: Dict[str, Any] = field(default_factory=dict)
 
+    # Header of the binary format of to_bytes: magic, version of the format and version of marshal
+    BINARY_MAGIC = b'PLO'
+    BINARY_VERSION = 3
+    BINARY_HEADER = BINARY_MAGIC + struct.pack('BB', BINARY_VERSION, marshal.version)
+
+
+    def to_bytes(self) -> bytes:
+        """Serializes the output in a compact binary format (marshal behind a versioned header), restored with from_bytes.
+        LayeredDicts are flattened and LazyValues resolved.
+        Raises ValueError if the data contains a value that is not a Python literal"""
+        try:
+            return self.BINARY_HEADER + marshal.dumps(self.binary_fields())
+        except ValueError:
+            return self.BINARY_HEADER + marshal.dumps(self.binary_fields(plain=True))
+
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> ParserOutput:
+        """Deserializes an output serialized with to_bytes (by the same class), FullPaths are restored.
+        Raises ValueError if data was not written by the same version of the format and of marshal.
+        Like marshal, it must only be used on trusted data"""
+        header = len(cls.BINARY_HEADER)
+        if bytes(data[:header]) != cls.BINARY_HEADER:
+            raise ValueError('Not a parser output, or one serialized by another version of the format or of Python')
+        return cls.from_binary_fields(marshal.loads(memoryview(data)[header:]))
+
+
+    def binary_fields(self, plain: bool = False) -> tuple:
+        """Fields of the output as values marshal supports, see to_bytes
+        plain: the data is converted with plain_value"""
+        dependencies = {(tuple(path), alias) for path, alias in self.dependencies}
+        warnings = [(w.code, w.key, w.line, w.path and tuple(w.path), w.size) for w in self.warnings]
+        data = plain_value(self.data) if plain else self.data
+        return (tuple(self.path), self.circle_id, self.format, dependencies, self.comments, warnings, data)
 
-    def merge_output(self, output: ParserOutput):
-        """Merge an output into current output"""
+
+    @classmethod
+    def from_binary_fields(cls, fields: tuple) -> ParserOutput:
+        """Output from the values returned by binary_fields"""
+        path, circle_id, format, dependencies, comments, warnings, data = fields
+        dependencies = {(FullPath(*path), alias) for path, alias in dependencies}
+        warnings = [ParserWarning(code, key, line, path and FullPath(*path), size) for code, key, line, path, size in warnings]
+        return cls(FullPath(*path), circle_id, format, dependencies, comments, warnings, data)
+
+
+    def merge_output(self, output: ParserOutput, layered: bool = False, comments: bool = True, warnings: bool = True):
+        """Merge an output into current output
+        layered: if True, the data of output is laid over the current data without being copied (see LayeredDict),
+            it must not be modified afterwards
+        comments, warnings: if False, the comments or warnings of output are left out
+        """
         self.dependencies |= output.dependencies
-        self.comments.extend(output.comments)
-        self.warnings.extend(output.warnings)
-        recursive_update(self.data, output.data)
+        if comments: self.comments.extend(output.comments)
+        if warnings: self.warnings.extend(output.warnings)
+        if layered:
+            self.data = LayeredDict.overlay(self.data, output.data)
+        else:
+            recursive_update(self.data, output.data)
 
 def recursive_update(curr_dict: dict, merge_dict: dict):
-    """Recursively updates a nested dictionary with another"""
+    """Recursively updates a nested dictionary with another. LazyValues are only resolved if they have to be
+    merged with a dictionary"""
     for key, value in merge_dict.items():
         if key not in curr_dict:
             curr_dict[key] = value
         else:
-            if type(value) == dict and type(curr_dict[key]) == dict:
-                recursive_update(curr_dict[key], value)
+            current = curr_dict[key]
+            if type(current) in MERGEABLE and type(value) in MERGEABLE:
+                current = curr_dict[key] = resolve_value(current)
+                value = resolve_value(value)
+            if type(value) == dict and type(current) == dict:
+                recursive_update(current, value)
             else:
                 curr_dict[key] = value
 
 
+class LazyValue:
+    """Value whose evaluation is deferred until it is needed. It is evaluated at most once"""
+    __slots__ = ('evaluate', 'expr', 'value')
+
+    def __init__(self, evaluate: Callable[[Any], Any], expr: Any):
+        self.evaluate = evaluate
+        self.expr = expr
+        self.value = None
+
+
+    def resolve(self) -> Any:
+        """Evaluates the value if it was not already, and returns it"""
+        if self.evaluate is not None:
+            self.value = self.evaluate(self.expr)
+            self.evaluate = self.expr = None
+        return self.value
+
+
+    def __repr__(self):
+        return repr(self.resolve())
+
+
+# Marks a key deleted from a LayeredDict while still being in its layers
+_DELETED = object()
+# Keeps the position of a key in a flattened dictionary until the value replacing the one of the layers is merged
+_RESERVED = object()
+
+class LayeredDict(MutableMapping):
+    """Dictionary laid over read-only layers (dictionaries, the upper ones first) without copying them, as if the layers
+    had been merged from the lowest to the uppermost one with recursive_update, and the dictionary after them.
+
+    A layer may be the dictionary of another LayeredDict, laid over some of the following layers when it was written:
+    spans[i] is the number of layers following layers[i] whose values it replaces instead of being merged with them,
+    as assignments of a file replace the values of the files it inherited from so far, but not the ones of the files
+    inheriting from it. The dictionary itself replaces the values of all of the layers.
+
+    Values are looked up in the dictionary, then in the layers. If the uppermost layer having a key has a dictionary for
+    it, the value is a LayeredDict laid over the dictionaries of the following layers having the key, until one has
+    another value for it. Writes only go to the dictionary of the LayeredDict (copy on write), which is also where the
+    LayeredDicts of nested dictionaries and copies of the other mutable values read from the layers are kept, so that
+    neither writing in them nor modifying them ever modifies the layers.
+    A key of the layers deleted then set again keeps its position in the keys, unlike in a dictionary.
+    """
+    __slots__ = ('own', 'layers', 'spans')
+
+    def __init__(self, own: Dict[str, Any] = None, layers: Tuple[Dict[str, Any], ...] = (), spans: Tuple[int, ...] = None):
+        self.own = {} if own is None else own
+        self.layers = layers
+        self.spans = (0,) * len(layers) if spans is None else spans
+
+
+    @staticmethod
+    def overlay(data: Dict[str, Any], upper: Dict[str, Any]) -> LayeredDict:
+        """Returns a LayeredDict laying upper over data, as if upper was merged into data with recursive_update"""
+        return LayeredDict({}, _layers(upper) + _layers(data), _spans(upper) + _spans(data))
+
+
+    def lookup(self, key: str, store: bool = True) -> Any:
+        """Returns the value of a key, the LayeredDict of a nested dictionary or the copy of another mutable value
+        read from the layers is kept if store is True. Raises KeyError if there is none"""
+        own = self.own
+        if key in own:
+            value = own[key]
+            if value is _DELETED: raise KeyError(key)
+            return value
+        layers, spans = self.layers, self.spans
+        values, value_spans = (), ()
+        i, count = 0, len(layers)
+        while i < count:
+            layer = layers[i]
+            if key not in layer:
+                i += 1
+                continue
+            value = layer[key]
+            i += 1 + spans[i]
+            if value is _DELETED: continue
+            if type(value) is LazyValue and (values or any(type(l.get(key)) in MERGEABLE for l in layers[i:])):
+                value = value.resolve()
+            if type(value) not in DICTS:
+                if values: break
+                if type(value) not in IMMUTABLE and type(value) is not LazyValue:
+                    value = flatten(value)
+                    if store: own[key] = value
+                return value
+            values += _layers(value)
+            value_spans += _spans(value)
+        if not values: raise KeyError(key)
+        value = LayeredDict({}, values, value_spans)
+        if store: own[key] = value
+        return value
+
+
+    __getitem__ = lookup
+
+
+    def __setitem__(self, key: str, value: Any):
+        self.own[key] = value
+
+
+    def __delitem__(self, key: str):
+        if key not in self: raise KeyError(key)
+        self.own[key] = _DELETED
+
+
+    def __contains__(self, key: str) -> bool:
+        if key in self.own: return self.own[key] is not _DELETED
+        layers, spans = self.layers, self.spans
+        i, count = 0, len(layers)
+        while i < count:
+            layer = layers[i]
+            if key in layer:
+                if layer[key] is not _DELETED: return True
+                i += 1 + spans[i]
+            else:
+                i += 1
+        return False
+
+
+    def __iter__(self):
+        # Keys are ordered as they would be in a dictionary merged from the layers
+        layers = (self.own,) + self.layers
+        if any(_DELETED in layer.values() for layer in layers):
+            keys = {}
+            _merge_layers(keys, layers, (len(self.layers),) + self.spans, 0, len(layers), keys_only=True)
+            return iter(keys)
+        keys = {}
+        for layer in reversed(layers):
+            keys.update(dict.fromkeys(layer))
+        return iter(keys)
+
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+    def flatten(self) -> Dict[str, Any]:
+        """Returns the content as nested dictionaries, sharing no mutable value with the layers"""
+        data = {}
+        layers = (self.own,) + self.layers
+        _merge_layers(data, layers, (len(self.layers),) + self.spans, 0, len(layers))
+        return data
+
+
+    def __repr__(self):
+        return repr(self.flatten())
+
+
+def _layers(data: Dict[str, Any]) -> Tuple[Dict[str, Any], ...]:
+    """Layers of data, uppermost first"""
+    return (data.own,) + data.layers if type(data) is LayeredDict else (data,)
+
+
+def _spans(data: Dict[str, Any]) -> Tuple[int, ...]:
+    """Spans of the layers of data (see LayeredDict)"""
+    return (len(data.layers),) + data.spans if type(data) is LayeredDict else (0,)
+
+
+def _merge_layers(data: Dict[str, Any], layers: Tuple[Dict[str, Any], ...], spans: Tuple[int, ...], start: int, end: int,
+                  replaced: Set[str] = frozenset(), keys_only: bool = False):
+    """Merges layers[start:end] into data like recursive_update from the lowest to the uppermost, flattening what is
+    taken from them. The replaced keys (the ones of the layers laid over them) are left out, their position being kept.
+    If keys_only is True, only the keys are merged (see LayeredDict.__iter__)"""
+    starts = []
+    while start < end:
+        starts.append(start)
+        start += 1 + spans[start]
+    for i in reversed(starts):
+        layer, span = layers[i], spans[i]
+        if span:
+            _merge_layers(data, layers, spans, i + 1, i + 1 + span, replaced | layer.keys() if replaced else layer.keys(), keys_only)
+        for key, value in layer.items():
+            if key in replaced:
+                if key not in data and value is not _DELETED: data[key] = _RESERVED
+                continue
+            if value is _DELETED:
+                if data.get(key) is _RESERVED: del data[key]
+                continue
+            if keys_only:
+                data[key] = None
+                continue
+            if key in data:
+                current = data[key]
+                if type(current) in MERGEABLE and type(value) in MERGEABLE:
+                    current = data[key] = resolve_value(current)
+                    value = resolve_value(value)
+                if type(current) is dict and type(value) in DICTS:
+                    _merge_layers(current, _layers(value), _spans(value), 0, len(value.layers) + 1 if type(value) is LayeredDict else 1)
+                    continue
+            data[key] = flatten(value)
+
+
+# Values that can be shared between a LayeredDict and its flattened copy
+IMMUTABLE = (str, int, float, bool, type(None), bytes)
+
+def flatten(value: Any) -> Any:
+    """Returns a copy of value with its LayeredDicts replaced by dictionaries, see LayeredDict.flatten"""
+    kind = type(value)
+    if kind in IMMUTABLE:
+        return value
+    if kind is LayeredDict:
+        return value.flatten()
+    if kind is dict:
+        return {k: flatten(v) for k, v in value.items()}
+    if kind is list:
+        return [flatten(v) for v in value]
+    return deepcopy(value)
+
+
+# Types of dictionaries of the data section of an output
+DICTS = (dict, LayeredDict)
+
+# Types of values whose size is their len in warnings
+SIZED = (str, bytes, list, tuple, dict, set, LayeredDict)
+
+# Types of values that may have to be merged as dictionaries
+MERGEABLE = (dict, LayeredDict, LazyValue)
+
+def resolve_value(value: Any) -> Any:
+    """Returns the value, resolved if it is a LazyValue"""
+    return value.resolve() if type(value) is LazyValue else value
+
+
+def plain_value(value: Any) -> Any:
+    """Returns a copy of value with its LayeredDicts flattened and its LazyValues resolved"""
+    kind = type(value)
+    if kind is LazyValue:
+        return plain_value(value.resolve())
+    if kind is LayeredDict:
+        return plain_value(value.flatten())
+    if kind is dict:
+        return {k: plain_value(v) for k, v in value.items()}
+    if kind is list:
+        return [plain_value(v) for v in value]
+    return value
+
+
+def resolve_lazy_value(data: dict, key: str, value: LazyValue) -> Any:
+    """Replaces the LazyValue of a key of a dictionary by its value, and returns what replaced it.
+    The LazyValue of a key of a LayeredDict may come from its layers, and be shared with other outputs (e.g. the
+    output of a template in a TemplateCache) along with its value: a dictionary is then replaced by a LayeredDict laid
+    over it, so that writing in it never modifies it"""
+    resolved = value.resolve()
+    if type(data) is LayeredDict and data.own.get(key) is not value:
+        resolved = LayeredDict({}, _layers(resolved), _spans(resolved)) if type(resolved) in DICTS else flatten(resolved)
+    data[key] = resolved
+    return resolved
+
+
+def resolve_lazy_values(data: dict):
+    """Replaces every LazyValue of a nested dictionary by its value"""
+    for key, value in data.items():
+        if type(value) is LazyValue:
+            resolve_lazy_value(data, key, value)
+        elif type(value) in DICTS:
+            resolve_lazy_values(value)
+
+
 @dataclass
 class ParserImport:
     """Used to import a parser from a file"""
     parser: type[Parser]
     file_type: str
-    extensions: Tuple[str]
\ No newline at end of file
+    extensions: Tuple[str]
+
+
+class ParserOutputEncoder(json.JSONEncoder):
+    """JSON encoder for parser outputs: sets are encoded as lists, warnings as their text and values JSON does not
+    support as their repr"""
+    def default(self, obj):
+        if isinstance(obj, (set, frozenset)):
+            return list(obj)
+        if isinstance(obj, ParserWarning):
+            return str(obj)
+        if isinstance(obj, LayeredDict):
+            return obj.flatten()
+        if isinstance(obj, ParserOutput):
+            return {f: getattr(obj, f) for f in obj.__dataclass_fields__}
+        return repr(obj)
@@ -0,0 +1,209 @@
+"""Watch mode: keeps the outputs of the files of a directory tree up to date as files change"""
+from dataclasses import dataclass
+from itertools import chain
+from typing import Callable, Dict, Iterable, Iterator, Optional, Set, Tuple
+import os
+import queue
+import time
+
+from platonparser.parser.batch import BatchResult, parse_affected, parse_tree
+from platonparser.parser.cache import TemplateCache
+from platonparser.parser.depindex import DependencyIndex
+from platonparser.parser.utils import FullPath, LocationResult, base_get_location
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+
+
+@dataclass
+class WatchEvent:
+    """Event emitted by a Watcher: a file was parsed ('parsed', the result having an output or an error)
+    or removed ('removed')"""
+    kind: str
+    result: BatchResult
+
+
+if Observer is not None:
+    class _QueueHandler(FileSystemEventHandler):
+        """Puts the paths of the files changed, created, moved or deleted in a queue, and the ones of the directories
+        created, moved or deleted (see Watcher.expand). Directories are modified whenever a file inside them is"""
+        def __init__(self, changes: queue.Queue):
+            self.changes = changes
+
+        def on_any_event(self, event):
+            if not event.is_directory or event.event_type in ('created', 'moved', 'deleted'):
+                self.changes.put(event.src_path)
+                if getattr(event, 'dest_path', None):
+                    self.changes.put(event.dest_path)
+
+
+class Watcher:
+    """Parses every file of a directory tree, then parses again the files that change and the files depending on them
+    (see DependencyIndex). Changes are detected with inotify (or the equivalent of the platform) if watchdog is installed,
+    else by polling the modification times and sizes of the files.
+
+    Paths are absolute with resource id -1, as the ones of base_get_location.
+    """
+    def __init__(self, root: str, circle_id: int = 0, get_location: Callable[[str, str, int, int], LocationResult] = base_get_location,
+                 extensions: Tuple[str, ...] = ('pl',), interval: float = 0.5, debounce: float = 0.2, max_workers: int = None,
+                 use_watchdog: bool = True, **options):
+        """root: root of the directory tree
+        interval: time between two polls of the tree, in seconds
+        debounce: changes are only handled once no file changed during that time, in seconds, so that a burst of saves
+            leads to a single parse of each file
+        max_workers: number of processes parsing the tree at start, see parse_tree
+        use_watchdog: use watchdog if it is installed, else always poll
+        options are given to parse_file
+        """
+        self.root = os.path.abspath(root)
+        self.circle_id = circle_id
+        self.get_location = get_location
+        self.suffixes = tuple('.' + ext for ext in extensions)
+        self.interval = interval
+        self.debounce = debounce
+        self.max_workers = max_workers
+        self.options = options
+        self.index = DependencyIndex()
+        self.template_cache = TemplateCache()
+        self.results: Dict[FullPath, BatchResult] = {}
+        self.files: Dict[str, Tuple[int, int]] = {}
+        self.observer = None
+        self.changes: Optional[queue.Queue] = None
+        if use_watchdog and Observer is not None:
+            self.changes = queue.Queue()
+            self.observer = Observer()
+            self.observer.schedule(_QueueHandler(self.changes), self.root, recursive=True)
+
+
+    def snapshot(self) -> Dict[str, Tuple[int, int]]:
+        """Modification time and size of every file of the tree"""
+        files = {}
+        pending = [self.root]
+        while pending:
+            try:
+                entries = os.scandir(pending.pop())
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        elif entry.is_file():
+                            stat = entry.stat()
+                            files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+                    except OSError:
+                        continue
+        return files
+
+
+    def start(self) -> Iterator[WatchEvent]:
+        """Parses every file of the tree with one of the extensions, in a pool of processes"""
+        if self.observer is not None:
+            self.observer.start()
+        else:
+            self.files = self.snapshot()
+        extensions = tuple(suffix[1:] for suffix in self.suffixes)
+        for result in parse_tree(self.root, self.circle_id, self.get_location, extensions, resource_id=-1, max_workers=self.max_workers,
+                                 dependency_index=self.index, **self.options):
+            self.results[result.path] = result
+            yield WatchEvent('parsed', result)
+
+
+    def stop(self):
+        """Stops watching the tree"""
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
+
+
+    def poll(self) -> Set[str]:
+        """Returns the paths of the files changed, created or deleted since the last poll"""
+        if self.observer is not None:
+            changes = set()
+            while True:
+                try:
+                    changes.add(os.path.abspath(self.changes.get_nowait()))
+                except queue.Empty:
+                    return changes
+        files = self.snapshot()
+        changes = {path for path, stat in files.items() if self.files.get(path) != stat}
+        changes.update(path for path in self.files if path not in files)
+        self.files = files
+        return changes
+
+
+    def wait(self) -> Set[str]:
+        """Waits for changes, and returns them once no file changed during the debounce time"""
+        changes = set()
+        while not changes:
+            if self.observer is not None:
+                try:
+                    changes.add(os.path.abspath(self.changes.get(timeout=self.interval)))
+                except queue.Empty:
+                    continue
+            else:
+                time.sleep(self.interval)
+            changes |= self.poll()
+        while True:
+            time.sleep(self.debounce)
+            burst = self.poll()
+            if not burst:
+                return changes
+            changes |= burst
+
+
+    def expand(self, paths: Iterable[str]) -> Set[str]:
+        """Replaces the directories among the changed paths by the files under them: the files they contain, and the
+        files parsed or referenced under them before they were moved or deleted"""
+        paths = set(paths)
+        if all(os.path.isfile(path) for path in paths):
+            return paths
+        known = {path.path for path in chain(self.results, self.index.forward, self.index.reverse)}
+        files = set()
+        for path in paths:
+            if os.path.isfile(path):
+                files.add(path)
+                continue
+            if os.path.isdir(path):
+                files.update(os.path.join(dirpath, filename) for dirpath, _, filenames in os.walk(path) for filename in filenames)
+            else:
+                files.add(path) # Deleted file or directory
+            prefix = os.path.join(path, '')
+            files.update(known_path for known_path in known if known_path.startswith(prefix))
+        return files
+
+
+    def update(self, paths: Iterable[str]) -> Iterator[WatchEvent]:
+        """Parses again the changed files with one of the extensions and the files depending on the changed files.
+        Changed directories count as changes of every file under them"""
+        changed = set()
+        for path in self.expand(paths):
+            fullpath = FullPath(-1, path)
+            changed.add(fullpath)
+            if not path.endswith(self.suffixes):
+                continue
+            if os.path.isfile(path):
+                self.index.add_root(fullpath, self.circle_id)
+            elif fullpath in self.results:
+                del self.results[fullpath]
+                if fullpath in self.index: self.index.remove(fullpath)
+                yield WatchEvent('removed', BatchResult(fullpath))
+        # Cached templates inheriting from changed files are out of date, discarded instead of being found so when replayed
+        self.template_cache.discard_paths(self.index.affected_by(*changed) | changed)
+        for result in parse_affected(self.index, changed, self.get_location, template_cache=self.template_cache, **self.options):
+            self.results[result.path] = result
+            yield WatchEvent('parsed', result)
+
+
+    def watch(self) -> Iterator[WatchEvent]:
+        """Parses every file, then yields events as files change, until stopped"""
+        yield from self.start()
+        try:
+            while True:
+                yield from self.update(self.wait())
+        finally:
+            self.stop()
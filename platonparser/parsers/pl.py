@@ -1,27 +1,40 @@
 import re
 import json
 import os.path
-from typing import List, Tuple, Callable, Any, Dict
+import sys
+import threading
+from typing import List, Optional, Sequence, Tuple, Callable, Any, Dict, Iterable, Iterator, BinaryIO, Union
 from ast import literal_eval
-from dataclasses import dataclass
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import lru_cache, partial
+from concurrent.futures import Executor, Future
+from time import perf_counter
 
 from platonparser.parser.parser_exceptions import *
-from platonparser.parser.utils import Parser, ParserOutput, ParserImport, LocationResult, FullPath
+from platonparser.parser.utils import Parser, ParserOutput, ParserImport, ParserWarning, LocationResult, LocationRequest, FullPath, \
+    LazyValue, LayeredDict, DICTS, SLOTS, iter_lines, resolve_value, resolve_lazy_value, resolve_lazy_values, value_size
 from platonparser.parser.components import COMPONENT_SELECTORS
+from platonparser.parser.cache import PlanCache, RecordingGetLocation, TemplateCache, summarize_location
+from platonparser.parser.depindex import DependencyIndex
+from platonparser.parser.metrics import MeasuredGetLocation, ParseMetrics, measured_async
 
 
-BAD_CHAR = r''.join(['/', ' ', '\t', '\n', ';', '#', '+', '&'])
+# Characters that cannot be part of a file path segment. Whitespace is excluded as a whole so that
+# the trailing \s* of FILE can never match the same characters as the path, keeping the matching linear
+BAD_CHAR = r'\s/;#+&'
 
 # .pl grammar
+# Quantified parts never overlap with the parts following them, so that no line can make a pattern
+# backtrack more than a constant number of times over each character (see benchmarks/pathological.py)
 KEY = r'^(?P<key>[a-zA-Z_][a-zA-Z0-9_\.]*)\s*'
 COMMENT = r'(?P<comment>#.*)'
-VALUE = r'(?P<value>[^=@%#][^#]*?)\s*'
-FILE = r'(?P<file>([a-zA-Z0-9_]*:)?((\/)?[^' + \
-    BAD_CHAR + r']+)(\/[^' + BAD_CHAR + r']+)*)\s*'
+VALUE = r'(?P<value>[^=@%#](?:[^#]*[^#\s])?)\s*'
+FILE = r'(?P<file>(?:[a-zA-Z0-9_]*:)?\/?[^' + BAD_CHAR + r']+(?:\/[^' + BAD_CHAR + r']+)*)\s*'
 ALIAS = r'((\[\s*(?P<alias>[a-zA-Z_.][a-zA-Z0-9_.]*)\s*\])\s*?)?'
 
 COMPONENT_LINE = re.compile(
-    KEY + r'\s*(?P<operator>=:)\s*(?P<component>\w+)\s*' + COMMENT + r'?$')
+    KEY + r'(?P<operator>=:)\s*(?P<component>\w+)\s*' + COMMENT + r'?$')
 URL_LINE = re.compile(
     KEY + r'(?P<operator>=\$)\s*' + FILE + COMMENT + r'?$')
 ONE_LINE = re.compile(
@@ -36,72 +49,528 @@ DEPENDENCY_FILE_LINE = re.compile(r'@\s*' + FILE + ALIAS + COMMENT + r'?$')
 END_MULTI_LINE = re.compile(r'==\s*$')
 COMMENT_LINE = re.compile(r'\s*' + COMMENT + r'$')
 EMPTY_LINE = re.compile(r'\s*$')
+KEY_HEAD = re.compile(r'(?P<key>[a-zA-Z_][a-zA-Z0-9_\.]*)\s*')
+
+# Candidate patterns of a line starting with a key, selected by the one or two characters
+# following the key. Candidates are listed in the precedence order of the line kinds.
+_FROM_FILE = ('from_file', FROM_FILE_LINE)
+_URL = ('url', URL_LINE)
+_COMPONENT = ('component', COMPONENT_LINE)
+_ONE_LINE = ('one_line', ONE_LINE)
+_MULTI_LINE = ('multi_line', MULTI_LINE)
+OPERATOR_CANDIDATES = {
+    '=@': (_FROM_FILE,),
+    '=$': (_URL, _ONE_LINE),
+    '=:': (_COMPONENT, _ONE_LINE),
+    '==': (_MULTI_LINE,),
+    '=': (_ONE_LINE,),
+    '+': (_FROM_FILE, _ONE_LINE, _MULTI_LINE),
+    '-': (_FROM_FILE, _ONE_LINE, _MULTI_LINE),
+    '%': (_FROM_FILE, _ONE_LINE, _MULTI_LINE),
+}
+EXTENDS_KEYS = ('extends', 'template')
+DEPENDENCY_CANDIDATES = (('dependency', DEPENDENCY_FILE_LINE),)
+BLANK_CANDIDATES = (('comment', COMMENT_LINE), ('empty', EMPTY_LINE))
+# Kinds of lines referencing a file through their 'file' group
+FILE_LINE_KINDS = ('extends', 'from_file', 'url', 'dependency')
+# Kinds of the lines mapping a value to their key (along with the end of multiline blocks)
+KEY_LINE_KINDS = ('one_line', 'from_file', 'url', 'component')
+
+# Beginning of any text ast.literal_eval may accept: a number, a string (with its prefix), a container,
+# a constant, set() or a comment or line continuation before the literal
+LITERAL_HEAD = re.compile(r'\s*(?:[-+.0-9\'"(\[{#\\]|[bBrRuUfF]{1,2}[\'"]|True|False|None|set\s*\()')
 
 # Mandatory keys
 MANDATORY_KEYS = ['author', 'version', 'title', 'statement', 'formState']
 
 # Utility functions
+def classify_line(line: str) -> Tuple[str, Any]:
+    """Finds the kind of a line (outside of a multiline block) and the corresponding match.
+    Only the patterns that can match given the first characters of the line are tried.
+
+    Returns (None, None) if the line does not correspond to any pattern
+    """
+    head = KEY_HEAD.match(line)
+    if head is not None:
+        end = head.end()
+        candidates = OPERATOR_CANDIDATES.get(line[end:end + 2]) or OPERATOR_CANDIDATES.get(line[end:end + 1], ())
+        if head.group('key') in EXTENDS_KEYS:
+            candidates = (('extends', EXTENDS_LINE),) + candidates
+    elif line.startswith('@'):
+        candidates = DEPENDENCY_CANDIDATES
+    else:
+        candidates = BLANK_CANDIDATES
+    for kind, pattern in candidates:
+        match = pattern.match(line)
+        if match is not None:
+            return kind, match
+    return None, None
+
+def referenced_files(lines: List[str]) -> List[Tuple[str, str]]:
+    """Returns the kind of line and the URI of the extends=, =@, %@, =$ and @ lines, in order, without parsing
+    the rest of the lines. Lines that are part of a multiline block or that do not match any pattern are skipped."""
+    files = []
+    in_multiline = False
+    for line in lines:
+        if in_multiline:
+            in_multiline = END_MULTI_LINE.match(line) is None
+            continue
+        kind, match = classify_line(line)
+        if kind in FILE_LINE_KINDS:
+            files.append((kind, match.group('file')))
+        elif kind == 'multi_line':
+            in_multiline = True
+    return files
+
+
+@dataclass(**SLOTS)
+class ParsePlan:
+    """Lines of a .pl file classified once (see compile_plan), so that parsing the same contents again only runs
+    the handlers of the lines"""
+    # (kind, match, line number, line) of the non empty lines, None kind for lines not corresponding to any pattern.
+    # The lines of a multiline block are a 'multi_line_end' step (or 'multi_line_unclosed' if the block goes on until
+    # the end of the file) whose match is a list holding them joined
+    steps: List[Tuple[Optional[str], Any, int, str]]
+    files: List[Tuple[str, str]] # Kind of line and URI of the lines referencing a file, see referenced_files
+
+
+def iter_steps(lines: Iterable[str]) -> Iterator[Tuple[Optional[str], Any, int, str]]:
+    """Classifies lines one after the other and yields the steps of their parse plan (see ParsePlan), as soon as
+    they are complete: only the lines of the current multiline block are kept"""
+    lines = iter(lines)
+    line_number = 0
+    for line in lines:
+        line_number += 1
+        kind, match = classify_line(line)
+        if kind == 'empty': continue
+        yield kind, match, line_number, line
+        if kind == 'multi_line':
+            block = []
+            for line in lines:
+                line_number += 1
+                if END_MULTI_LINE.match(line) is not None:
+                    yield 'multi_line_end', [''.join(block)], line_number, line
+                    break
+                block.append(line)
+            else:
+                yield 'multi_line_unclosed', [''.join(block)], line_number + 1, line
+
+
+def compile_plan(lines: List[str]) -> ParsePlan:
+    """Classifies every line of a file, gathering the lines of the multiline blocks and the referenced files.
+    Never raises: lines not corresponding to any pattern are steps raising the error when the plan is run"""
+    steps = list(iter_steps(lines))
+    files = [(kind, match.group('file')) for kind, match, _, _ in steps if kind in FILE_LINE_KINDS]
+    return ParsePlan(steps, files)
+
+
+def counted_steps(steps: Iterable[Tuple[Optional[str], Any, int, str]], lines: Dict[Optional[str], int]) -> Iterator[Tuple[Optional[str], Any, int, str]]:
+    """Yields steps, counting their kinds in lines"""
+    for step in steps:
+        lines[step[0]] = lines.get(step[0], 0) + 1
+        yield step
+
+
+@lru_cache(maxsize=2 ** 16)
+def split_key(key: str) -> Tuple[str, ...]:
+    """Segments of a dotted key, interned so that the outputs of many files share them"""
+    return tuple(sys.intern(k) for k in key.split('.'))
+
+
+async def resolve_files_async(file: bytes, path: FullPath, circle_id: int, get_location, results: Dict[LocationRequest, Any],
+                              visited: set, template_cache: TemplateCache = None, dependency_index: DependencyIndex = None,
+                              pinned: Dict[Any, Tuple[ParserOutput, Dict]] = None, lazy: bool = False):
+    """Resolves concurrently with the coroutine function get_location every URI referenced by a file, then does
+    the same for every inherited file, concurrently. Results (or the exception raised by get_location) are stored
+    in results. Inherited files already visited or that are taken from template_cache (see PLParser.load_template)
+    are not explored again: the get_location calls recorded with their outputs are replayed instead, to check they
+    are not out of date. The outputs taken from template_cache are stored in pinned by cache key with their calls,
+    so that they are still there if they are evicted from the cache before the file is parsed.
+    lazy: the file is parsed in lazy mode"""
+    # Only imported here, asyncio taking longer to import than the rest of the parser
+    import asyncio
+    try:
+        lines = str(file, encoding='utf-8').split('\n')
+    except UnicodeError:
+        return
+    directory = os.path.split(path.path)[0]
+    files = [(kind, LocationRequest(uri, directory, path.resource_id, circle_id)) for kind, uri in referenced_files(lines)]
+    requests = [request for request in dict.fromkeys(request for _, request in files) if request not in results]
+    locations = await asyncio.gather(*(get_location(*request) for request in requests), return_exceptions=True)
+    results.update(zip(requests, locations))
+
+    parents = []
+    for kind, request in files:
+        location = results[request]
+        if kind != 'extends' or not location or isinstance(location, BaseException) or location.path in visited:
+            continue
+        visited.add(location.path)
+        output = None
+        if template_cache is not None and (dependency_index is None or location.path in dependency_index):
+            key = template_cache.key(location, lazy)
+            calls = template_cache.calls.get(key)
+            if key in template_cache and calls is not None:
+                requests = [LocationRequest(*call) for call in calls if call not in results]
+                locations = await asyncio.gather(*(get_location(*request) for request in requests), return_exceptions=True)
+                results.update(zip(requests, locations))
+                if all(not isinstance(results[call], BaseException) and summarize_location(results[call]) == summary
+                       for call, summary in calls.items()):
+                    output = template_cache.get(key)
+                else:
+                    template_cache.miss()
+        if output is None:
+            parents.append(location)
+        elif pinned is not None:
+            pinned[key] = (output, calls)
+    await asyncio.gather(*(resolve_files_async(location.file, location.path, location.circle_id, get_location, results,
+                                               visited, template_cache, dependency_index, pinned, lazy) for location in parents))
+
+
+class ResolvedLocations:
+    """get_location function answering with results obtained beforehand (see resolve_files_async). URIs that were
+    not resolved beforehand are not resolved (PLParser raises ParserFileNotFound)"""
+    def __init__(self, results: Dict[LocationRequest, Any]):
+        self.results = results
+
+
+    def __call__(self, uri: str, working_directory: str, resource_id: int, circle_id: int) -> Optional[LocationResult]:
+        result = self.results.get(LocationRequest(uri, working_directory, resource_id, circle_id))
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+# literal_eval is not thread-safe in CPython up to 3.12 (python/cpython#106905): the recursion depth of the conversion
+# of the parsed expression to ast nodes is stored in a counter shared by every thread of the interpreter, not on the
+# stack. If the thread parsing a value is switched out during that conversion (e.g. by a garbage collection running
+# finalizers), a thread evaluating another value changes the counter, and the first one fails with
+# SystemError("AST constructor recursion depth mismatch") instead of returning the value. The threads parsing the
+# exercises of PLTPParser evaluate values concurrently. literal_eval holds the GIL apart from such switches: the lock costs no parallelism
+LITERAL_EVAL_LOCK = threading.Lock()
+
+def evaluate_literal(expr: Any) -> Any:
+    """Evaluates expr like a Python literal, or returns it unchanged if it is not one.
+    literal_eval is not even tried on text that obviously cannot be a literal (e.g. code)"""
+    if type(expr) is not str or LITERAL_HEAD.match(expr) is None: return expr
+    try:
+        with LITERAL_EVAL_LOCK:
+            return literal_eval(expr)
+    except (ValueError, TypeError, SyntaxError):
+        return expr
+
+def evaluate_json(expr: str, error: Callable[[], ParserException]) -> Any:
+    """Decodes expr as JSON, then evaluates the result like a Python literal. Raises error() if expr is not valid JSON"""
+    try:
+        value = json.loads(expr)
+    except json.decoder.JSONDecodeError:
+        raise error()
+    return evaluate_literal(value)
+
+def evaluate_file(contents: Union[bytes, memoryview], evaluator: Callable[[str], Any], error: Callable[[], ParserException]) -> Any:
+    """Decodes the contents of a loaded file as UTF-8, then evaluates them with evaluator. Raises error() if they are
+    not valid UTF-8"""
+    try:
+        value = str(contents, encoding='utf-8')
+    except UnicodeError:
+        raise error()
+    return evaluator(value)
+
 def map_value(n: Dict[str, Any], k: str, v: Any): n[k] = v
-def append_value(n: Dict[str, Any], k: str, v: Any): n[k] += v
+def append_value(n: Dict[str, Any], k: str, v: Any):
+    value = n[k]
+    # A list may be shared with the output of an inherited file, it is never extended in place
+    if type(value) is list: value = list(value)
+    value += v
+    n[k] = value
 def prepend_value(n: Dict[str, Any], k: str, v: Any): n[k] = v + n[k]
 
 
 class PLParser(Parser):
     """Parser for .pl files"""
-    @dataclass
+    # Keys that must be defined in a final file, see check_mandatory_keys
+    mandatory_keys = MANDATORY_KEYS
+
+    @dataclass(**SLOTS)
     class Multiline():
         """Used to keep information about multiline parsing status"""
         ongoing: bool = False
         current_key: str = ''
         current_op: str = ''
-        current_value: Any = None
+        current_lines: List[str] = field(default_factory=list)
         starting_line: str = ''
         starting_line_number: int = 0
 
 
     def __init__(self, file: bytes, path: FullPath, circle_id: int, get_location: Callable[[str, str, int, int], LocationResult], 
-                 inherited=tuple(), check_mandatory_keys=True):
-        """Initializes PLParser instance"""
+                 inherited=tuple(), check_mandatory_keys=True, template_cache: TemplateCache = None,
+                 prefetch_executor: Executor = None, lazy=False, dependency_index: DependencyIndex = None, layered=False,
+                 collect_comments=True, collect_warnings=True, max_warnings: int = None, plan_cache: PlanCache = None,
+                 metrics: ParseMetrics = None):
+        """Initializes PLParser instance
+        template_cache: cache of the outputs of inherited files, shared with the parsers of those files. Outputs are
+            only taken from it if the files they were built from are unchanged (see TemplateCache)
+        prefetch_executor: if given (e.g. a ThreadPoolExecutor), every URI referenced by the file is resolved
+            concurrently in it before the lines are parsed, instead of one after the other while parsing
+
+        If get_location has a get_locations method (see LocationRequest), every URI referenced by the file is
+        resolved with a single call to it before the lines are parsed.
+        lazy: if True, values mapped to a key are only evaluated (literal_eval, json.loads) when they are needed
+            or when the parse of the file is over. Values overwritten before that are never evaluated, so their
+            JSON syntax errors are not raised.
+        dependency_index: if given, the files referenced by the file and by the files it inherits from are recorded in it.
+            Outputs of inherited files are only taken from template_cache if their references are already recorded.
+        layered: the data of inherited files is laid over the data of the file without being copied (see LayeredDict),
+            and flattened into dictionaries once the file is parsed. If True, the data of the output is left layered,
+            it can be flattened on demand with its flatten method. It can be modified: the dictionaries read from the outputs
+            of inherited files (shared with template_cache) are copied on write, their other mutable values when first read.
+        collect_comments, collect_warnings: if False, the output has no comments or no warnings, including the ones
+            of inherited files
+        max_warnings: maximum number of warnings kept, the ones over it are counted in a last 'limit' warning
+        plan_cache: cache of the parse plans of files (see ParsePlan), shared with the parsers of inherited files.
+            Files whose contents were already parsed are not decoded and classified again
+        metrics: if given, measures of the parse and of the parses of inherited files are added to it (see ParseMetrics).
+            get_location is wrapped to measure its calls.
+        """
         self.file = file
         self.path = path
         self.dir, self.filename = os.path.split(path.path)
         self.resource_id = path.resource_id
         self.circle_id = circle_id
+        # Recorder of the get_location calls (see parse_file with a disk cache), into which the calls made while
+        # parsing the templates taken from template_cache are replayed
+        unwrapped = get_location.get_location if isinstance(get_location, MeasuredGetLocation) else get_location
+        self.recorder = unwrapped if isinstance(unwrapped, RecordingGetLocation) else None
+        if metrics is not None and not inherited and not isinstance(get_location, MeasuredGetLocation):
+            get_location = MeasuredGetLocation(get_location, metrics)
         self.get_location = get_location
         self.inherited = inherited + (path,)
         self.check_mandatory_keys = check_mandatory_keys
+        self.template_cache = template_cache
+        self.prefetch_executor = prefetch_executor
+        self.prefetched: Dict[str, Future] = {}
+        self.lazy = lazy
+        self.dependency_index = dependency_index
+        self.layered = layered
+        self.collect_comments = collect_comments
+        self.collect_warnings = collect_warnings
+        self.max_warnings = max_warnings
+        self.warnings_left_out = 0
+        self.plan_cache = plan_cache
+        self.metrics = metrics
+        self.pinned_templates: Dict[Any, Tuple[ParserOutput, Dict]] = {} # Outputs of templates and their calls by cache key, used before template_cache (see parse_async)
+        self.__phase_seconds: Dict[str, float] = {} # Evaluation times, added to the metrics once the parse is complete
         self.output = ParserOutput(path, circle_id, 'pl')
 
         self.__current_line = ''
         self.__line_number = 1
         self.__multiline = PLParser.Multiline()
+        self.line_handlers = {
+            'extends': self.extends_line_match,
+            'from_file': self.from_file_line_match,
+            'url': self.url_line_match,
+            'component': self.component_line_match,
+            'dependency': self.dependency_line_match,
+            'comment': self.comment_line_match,
+            'one_line': self.one_line_match,
+            'multi_line': self.multi_line_match,
+            'empty': self.empty_line_match,
+            'multi_line_end': self.multi_line_end_match,
+            'multi_line_unclosed': self.multi_line_unclosed_match,
+            None: self.unknown_line_match,
+        }
 
 
     def parse(self) -> ParserOutput:
         """Parses the file and returns the corresponding output"""
+        start = perf_counter()
+        plan = None
+        if self.plan_cache is not None:
+            key = self.plan_cache.key(self.file)
+            plan = self.plan_cache.get(key)
+        if plan is None:
+            plan = self.compile() if self.metrics is None else self.metrics.timed('compile', self.compile)
+            if self.plan_cache is not None:
+                self.plan_cache.put(key, plan)
+
+        self.start()
+        if hasattr(self.get_location, 'get_locations'):
+            self.prefetch_batch(plan.files)
+        elif self.prefetch_executor is not None:
+            self.prefetch(plan.files)
+
+        self.run_plan(plan)
+        return self.complete(start, None if self.metrics is None else Counter(kind for kind, _, _, _ in plan.steps))
+
+
+    def complete(self, start: float, lines: Optional[Dict[Optional[str], int]]) -> ParserOutput:
+        """Finishes the parse started at start (perf_counter), recording it in the metrics if they are collected,
+        with the numbers of its lines by kind"""
+        if self.metrics is None: return self.finish()
+        output = self.metrics.timed('finish', self.finish)
+        self.metrics.add_phases(self.__phase_seconds)
+        self.metrics.add_parse(len(self.inherited) - 1, perf_counter() - start, lines)
+        return output
+
+
+    def start(self):
+        """Resets the references of the file in the dependency index before its lines are parsed"""
+        if self.dependency_index is not None:
+            self.dependency_index.reset(self.path)
+            if len(self.inherited) == 1:
+                self.dependency_index.add_root(self.path, self.circle_id)
+
+
+    def parse_stream(self, stream: Union[BinaryIO, Iterable[bytes]]) -> ParserOutput:
+        """Parses the file read from stream (a binary file object or an iterable of byte chunks) instead of file.
+        It is decoded incrementally and its lines are parsed as they come: besides the output, only the lines of the
+        current multiline block are kept in memory. URIs are resolved one after the other while parsing (the file is
+        not known beforehand, nothing can be prefetched), and the plan cache is not used."""
+        start = perf_counter()
+        self.start()
+        handlers = self.line_handlers
+        steps = iter_steps(self.stream_lines(stream))
+        lines = None
+        if self.metrics is not None:
+            lines = {}
+            steps = counted_steps(steps, lines)
+        for kind, match, line_number, line in steps:
+            self.__current_line = line
+            self.__line_number = line_number
+            handlers[kind](match)
+        return self.complete(start, lines)
+
+
+    def iter_stream(self, stream: Union[BinaryIO, Iterable[bytes]]) -> Iterator[Tuple[str, Any]]:
+        """Parses the file read from stream like parse_stream, yielding (key, value) each time a line or a multiline
+        block maps a value to a key, value being the one of the key once it is handled (evaluated even in lazy mode).
+        Values of inherited files are not yielded. Once the iterator is exhausted, finish() returns the output.
+        Metrics only measure the resolutions, evaluations and merges done while iterating."""
+        self.start()
+        handlers = self.line_handlers
+        for kind, match, line_number, line in iter_steps(self.stream_lines(stream)):
+            self.__current_line = line
+            self.__line_number = line_number
+            handlers[kind](match)
+            if kind in KEY_LINE_KINDS:
+                key = match.group('key')
+            elif kind == 'multi_line_end':
+                key = self.__multiline.current_key
+            else:
+                continue
+            namespace, nkey = get_namespace(self.output.data, split_key(key))
+            yield key, resolve_value(namespace[nkey])
+        if self.metrics is not None:
+            self.metrics.add_phases(self.__phase_seconds)
+
+
+    def validate(self) -> List[ParserException]:
+        """Checks the file without resolving any URI nor evaluating any value (see Validator), and returns every
+        error found, an empty list if the file is valid. Inherited files are not checked"""
         try:
-            contents = self.file.decode(encoding='utf-8')
+            plan = self.compile()
+        except ParserInvalidFile as e:
+            return [e]
+        return Validator(self.path, self.mandatory_keys if self.check_mandatory_keys else ()).run(plan.steps)
+
+
+    def stream_lines(self, stream: Union[BinaryIO, Iterable[bytes]]) -> Iterator[str]:
+        """Lines of the file read from stream (see iter_lines)"""
+        try:
+            yield from iter_lines(stream)
         except UnicodeError:
             raise ParserInvalidFile(self.path)
 
-        for line in contents.split('\n'):
+
+    def compile(self) -> ParsePlan:
+        """Decodes the file and compiles its parse plan"""
+        try:
+            contents = str(self.file, encoding='utf-8')
+        except UnicodeError:
+            raise ParserInvalidFile(self.path)
+        return compile_plan(contents.split('\n'))
+
+
+    def run_plan(self, plan: ParsePlan):
+        """Runs the handlers of the lines of a parse plan, in order"""
+        handlers = self.line_handlers
+        for kind, match, line_number, line in plan.steps:
+            self.__current_line = line
+            self.__line_number = line_number
+            handlers[kind](match)
+
+
+    def parse_lines(self, lines: List[str], first_line_number: int = 1):
+        """Parses lines one after the other, the first one being at the given line number of the file"""
+        self.__line_number = first_line_number
+        for line in lines:
             self.__current_line = line
             self.parse_line(line)
             self.__line_number += 1
-        
+
+
+    def finish(self) -> ParserOutput:
+        """Checks the file is complete once all of its lines are parsed, and returns the output"""
         if self.__multiline.ongoing:
             raise ParserSyntaxError(self.path, self.__current_line, self.__line_number, 'Multiline wasn\'t closed')
 
+        if not self.layered and len(self.inherited) == 1 and type(self.output.data) is LayeredDict:
+            self.output.data = self.output.data.flatten()
+
+        if self.lazy and len(self.inherited) == 1:
+            resolve_lazy_values(self.output.data)
+
+        warnings = self.output.warnings
+        if self.max_warnings is not None and (self.warnings_left_out or len(warnings) > self.max_warnings):
+            left_out = self.warnings_left_out + max(0, len(warnings) - self.max_warnings)
+            del warnings[self.max_warnings:]
+            warnings.append(ParserWarning('limit', '', None, self.path, left_out))
+
         if self.check_mandatory_keys:
-            for key in MANDATORY_KEYS:
+            for key in self.mandatory_keys:
                 if key not in self.output.data: raise ParserMissingKey(self.path, key)
 
         return self.output
 
 
+    async def parse_async(self) -> ParserOutput:
+        """Parses the file with get_location being a coroutine function. Every URI referenced by the file and by the
+        files it inherits from is resolved concurrently beforehand, without blocking the event loop, then the file
+        is parsed with those results. Errors are raised at the same lines as with parse."""
+        results = {}
+        get_location = self.get_location
+        if type(get_location) is MeasuredGetLocation:
+            get_location = measured_async(get_location.get_location, self.metrics)
+        await resolve_files_async(self.file, self.path, self.circle_id, get_location, results, {self.path}, self.template_cache,
+                                  self.dependency_index, self.pinned_templates, self.lazy)
+        self.get_location = ResolvedLocations(results)
+        return self.parse()
+
+
+    def prefetch(self, files: List[Tuple[str, str]]):
+        """Starts resolving every URI referenced by the file (see referenced_files) in the prefetch executor"""
+        for _, uri in files:
+            if uri not in self.prefetched:
+                self.prefetched[uri] = self.prefetch_executor.submit(self.get_location, uri, self.dir, self.resource_id, self.circle_id)
+
+
+    def prefetch_batch(self, files: List[Tuple[str, str]]):
+        """Resolves every URI referenced by the file (see referenced_files) with a single call to get_location.get_locations.
+        Errors of that call are raised at the first line referencing a file"""
+        uris = [uri for uri in dict.fromkeys(uri for _, uri in files) if uri not in self.prefetched]
+        if not uris: return
+        futures = [Future() for _ in uris]
+        self.prefetched.update(zip(uris, futures))
+        try:
+            results = self.get_location.get_locations([LocationRequest(uri, self.dir, self.resource_id, self.circle_id) for uri in uris])
+            for future, result in zip(futures, results):
+                future.set_result(result)
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+
+
     def parse_line(self, line: str):
         """
-        Parse the given line by calling the appropriate method according to regex matches.
+        Parse the given line by calling the appropriate method according to its kind (see classify_line).
 
         Raises exceptions.ParserSyntaxError if the line wasn't match by any regex.
         """
@@ -109,29 +578,27 @@ class PLParser(Parser):
             if END_MULTI_LINE.match(line):
                 self.end_multi_line()
             else:
-                self.__multiline.current_value += line
-        elif EXTENDS_LINE.match(line):
-            self.extends_line_match(EXTENDS_LINE.match(line))
-        elif FROM_FILE_LINE.match(line):
-            self.from_file_line_match(FROM_FILE_LINE.match(line))
-        elif URL_LINE.match(line):
-            self.url_line_match(URL_LINE.match(line))
-        elif COMPONENT_LINE.match(line):
-            self.component_line_match(COMPONENT_LINE.match(line))
-        elif DEPENDENCY_FILE_LINE.match(line):
-            self.dependency_line_match(DEPENDENCY_FILE_LINE.match(line))
-        elif COMMENT_LINE.match(line):
-            match = COMMENT_LINE.match(line)
-            if match is not None: self.output.comments.append(match.group('comment'))
-        elif ONE_LINE.match(line):
-            self.one_line_match(ONE_LINE.match(line))
-        elif MULTI_LINE.match(line):
-            self.multi_line_match(MULTI_LINE.match(line))
-        elif EMPTY_LINE.match(line):
+                self.__multiline.current_lines.append(line)
             return
-        else:
-            raise ParserSyntaxError(self.path, line, self.__line_number, 'Line does not correspond to any defined pattern')
-        
+        kind, match = classify_line(line)
+        self.line_handlers[kind](match)
+
+
+    def unknown_line_match(self, match):
+        """Lines not corresponding to any pattern are errors"""
+        raise ParserSyntaxError(self.path, self.__current_line, self.__line_number, 'Line does not correspond to any defined pattern')
+
+
+    def comment_line_match(self, match):
+        """Keeps the comment"""
+        if self.collect_comments:
+            self.output.comments.append(match.group('comment'))
+
+
+    def empty_line_match(self, match):
+        """Nothing to do on empty lines"""
+        pass
+
 
     def one_line_match(self, match):
         """ 
@@ -151,10 +618,8 @@ class PLParser(Parser):
         if op == '=':
             self.apply_expression_to_key(key, value, map_value)
         elif op == '%':
-            try:
-                self.apply_expression_to_key(key, json.loads(value), map_value)
-            except json.decoder.JSONDecodeError:
-                raise ParserSyntaxError(self.path, self.__current_line, self.__line_number, 'Line does not correspond to a valid JSON format.')
+            self.apply_expression_to_key(key, value, map_value, evaluator=self.json_evaluator(
+                self.__current_line, self.__line_number, 'Line does not correspond to a valid JSON format.'))
         elif op == '+':
             self.apply_expression_to_key(key, value, append_value, key_must_exist=True)
         elif op == '-':
@@ -173,14 +638,26 @@ class PLParser(Parser):
         self.__multiline.ongoing = True
         self.__multiline.current_key = key
         self.__multiline.current_op = op
-        self.__multiline.current_value = ''
+        self.__multiline.current_lines = []
         self.__multiline.starting_line_number = self.__line_number
         self.__multiline.starting_line = self.__current_line
 
 
+    def multi_line_end_match(self, lines: List[str]):
+        """Ends a multiline block whose lines were gathered beforehand (see compile_plan)"""
+        self.__multiline.current_lines = lines
+        self.end_multi_line()
+
+
+    def multi_line_unclosed_match(self, lines: List[str]):
+        """Keeps the lines of a multiline block going on until the end of the file (see compile_plan)"""
+        self.__multiline.current_lines = lines
+
+
     def end_multi_line(self):
         """
-        Evaluates the complete multiline value and does the action given by the operator:
+        Joins the lines of the multiline block (without their newline characters), evaluates the value
+        and does the action given by the operator:
             == : maps value to key
             += : appends value to key
             -= : prepends value to key
@@ -188,15 +665,13 @@ class PLParser(Parser):
         """
         op = self.__multiline.current_op
         key = self.__multiline.current_key
-        value = self.__multiline.current_value
+        value = ''.join(self.__multiline.current_lines)
 
         if op == '==':
             self.apply_expression_to_key(key, value, map_value)
         elif op == '%=':
-            try:
-                self.apply_expression_to_key(key, json.loads(value), map_value)
-            except json.decoder.JSONDecodeError:
-                raise ParserSyntaxError(self.path, value, self.__multiline.starting_line_number, 'Multiline does not correspond to a valid JSON format.')
+            self.apply_expression_to_key(key, value, map_value, evaluator=self.json_evaluator(
+                value, self.__multiline.starting_line_number, 'Multiline does not correspond to a valid JSON format.'))
         elif op == '+=':
             self.apply_expression_to_key(key, value, append_value, key_must_exist=True)
         elif op == '-=':
@@ -205,19 +680,55 @@ class PLParser(Parser):
             raise AssertionError
         
         self.__multiline.ongoing = False
+        self.__multiline.current_lines = []
 
     
     def extends_line_match(self, match):
         """
-        Inheritance
+        Inheritance, the data of the inherited file is laid over the data of the file (see LayeredDict)
         """
-        location = self.call_get_location(match.group('file'))
+        template = self.load_template(match)
+        if self.metrics is None:
+            self.output.merge_output(template, layered=True, comments=self.collect_comments, warnings=self.collect_warnings)
+        else:
+            self.metrics.timed('merge', partial(self.output.merge_output, template, layered=True, comments=self.collect_comments,
+                                                warnings=self.collect_warnings))
+
+
+    def load_template(self, match) -> ParserOutput:
+        """Returns the output of the file inherited by an extends line, from the template cache if possible"""
+        location = self.call_get_location(match.group('file'), 'extends')
         if location.path in self.inherited:
             raise ParserInheritanceLoopError(self.path, self.inherited)
-        
-        parser = PLParser(location.file, location.path, location.circle_id, self.get_location, self.inherited, check_mandatory_keys=False)
-        output = parser.parse()
-        self.output.merge_output(output)
+
+        if self.template_cache is None:
+            return self.parse_template(location)
+        key = self.template_cache.key(location, self.lazy)
+        output, calls = self.pinned_templates.get(key, (None, None))
+        if output is None and (self.dependency_index is None or location.path in self.dependency_index):
+            # Out of date if a file the template depends on changed (see TemplateCache.get)
+            output = self.template_cache.get(key, self.get_location)
+            calls = self.template_cache.calls.get(key)
+        if output is None or calls is None:
+            recorder = RecordingGetLocation(self.get_location)
+            output = self.parse_template(location, recorder)
+            self.template_cache.put(key, output, recorder.calls)
+            return output
+        if self.recorder is not None:
+            self.recorder.calls.update(calls)
+        if self.metrics is not None:
+            self.metrics.add_template_cache_hit()
+        return output
+
+
+    def parse_template(self, location: LocationResult, get_location: Callable[[str, str, int, int], LocationResult] = None) -> ParserOutput:
+        """Parses an inherited file, with get_location if given instead of the one of the parser"""
+        parser = PLParser(location.file, location.path, location.circle_id, get_location or self.get_location, self.inherited,
+                          check_mandatory_keys=False, template_cache=self.template_cache,
+                          prefetch_executor=self.prefetch_executor, lazy=self.lazy, dependency_index=self.dependency_index,
+                          plan_cache=self.plan_cache, metrics=self.metrics)
+        parser.pinned_templates = self.pinned_templates
+        return parser.parse()
 
         
     def from_file_line_match(self, match):
@@ -226,20 +737,25 @@ class PLParser(Parser):
         """
         key = match.group('key')
         op = match.group('operator')
-        location = self.call_get_location(match.group('file'))
+        location = self.call_get_location(match.group('file'), 'from_file')
+        error = partial(ParserInvalidFileLine, self.path, self.__current_line, self.__line_number)
 
+        if self.lazy and op in ('=@', '%@'):
+            # Decoded with the value, the contents are kept as they are until then (e.g. a mapped file, see MappedFileResolver)
+            evaluator = evaluate_literal if op == '=@' else self.json_evaluator(
+                self.__current_line, self.__line_number, 'File does not correspond to a valid JSON format.')
+            self.apply_expression_to_key(key, location.file, map_value, evaluator=partial(evaluate_file, evaluator=evaluator, error=error))
+            return
         try:
-            value = location.file.decode(encoding='utf-8')
+            value = str(location.file, encoding='utf-8')
         except UnicodeError:
-            raise ParserInvalidFileLine(self.path, self.__current_line, self.__line_number)
+            raise error()
 
         if op == '=@':
             self.apply_expression_to_key(key, value, map_value)
         elif op == '%@':
-            try:
-                self.apply_expression_to_key(key, json.loads(value), map_value)
-            except json.decoder.JSONDecodeError:
-                raise ParserSyntaxError(self.path, self.__current_line, self.__line_number, 'File does not correspond to a valid JSON format.')
+            self.apply_expression_to_key(key, value, map_value, evaluator=self.json_evaluator(
+                self.__current_line, self.__line_number, 'File does not correspond to a valid JSON format.'))
         elif op in ('+=@', '+@'):
             self.apply_expression_to_key(key, value, append_value, key_must_exist=True)
         elif op in ('-=@', '-@'):
@@ -254,13 +770,13 @@ class PLParser(Parser):
         """
         #TODO: How is that supposed to work on Platon?
         key = match.group('key')
-        location = self.call_get_location(match.group('file'))
+        location = self.call_get_location(match.group('file'), 'url')
         try:
-            namespace, nkey = get_namespace(self.output.data, key.split('.'))
+            namespace, nkey = get_namespace(self.output.data, split_key(key))
         except TypeError:
             raise ParserSemanticError(self.path, self.__current_line, self.__line_number, f'{key} does not correspond to a valid namespace')
         if nkey in namespace:
-            self.output.warnings.append(f'Overwriting existing value {namespace[nkey]} at key {nkey}')
+            self.warn('overwrite', key, self.__line_number, namespace[nkey])
         namespace[nkey] = location.path.path
 
 
@@ -271,14 +787,14 @@ class PLParser(Parser):
         key = match.group('key')
         component = match.group('component')
         try:
-            namespace, nkey = get_namespace(self.output.data, key.split('.'))
+            namespace, nkey = get_namespace(self.output.data, split_key(key))
         except TypeError:
             raise ParserSemanticError(self.path, self.__current_line, self.__line_number, f'{key} does not correspond to a valid namespace')
         
         if component not in COMPONENT_SELECTORS: raise ParserComponentNotFound(self.path, self.__current_line, self.__line_number, 'Component not found in line.')
 
         if nkey in namespace:
-            self.output.warnings.append(f'Overwriting existing value {namespace[nkey]} at key {nkey}')
+            self.warn('overwrite', key, self.__line_number, namespace[nkey])
 
         namespace[nkey] = {
             'selector': COMPONENT_SELECTORS[component],
@@ -286,65 +802,241 @@ class PLParser(Parser):
         }
 
 
-    def dependency_line_match(self, match):
+    def dependency_line_match(self, match) -> LocationResult:
         """
-        Adds a file to the dependencies to load in the sandbox environnement
+        Adds a file to the dependencies to load in the sandbox environnement, returns its location
         """
-        location = self.call_get_location(match.group('file'))
+        location = self.call_get_location(match.group('file'), 'dependency')
 
         alias = match.group('alias') or os.path.basename(location.path.path)
         self.output.dependencies.add((location.path, alias))
+        return location
 
 
-    def apply_expression_to_key(self, key: str, expr: str, apply: Callable[[Dict[str, Any], str, Any], None], key_must_exist:bool=False):
-        """Evaluates expr like a Python expression and applies it to the corresponding key
-        in the data section of the output using the given callable. If the expression is invalid, it is evaluated
-        as a string directly
+    def apply_expression_to_key(self, key: str, expr: str, apply: Callable[[Dict[str, Any], str, Any], None], key_must_exist:bool=False,
+                                evaluator: Callable[[str], Any] = evaluate_literal):
+        """Evaluates expr with evaluator (by default like a Python literal, if the expression is invalid it is
+        evaluated as a string directly) and applies it to the corresponding key in the data section of the output
+        using the given callable. In lazy mode, values mapped to a key are stored unevaluated as LazyValues.
         
         Raises exceptions.ParserSemanticError if the key is expected to already exist and it doesn't
         """
+        lazy = self.lazy and apply is map_value
+        if not lazy:
+            if self.metrics is None:
+                value = evaluator(expr)
+            else:
+                start = perf_counter()
+                value = evaluator(expr)
+                phase = 'evaluate' if evaluator is evaluate_literal else 'json'
+                self.__phase_seconds[phase] = self.__phase_seconds.get(phase, 0.0) + perf_counter() - start
         line_number = self.__line_number if not self.__multiline.ongoing else self.__multiline.starting_line_number
         current_line = self.__current_line if not self.__multiline.ongoing else self.__multiline.starting_line
 
         try:
-            namespace, nkey = get_namespace(self.output.data, key.split('.'))
+            namespace, nkey = get_namespace(self.output.data, split_key(key))
         except TypeError:
             raise ParserSemanticError(self.path, current_line, line_number, f'{key} does not correspond to a valid namespace')
         if nkey in namespace:
-            self.output.warnings.append(f'Overwriting existing value at key "{key}"')
+            self.warn('overwrite', key, line_number, namespace[nkey])
         if key_must_exist and nkey not in namespace: 
             raise ParserSemanticError(self.path, current_line, line_number, f'{key} does not already exist')
-        try:
-            value = literal_eval(expr)
-        except (ValueError, TypeError, SyntaxError):
-            value = expr
+        if lazy:
+            value = LazyValue(evaluator, expr)
+        elif key_must_exist and type(namespace[nkey]) is LazyValue:
+            resolve_lazy_value(namespace, nkey, namespace[nkey])
         apply(namespace, nkey, value)
 
 
-    def call_get_location(self, URI: str):
-        """Finds real path to a file given pl path"""
-        result = self.get_location(URI, self.dir, self.resource_id, self.circle_id)
+    def warn(self, code: str, key: str, line_number: int, value: Any = None):
+        """Adds a warning (see ParserWarning) about a key and its value to the output, unless max_warnings is reached"""
+        if not self.collect_warnings: return
+        if self.max_warnings is not None and len(self.output.warnings) >= self.max_warnings:
+            self.warnings_left_out += 1
+            return
+        self.output.warnings.append(ParserWarning(code, sys.intern(key), line_number, self.path, value_size(value)))
+
+
+    def json_evaluator(self, line: str, line_number: int, message: str) -> Callable[[str], Any]:
+        """Evaluator decoding JSON, raising a ParserSyntaxError at the given line if it is invalid"""
+        return partial(evaluate_json, error=partial(ParserSyntaxError, self.path, line, line_number, message))
+
+
+    def call_get_location(self, URI: str, kind: str):
+        """Finds real path to a file given pl path, raises the errors of a prefetched resolution at the current line.
+        The file is recorded in the dependency index as referenced by a line of the given kind"""
+        future = self.prefetched.get(URI)
+        if future is not None:
+            result = future.result()
+        else:
+            result = self.get_location(URI, self.dir, self.resource_id, self.circle_id)
         if not result: raise ParserFileNotFound(self.path, self.__current_line, self.__line_number, 'URIcould not be resolved')
+        if self.dependency_index is not None:
+            self.dependency_index.add(self.path, result.path, kind)
         return result
   
 
-def get_namespace(d: dict, keys: List[str]) -> Tuple[dict, str]:
+def get_namespace(d: dict, keys: Sequence[str]) -> Tuple[dict, str]:
     """Navigates, and creates if necessary, subdictionaries in the order of
     the list of keys given and returns a tuple the last subdictionary found/created
-    and the last key
+    and the last key (see split_key)
     
     Raises TypeError if one of the namespaces is not a dictionary
     """
     for key in keys[:-1]:
         if not key: raise TypeError(f'key cannot be empty')
-        if type(d) != dict: raise TypeError(f'{d} is not a dictionary')
+        if type(d) not in DICTS: raise TypeError(f'{d} is not a dictionary')
         if key not in d: d[key] = {}
-        d = d[key]
+        value = d[key]
+        if type(value) is LazyValue: value = resolve_lazy_value(d, key, value)
+        d = value
     if not keys[-1]: raise TypeError(f'key cannot be empty')
-    if type(d) != dict: raise TypeError(f'{d} is not a dictionary')
+    if type(d) not in DICTS: raise TypeError(f'{d} is not a dictionary')
     return d, keys[-1]
 
 
+class Validator:
+    """Checks the steps of a parse plan (see ParsePlan) without resolving any URI nor evaluating any value, collecting
+    every error instead of stopping at the first one: lines not corresponding to any pattern, unclosed multiline blocks,
+    unknown components, keys used as namespaces while they hold a value, keys appended or prepended to before they
+    exist, and missing mandatory keys.
+
+    Values are only known to be a dictionary or not: a value starting with '{' or read from a file may be one. Once a
+    file is inherited (extends=), keys whose value is not known are not checked anymore, no error is reported for them.
+    """
+    # Values of keys in the namespaces of the validator: dictionaries are namespaces
+    VALUE = 'value'     # a value that is not a dictionary
+    UNKNOWN = 'unknown' # a value that may be a dictionary or not
+
+    def __init__(self, path: FullPath, mandatory_keys: Sequence[str] = ()):
+        self.path = path
+        self.mandatory_keys = mandatory_keys
+        self.data: Dict[str, Any] = {}
+        self.inherited = False
+        self.errors: List[ParserException] = []
+        self.multiline = None # (key, operator, line, line number) of the ongoing multiline block
+        self.line = ''
+        self.line_number = 0
+        self.line_handlers = {
+            'extends': self.extends_line,
+            'from_file': self.from_file_line,
+            'url': self.url_line,
+            'component': self.component_line,
+            'one_line': self.one_line,
+            'multi_line': self.multi_line,
+            'multi_line_end': self.multi_line_end,
+            'multi_line_unclosed': self.multi_line_unclosed,
+            None: self.unknown_line,
+        }
+
+
+    def run(self, steps: Iterable[Tuple[Optional[str], Any, int, str]]) -> List[ParserException]:
+        """Checks every step, then the mandatory keys. Returns the errors found, in the order of the lines"""
+        handlers = self.line_handlers
+        for kind, match, line_number, line in steps:
+            handler = handlers.get(kind)
+            if handler is not None:
+                self.line = line
+                self.line_number = line_number
+                handler(match)
+        if not self.inherited:
+            for key in self.mandatory_keys:
+                if key not in self.data: self.errors.append(ParserMissingKey(self.path, key))
+        return self.errors
+
+
+    def error(self, cls, message: str, line: str = None, line_number: int = None):
+        self.errors.append(cls(self.path, self.line if line is None else line, self.line_number if line_number is None else line_number, message))
+
+
+    def namespace(self, key: str, line: str = None, line_number: int = None) -> Optional[dict]:
+        """Namespace holding the last segment of key, like get_namespace. Returns None if key is not valid or if
+        the namespace is not known"""
+        keys = split_key(key)
+        if not all(keys):
+            self.error(ParserSemanticError, f'{key} does not correspond to a valid namespace', line, line_number)
+            return None
+        namespace = self.data
+        for k in keys[:-1]:
+            value = namespace.get(k)
+            if value is None:
+                value = namespace[k] = self.UNKNOWN if self.inherited else {}
+            if value is self.UNKNOWN: return None
+            if value is self.VALUE:
+                self.error(ParserSemanticError, f'{key} does not correspond to a valid namespace', line, line_number)
+                return None
+            namespace = value
+        return namespace
+
+
+    def map(self, key: str, value: Any, line: str = None, line_number: int = None):
+        namespace = self.namespace(key, line, line_number)
+        if namespace is not None:
+            namespace[split_key(key)[-1]] = value
+
+
+    def update(self, key: str, line: str = None, line_number: int = None):
+        """Checks a key appended or prepended to already exists"""
+        namespace = self.namespace(key, line, line_number)
+        if namespace is not None and not self.inherited and split_key(key)[-1] not in namespace:
+            self.error(ParserSemanticError, f'{key} does not already exist', line, line_number)
+
+
+    def expression(self, key: str, expr: str, op: str, line: str = None, line_number: int = None):
+        """Checks a value given by an expression, op being the first character of the operator"""
+        if op in '+-':
+            self.update(key, line, line_number)
+        else:
+            self.map(key, self.UNKNOWN if expr.lstrip().startswith('{') else self.VALUE, line, line_number)
+
+
+    def extends_line(self, match):
+        """The data of the inherited file is not known, none of the keys are known anymore"""
+        self.data = {}
+        self.inherited = True
+
+
+    def from_file_line(self, match):
+        op = match.group('operator')
+        if op[0] in '+-':
+            self.update(match.group('key'))
+        else:
+            self.map(match.group('key'), self.UNKNOWN)
+
+
+    def url_line(self, match):
+        self.map(match.group('key'), self.VALUE)
+
+
+    def component_line(self, match):
+        namespace = self.namespace(match.group('key'))
+        if match.group('component') not in COMPONENT_SELECTORS:
+            self.error(ParserComponentNotFound, 'Component not found in line.')
+        elif namespace is not None:
+            namespace[split_key(match.group('key'))[-1]] = {'selector': self.VALUE, 'form': {}}
+
+
+    def one_line(self, match):
+        self.expression(match.group('key'), match.group('value'), match.group('operator'))
+
+
+    def multi_line(self, match):
+        self.multiline = (match.group('key'), match.group('operator'), self.line, self.line_number)
+
+
+    def multi_line_end(self, lines: List[str]):
+        key, op, line, line_number = self.multiline
+        self.expression(key, lines[0], op[0], line, line_number)
+
+
+    def multi_line_unclosed(self, lines: List[str]):
+        self.error(ParserSyntaxError, 'Multiline wasn\'t closed')
+
+
+    def unknown_line(self, match):
+        self.error(ParserSyntaxError, 'Line does not correspond to any defined pattern')
+
+
 def get_parser() -> ParserImport:
     """Used to dynamically add parser to the loader"""
     return ParserImport(PLParser, 'pl', ('pl',))
\ No newline at end of file
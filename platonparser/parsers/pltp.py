@@ -0,0 +1,168 @@
+from typing import List, Callable
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+
+from platonparser.parser.utils import ParserOutput, ParserImport, LocationResult, FullPath, SLOTS
+from platonparser.parser.cache import TemplateCache
+from platonparser.parser.parser import create_parser
+from platonparser.parser.metrics import MeasuredGetLocation
+from platonparser.parsers.pl import PLParser
+
+
+# Mandatory keys of an activity
+MANDATORY_KEYS = ['title', 'introduction']
+
+# Options of the parsers of exercises that are not given to the worker processes parsing them (see PLTPParser)
+PROCESS_LOCAL_OPTIONS = frozenset({'template_cache', 'prefetch_executor', 'plan_cache', 'dependency_index'})
+
+
+@dataclass(**SLOTS)
+class PLTPOutput(ParserOutput):
+    """Output of an activity: its own output, and the outputs of its exercises in the order of their @ lines"""
+    exercises: List[ParserOutput] = field(default_factory=list)
+
+
+    def binary_fields(self, plain: bool = False) -> tuple:
+        exercises = [exercise.binary_fields(plain) for exercise in self.exercises]
+        return ParserOutput.binary_fields(self, plain) + (exercises,)
+
+
+    @classmethod
+    def from_binary_fields(cls, fields: tuple) -> ParserOutput:
+        output = ParserOutput.from_binary_fields.__func__(cls, fields[:-1])
+        output.exercises = [ParserOutput.from_binary_fields(exercise) for exercise in fields[-1]]
+        return output
+
+
+class PLTPParser(PLParser):
+    """Parser for .pltp activity files. They have the syntax of .pl files, each @ line referencing an exercise.
+    Once the lines of the activity are parsed, its exercises are parsed concurrently in a pool of threads sharing
+    the template cache, so that the templates they have in common are only parsed once. The same pool resolves the
+    @ lines of the activity, unless a prefetch_executor is given.
+    Threads only overlap the latencies of get_location: parsing lines holds the GIL, an activity whose files are
+    resolved quickly is parsed in about the time of its exercises one after the other. With processes=True, the
+    exercises are parsed in parallel by a pool of processes instead (see batch.parse_many).
+    In lazy mode or with a dependency index, exercises are parsed one after the other by threads: neither the
+    LazyValues of the templates they share nor the dependency index can be updated by several threads."""
+    mandatory_keys = MANDATORY_KEYS
+
+    def __init__(self, file: bytes, path: FullPath, circle_id: int, get_location: Callable[[str, str, int, int], LocationResult],
+                 inherited=tuple(), check_mandatory_keys=True, template_cache: TemplateCache = None, max_workers: int = None,
+                 processes: bool = False, **options):
+        """Initializes PLTPParser instance, options are the ones of PLParser
+        template_cache: cache of the outputs of inherited files, a new one is shared by the exercises if not given
+        max_workers: number of threads resolving and parsing exercises (default: 32)
+        processes: if True, exercises are parsed by max_workers processes (default: the number of CPUs) with
+            batch.parse_many, each having its own template cache. get_location must be picklable
+            (e.g. base_get_location), the template cache and the plan cache are not used by the exercises.
+        The exercises are parsed with the same options as the activity, check_mandatory_keys included.
+        """
+        template_cache = TemplateCache() if template_cache is None else template_cache
+        super().__init__(file, path, circle_id, get_location, inherited, check_mandatory_keys, template_cache, **options)
+        self.output = PLTPOutput(path, circle_id, 'pltp')
+        self.max_workers = max_workers
+        self.processes = processes
+        self.exercise_options = dict(options, check_mandatory_keys=check_mandatory_keys, template_cache=template_cache)
+        self.exercise_locations: List[LocationResult] = []
+        self.async_exercises = False
+        self.executor: ThreadPoolExecutor = None
+        self.concurrent_exercises = not self.lazy and self.dependency_index is None
+
+
+    def parse(self) -> PLTPOutput:
+        """Parses the activity and its exercises"""
+        if self.async_exercises: return super().parse()
+        with self.pool():
+            if self.prefetch_executor is None:
+                self.prefetch_executor = self.executor
+            return super().parse()
+
+
+    @contextmanager
+    def pool(self):
+        """Runs the pool of threads resolving and parsing exercises, unless it is already running"""
+        if self.executor is not None:
+            yield
+            return
+        with ThreadPoolExecutor(self.max_workers or 32) as executor:
+            self.executor = executor
+            try:
+                yield
+            finally:
+                self.executor = None
+
+
+    def dependency_line_match(self, match) -> LocationResult:
+        """Adds an exercise to the dependencies and to the exercises to parse"""
+        location = super().dependency_line_match(match)
+        self.exercise_locations.append(location)
+        return location
+
+
+    def finish(self) -> PLTPOutput:
+        """Checks the activity is complete, then parses its exercises"""
+        output = super().finish()
+        if self.processes and not self.async_exercises:
+            output.exercises = self.parse_exercises_in_processes()
+        elif not self.async_exercises:
+            with self.pool():
+                output.exercises = self.parse_exercises()
+        return output
+
+
+    async def parse_async(self) -> PLTPOutput:
+        """Parses the activity like PLParser.parse_async, then its exercises concurrently with their own parse_async"""
+        import asyncio
+        get_location = self.get_location
+        self.async_exercises = True
+        output = await super().parse_async()
+        parsers = [create_parser(location.file, location.path, location.circle_id, get_location, **self.exercise_options)
+                   for location in self.exercise_locations]
+        exercises = await asyncio.gather(*(parser.parse_async() for parser in parsers), return_exceptions=True)
+        for exercise in exercises:
+            if isinstance(exercise, BaseException): raise exercise
+        output.exercises = exercises
+        return output
+
+
+    def parse_exercises(self) -> List[ParserOutput]:
+        """Parses the exercises, concurrently if possible. If some of them fail, the error of the first one (in the
+        order of the lines) is raised"""
+        if not self.concurrent_exercises:
+            return [self.parse_exercise(location) for location in self.exercise_locations]
+        futures = [self.executor.submit(self.parse_exercise, location) for location in self.exercise_locations]
+        try:
+            return [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+
+    def parse_exercises_in_processes(self) -> List[ParserOutput]:
+        """Parses the exercises in a pool of processes. If some of them fail, the error of the first one (in the order
+        of the lines) is raised"""
+        # Only imported here, like multiprocessing
+        from platonparser.parser.batch import parse_many
+        get_location = self.get_location
+        if isinstance(get_location, MeasuredGetLocation):
+            get_location = get_location.get_location # Measured by the worker processes (see parse_many)
+        options = {name: value for name, value in self.exercise_options.items() if name not in PROCESS_LOCAL_OPTIONS}
+        jobs = {location.path: (bytes(location.file), location.path, location.circle_id) for location in self.exercise_locations}
+        results = {result.path: result for result in parse_many(jobs.values(), get_location, self.max_workers,
+                                                                dependency_index=self.dependency_index, **options)}
+        for location in self.exercise_locations:
+            error = results[location.path].error
+            if error is not None: raise error
+        return [results[location.path].output for location in self.exercise_locations]
+
+
+    def parse_exercise(self, location: LocationResult) -> ParserOutput:
+        """Parses an exercise with the parser of its extension"""
+        return create_parser(location.file, location.path, location.circle_id, self.get_location, **self.exercise_options).parse()
+
+
+def get_parser() -> ParserImport:
+    """Used to dynamically add parser to the loader"""
+    return ParserImport(PLTPParser, 'pltp', ('pltp',))
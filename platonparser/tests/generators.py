@@ -0,0 +1,132 @@
+"""Generated .pl contents shared by the tests and the benchmarks: seeded corpora of exercises extending templates
+(generate_corpus), and hostile lines for the line classification (pathological_lines)"""
+import itertools
+import os
+import posixpath
+import random
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from platonparser.parser.utils import FullPath, LocationResult
+
+
+# Default weights of the kinds of lines of a generated file
+OPERATORS = {
+    'map': 0.35,        # key = value
+    'json': 0.08,       # key % {...}
+    'append': 0.04,     # key + value, to a key mapped before in the same file
+    'component': 0.08,  # key =: Component
+    'multiline': 0.10,  # key == ... ==
+    'from_file': 0.05,  # key =@ payload
+    'comment': 0.15,
+    'empty': 0.15,
+}
+
+
+@dataclass
+class CorpusSpec:
+    """Parameters of a generated corpus. Templates form a tree: the root template is extended by fanout templates,
+    each of them by fanout others, and so on; exercises are the leaves, under depth templates (fanout ** depth
+    exercises, a single one without template if depth is 0)"""
+    seed: int = 0
+    lines: int = 200 # Lines of each file, a multiline block counting as one
+    operators: Dict[str, float] = field(default_factory=lambda: dict(OPERATORS))
+    multiline_lines: Tuple[int, int] = (1, 20) # Smallest and largest number of lines of a multiline block
+    depth: int = 2
+    fanout: int = 8
+    keys: int = 200 # Number of distinct top level keys, shared by all the files so that they overwrite each other
+    payloads: int = 8 # Number of files read by =@ lines
+    payload_size: int = 1024 # Size in bytes of those files
+
+
+@dataclass
+class Corpus:
+    """Generated files, by absolute path, with a get_location function resolving paths between them"""
+    files: Dict[str, bytes]
+    templates: List[str]
+    exercises: List[str]
+
+
+    def get_location(self, uri: str, working_directory: str, resource_id: int, circle_id: int) -> Optional[LocationResult]:
+        path = posixpath.normpath(posixpath.join(working_directory, uri))
+        file = self.files.get(path)
+        return None if file is None else LocationResult(file, FullPath(0, path), 0)
+
+
+    def write(self, directory: str):
+        """Writes the files under directory (their absolute paths taken as relative to it)"""
+        for path, file in self.files.items():
+            target = os.path.join(directory, path.lstrip('/'))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(file)
+
+
+def generate_corpus(spec: CorpusSpec = CorpusSpec()) -> Corpus:
+    """Generates a corpus, the same for the same spec"""
+    rand = random.Random(spec.seed)
+    files = {}
+    payloads = [f'/corpus/payloads/payload{i}.txt' for i in range(spec.payloads)]
+    for path in payloads:
+        files[path] = ''.join(rand.choice('abcdefghij \n') for _ in range(spec.payload_size)).encode()
+
+    templates = []
+    parents = [None]
+    for level in range(spec.depth + 1):
+        children = []
+        for parent in parents:
+            for i in range(spec.fanout if parent is not None else 1):
+                name = f'level{level}_{len(children)}.pl' if level < spec.depth else f'exercise{len(children)}.pl'
+                path = '/corpus/' + name
+                lines = generated_lines(rand, spec)
+                if parent is not None:
+                    lines.insert(0, f'extends={posixpath.basename(parent)}')
+                files[path] = '\n'.join(lines).encode()
+                children.append(path)
+        if level < spec.depth:
+            templates.extend(children)
+        parents = children
+    return Corpus(files, templates, parents)
+
+
+def generated_lines(rand: random.Random, spec: CorpusSpec) -> List[str]:
+    """Lines of a generated file, see CorpusSpec"""
+    kinds, weights = zip(*spec.operators.items())
+    lines = []
+    strings = [] # Keys mapped to a string in this file, that can be appended to
+    for kind in rand.choices(kinds, weights, k=spec.lines):
+        key = f'key{rand.randrange(spec.keys)}.sub{rand.randrange(10)}'
+        if kind == 'append' and strings:
+            lines.append(f'{rand.choice(strings)} + " appended {rand.randrange(1000)}"')
+            continue
+        if key in strings:
+            strings.remove(key)
+        if kind in ('map', 'append'):
+            lines.append(f'{key} = value {rand.randrange(1000)}')
+            strings.append(key)
+        elif kind == 'json':
+            lines.append(f'{key} % {{"a": {rand.randrange(100)}, "b": [1, 2, 3], "c": {{"d": "text"}}}}')
+        elif kind == 'component':
+            lines.append(f'{key} =: CodeEditor')
+        elif kind == 'multiline':
+            lines.append(f'{key} ==')
+            lines.extend(f'    print({i}, "line of a block")' for i in range(rand.randint(*spec.multiline_lines)))
+            lines.append('==')
+        elif kind == 'from_file':
+            lines.append(f'{key} =@ payloads/payload{rand.randrange(spec.payloads)}.txt' if spec.payloads else f'{key} = no payload')
+        elif kind == 'comment':
+            lines.append(f'# comment {rand.randrange(1000)}')
+        else:
+            lines.append('')
+    return lines
+
+
+PREFIXES = ('', 'a', 'a=', 'a =', 'a=@', 'a%@', 'a=$', 'a =:', 'a==', 'a+', '@', '@ a [', 'extends=', 'extends', ' ')
+FILLERS = (' ', '\r', '\x0c', ' \t', 'a', 'a:', '/a', 'a/', '.', '[', '#', '=', 'x ', 'a]')
+SUFFIXES = ('', 'x', ' x', '\x00', '=', ' [b] x')
+
+
+def pathological_lines(length: int) -> Iterator[str]:
+    """Yields lines of about length characters combining a prefix of a kind of line, a long run and a failing suffix"""
+    for prefix, filler, suffix in itertools.product(PREFIXES, FILLERS, SUFFIXES):
+        yield prefix + filler * (length // len(filler)) + suffix
@@ -0,0 +1,80 @@
+import io
+import json
+import os
+from contextlib import redirect_stderr, redirect_stdout
+
+import unittest
+
+import platonparser.parser.parser_exceptions as exceptions
+from platonparser.parser.batch import BatchResult, NDJSONWriter, parse_many, parse_tree, tree_files, validate_many
+from platonparser.parser.cli import main
+from platonparser.parser.parser import parse_file
+from platonparser.parser.utils import base_get_location, FullPath
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.dir = 'fake_pl/'
+
+    def test_parse_tree(self):
+        results = {result.path.path: result for result in parse_tree(self.dir, max_workers=2, check_mandatory_keys=False)}
+        filenames = [filename for filename in os.listdir(self.dir) if filename.endswith('.pl')]
+        self.assertEqual(len(filenames), len(results))
+        path = os.path.join(self.dir, 'full.pl')
+        with open(path, 'rb') as file: contents = file.read()
+        expected = parse_file(contents, FullPath(0, path), 0, base_get_location, check_mandatory_keys=False)
+        self.assertEqual(expected, results[path].output)
+        self.assertIsInstance(results[os.path.join(self.dir, 'extend_loop_1.pl')].error, exceptions.ParserInheritanceLoopError)
+
+    def test_parse_many(self):
+        jobs = [(b'a=1\n', FullPath(0, 'a.pl'), 0), (b'a\n', FullPath(0, 'b.pl'), 0)]
+        results = {result.path: result for result in parse_many(jobs, base_get_location, max_workers=2, check_mandatory_keys=False)}
+        self.assertEqual(1, results[FullPath(0, 'a.pl')].output.data['a'])
+        self.assertIsInstance(results[FullPath(0, 'b.pl')].error, exceptions.ParserSyntaxError)
+
+    def test_unexpected_errors(self):
+        jobs = [(b'a%{"x": 1}\na+x\n', FullPath(0, 'type.pl'), 0), (None, FullPath(0, os.path.join(self.dir, 'missing.pl')), 0)]
+        jobs += [(f'a={i}\n'.encode(), FullPath(0, f'{i}.pl'), 0) for i in range(20)]
+        results = {result.path: result for result in parse_many(jobs, base_get_location, max_workers=2, check_mandatory_keys=False)}
+        self.assertEqual(len(jobs), len(results))
+        self.assertEqual(list(range(20)), [results[FullPath(0, f'{i}.pl')].output.data['a'] for i in range(20)])
+        error = results[FullPath(0, 'type.pl')].error
+        self.assertIsInstance(error, exceptions.ParserUnexpectedError)
+        self.assertIn('TypeError', str(error))
+        self.assertIn('FileNotFoundError', str(results[FullPath(0, os.path.join(self.dir, 'missing.pl'))].error))
+        self.assertIn('FileNotFoundError', str(next(validate_many([FullPath(0, 'missing.pl')])).errors[0]))
+
+    def test_validate_many(self):
+        paths = list(tree_files(self.dir))
+        expected = list(validate_many(paths, max_workers=1, check_mandatory_keys=False))
+        self.assertEqual([result.path for result in expected], paths)
+        results = list(validate_many(paths, max_workers=2, chunksize=4, check_mandatory_keys=False))
+        self.assertEqual([(r.path, [str(e) for e in r.errors]) for r in expected], [(r.path, [str(e) for e in r.errors]) for r in results])
+        errors = {os.path.basename(r.path.path): r.errors for r in results if r.errors}
+        self.assertEqual({'append_no_key.pl', 'no_string_in_sub_key.pl', 'open_multiline.pl', 'prepend_no_key.pl',
+                          'syntax_error.pl', 'wrong_component.pl'}, set(errors))
+        self.assertIsInstance(errors['wrong_component.pl'][0], exceptions.ParserComponentNotFound)
+
+        output = io.StringIO()
+        with redirect_stdout(output), redirect_stderr(io.StringIO()):
+            self.assertEqual(1, main(['validate', os.path.join(self.dir, 'syntax_error.pl'), os.path.join(self.dir, 'full.pl')]))
+            self.assertEqual(0, main(['validate', os.path.join(self.dir, 'full.pl'), '--no-mandatory-keys']))
+        lines = output.getvalue().splitlines()
+        self.assertEqual(os.path.join(self.dir, 'syntax_error.pl') + ':1: Line does not correspond to any defined pattern in "a="', lines[0])
+        self.assertIn(os.path.join(self.dir, 'syntax_error.pl') + ': expected key author is missing', lines)
+
+    def test_ndjson_writer(self):
+        file = io.StringIO()
+        results = parse_many([(b'a=1\n', FullPath(0, 'a.pl'), 0), (b'a\n', FullPath(0, 'b.pl'), 0)], base_get_location,
+                             max_workers=2, check_mandatory_keys=False)
+        writer = NDJSONWriter(file)
+        self.assertEqual(1, writer.write_all(results))
+        writer.write(BatchResult(FullPath(0, 'c.pl')), event='removed')
+        records = {record['path'][1]: record for record in map(json.loads, file.getvalue().splitlines())}
+        self.assertEqual({'a': 1}, records['a.pl']['output']['data'])
+        self.assertEqual('ParserSyntaxError', records['b.pl']['error']['type'])
+        self.assertEqual({'event': 'removed', 'path': [0, 'c.pl']}, records['c.pl'])
+        self.assertEqual((3, 1), (writer.written, writer.failed))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+
+import unittest
+
+from platonparser.parser.parser import parse_file
+import platonparser.parser.parser_exceptions as exceptions
+from platonparser.parser.cache import DiskCache, TemplateCache
+from platonparser.parser.utils import base_get_location, FullPath
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.dir = os.path.join(self.tmp, 'fake_pl')
+        shutil.copytree('fake_pl/', self.dir)
+        self.cache = DiskCache(os.path.join(self.tmp, 'cache'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def parse(self, filename):
+        path = os.path.join(self.dir, filename)
+        with open(path, 'rb') as file: contents = file.read()
+        return parse_file(contents, FullPath(0, path), 0, base_get_location, disk_cache=self.cache, check_mandatory_keys=False)
+
+    def test_hit(self):
+        expected = self.parse('full.pl')
+        self.assertEqual(expected, self.parse('full.pl'))
+        self.assertEqual((1, 1), (self.cache.hits, self.cache.misses))
+
+    def test_dependency_changed(self):
+        self.parse('full.pl')
+        with open(os.path.join(self.dir, 'fake.pl'), 'a') as file: file.write('\nzzz=changed\n')
+        self.assertEqual('changed', self.parse('full.pl').data['zzz'])
+        self.assertEqual((0, 2), (self.cache.hits, self.cache.misses))
+        os.unlink(os.path.join(self.dir, 'fake.pl'))
+        with self.assertRaises(exceptions.ParserFileNotFound):
+            self.parse('full.pl')
+
+    def test_options(self):
+        path = os.path.join(self.dir, 'extend.pl')
+        with open(path, 'rb') as file: contents = file.read()
+        parse = lambda **options: parse_file(contents, FullPath(0, path), 0, base_get_location, disk_cache=self.cache, **options)
+        self.assertEqual([], parse(check_mandatory_keys=False, collect_comments=False).comments)
+        self.assertNotEqual([], parse(collect_comments=True, check_mandatory_keys=False).comments)
+        with self.assertRaises(exceptions.ParserMissingKey):
+            parse()
+        self.assertEqual((0, 3), (self.cache.hits, self.cache.misses))
+        parse(check_mandatory_keys=False, collect_comments=True)
+        self.assertEqual((1, 3), (self.cache.hits, self.cache.misses))
+
+    def test_template_cache(self):
+        files = {'u.pl': 'v=1\n', 't.pl': 'extends=u.pl\nw=1\n', 'e.pl': 'extends=t.pl\n', 'f.pl': 'extends=t.pl\n'}
+        for name, contents in files.items():
+            with open(os.path.join(self.dir, name), 'w') as file: file.write(contents)
+        template_cache = TemplateCache()
+        parse = lambda filename: parse_file(open(os.path.join(self.dir, filename), 'rb').read(), FullPath(0, os.path.join(self.dir, filename)),
+                                            0, base_get_location, disk_cache=self.cache, template_cache=template_cache, check_mandatory_keys=False)
+        parse('f.pl')
+        self.assertEqual(1, parse('e.pl').data['v'])
+        self.assertEqual(1, template_cache.hits)
+        with open(os.path.join(self.dir, 'u.pl'), 'w') as file: file.write('v=2\n')
+        template_cache = TemplateCache()
+        self.assertEqual(2, parse('e.pl').data['v'])
+        self.assertEqual((0, 3), (self.cache.hits, self.cache.misses))
+
+    def test_eviction(self):
+        self.cache.max_size = 1
+        self.parse('full.pl')
+        self.parse('full.pl')
+        self.assertEqual((0, 2), (self.cache.hits, self.cache.misses))
+
+    def test_size(self):
+        output = self.parse('full.pl')
+        self.cache.clear()
+        self.cache.put('first', {}, output)
+        entry_size = os.path.getsize(self.cache.entry_path('first'))
+        self.cache.max_size = 10 * entry_size
+        for i in range(100):
+            self.cache.put(str(i), {}, output)
+            self.assertLessEqual(self.cache.size, self.cache.max_size)
+        sizes = [os.path.getsize(entry.path) for entry in os.scandir(self.cache.directory)]
+        self.assertEqual(self.cache.size, sum(sizes))
+        self.assertLessEqual(len(sizes), 10)
+
+        # Removed entries (e.g. out of date) are no longer counted
+        for name in os.listdir(self.cache.directory):
+            self.cache.remove(name[:-len(DiskCache.SUFFIX)])
+        self.cache.remove('missing')
+        self.assertEqual(0, self.cache.size)
+
+
+if __name__ == '__main__':
+    unittest.main()
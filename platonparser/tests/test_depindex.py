@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+
+import unittest
+
+from platonparser.parser.batch import parse_affected, parse_tree
+from platonparser.parser.cache import TemplateCache
+from platonparser.parser.cli import main
+from platonparser.parser.depindex import DependencyIndex
+from platonparser.parser.parser import parse_file
+from platonparser.parser.utils import base_get_location, FullPath
+
+class TestDependencyIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.dir = os.path.join(self.tmp, 'fake_pl')
+        shutil.copytree('fake_pl/', self.dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def path(self, filename):
+        return FullPath(-1, os.path.join(self.dir, filename))
+
+    def test_index(self):
+        path = self.path('full.pl')
+        with open(path.path, 'rb') as file: contents = file.read()
+        cache = TemplateCache()
+        parse_file(contents, path, 0, base_get_location, template_cache=cache, check_mandatory_keys=False)
+        for _ in range(2):
+            # References of inherited files are recorded even if their output is cached
+            index = DependencyIndex()
+            parse_file(contents, path, 0, base_get_location, template_cache=cache, dependency_index=index, check_mandatory_keys=False)
+            self.assertEqual({'extends', 'from_file', 'dependency'}, index.dependencies(path)[self.path('fake.pl')])
+            self.assertEqual({'from_file'}, index.dependencies(path)[self.path('working.pl')])
+            self.assertIn(self.path('fake.pl'), index)
+            self.assertEqual({path: 0}, index.roots)
+        self.assertEqual({path}, index.dependents(self.path('utils/sandboxio.py')))
+        self.assertEqual({path}, index.affected_by(self.path('utils/sandboxio.py')))
+        self.assertEqual(set(), index.affected_by(path))
+
+        filename = os.path.join(self.tmp, 'index.json')
+        index.save(filename)
+        loaded = DependencyIndex.load(filename)
+        self.assertEqual((index.forward, index.reverse, index.roots), (loaded.forward, loaded.reverse, loaded.roots))
+
+        # Edges are replaced when the file is parsed again
+        parse_file(b'a=1', path, 0, base_get_location, dependency_index=index, check_mandatory_keys=False)
+        self.assertEqual(set(), index.affected_by(self.path('utils/sandboxio.py')))
+
+    def test_parse_affected(self):
+        index = DependencyIndex()
+        results = list(parse_tree(self.dir, max_workers=2, resource_id=-1, dependency_index=index, check_mandatory_keys=False))
+        self.assertEqual({result.path for result in results}, set(index.roots))
+        self.assertEqual({self.path('full.pl')}, index.affected_by(self.path('fake.pl')))
+
+        with open(self.path('fake.pl').path, 'w') as file: file.write('zzz=changed\n')
+        results = {result.path: result for result in parse_affected(index, [self.path('fake.pl')], base_get_location,
+                                                                    check_mandatory_keys=False)}
+        self.assertEqual({self.path('fake.pl'), self.path('full.pl')}, set(results))
+        self.assertEqual('changed', results[self.path('full.pl')].output.data['zzz'])
+
+        os.remove(self.path('full.pl').path)
+        results = list(parse_affected(index, [self.path('fake.pl')], base_get_location, check_mandatory_keys=False))
+        self.assertEqual([self.path('fake.pl')], [result.path for result in results])
+        self.assertNotIn(self.path('full.pl'), index.roots)
+
+    def test_cli_index(self):
+        filename = os.path.join(self.tmp, 'index.json')
+        # Relative root, recorded with the absolute paths of the files resolved by base_get_location
+        main(['parse', os.path.relpath(self.dir), '--no-mandatory-keys', '--index', filename, '-j', '2', '-o', os.devnull])
+        index = DependencyIndex.load(filename)
+        self.assertIn(self.path('full.pl'), index.roots)
+        self.assertEqual({self.path('full.pl')}, index.affected_by(self.path('fake.pl')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import os
+import asyncio
+import pickle
+import unittest
+
+import platonparser.parsers.pl as pl
+from platonparser.parser.utils import base_get_location, FullPath
+from platonparser.parser.cache import TemplateCache
+from platonparser.parser.metrics import ParseMetrics, MeasuredGetLocation, RESOLVER_BUCKETS, to_prometheus
+from platonparser.parser.batch import parse_many
+from platonparser.parser.parser import parse_file, async_parse_file, parse_file_stream
+from platonparser.tests.generators import generate_corpus
+
+
+class TestParseMetrics(unittest.TestCase):
+    dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_pl')
+
+    def read(self, name):
+        path = os.path.join(self.dir, name)
+        with open(path, 'rb') as f:
+            return f.read(), FullPath(0, path)
+
+
+    def test_parse(self):
+        contents, path = self.read('extend.pl')
+        metrics = ParseMetrics()
+        output = parse_file(contents, path, 0, base_get_location, check_mandatory_keys=False, metrics=metrics)
+        self.assertEqual(output, parse_file(contents, path, 0, base_get_location, check_mandatory_keys=False))
+        self.assertEqual(metrics.parses, 2)
+        self.assertEqual(metrics.inheritance_depth, 1)
+        self.assertEqual(metrics.lines['extends'], 1)
+        plans = [pl.compile_plan(self.read(name)[0].decode().split('\n')) for name in ('extend.pl', 'working.pl')]
+        self.assertEqual(sum(metrics.lines.values()), sum(len(plan.steps) for plan in plans))
+        uris = [('working.pl', self.dir)] + [(uri, self.dir) for uri in ('utils/sandboxio.py', 'builder/before.py', 'grader/evaluator.py')]
+        self.assertEqual(metrics.resolver_calls, len(uris))
+        self.assertEqual(metrics.bytes_loaded, sum(len(base_get_location(uri, directory, 0, 0).file) for uri, directory in uris))
+        self.assertEqual(sum(metrics.resolver_buckets), len(uris))
+        self.assertTrue({'compile', 'resolve', 'evaluate', 'merge', 'finish'} <= set(metrics.phases))
+        self.assertGreater(metrics.seconds, 0)
+        self.assertGreaterEqual(metrics.seconds, sum(metrics.phases.values()) - metrics.phases['resolve'] - 1e-3)
+
+
+    def test_shared(self):
+        corpus = generate_corpus()
+        metrics, cache = ParseMetrics(), TemplateCache()
+        options = {'check_mandatory_keys': False, 'template_cache': cache, 'metrics': metrics}
+        for path in corpus.exercises[:5]:
+            parse_file(corpus.files[path], FullPath(0, path), 0, corpus.get_location, **options)
+        self.assertGreater(metrics.template_cache_hits, 0)
+        self.assertEqual(metrics.inheritance_depth, 2)
+
+        streamed, path = ParseMetrics(), corpus.exercises[0]
+        parse_file_stream([corpus.files[path]], FullPath(0, path), 0, corpus.get_location, check_mandatory_keys=False, metrics=streamed)
+        whole = ParseMetrics()
+        parse_file(corpus.files[path], FullPath(0, path), 0, corpus.get_location, check_mandatory_keys=False, metrics=whole)
+        self.assertEqual(streamed.lines, whole.lines)
+        self.assertEqual(streamed.parses, whole.parses)
+
+        async def get_location(*args):
+            return corpus.get_location(*args)
+        measured = ParseMetrics()
+        output = asyncio.run(async_parse_file(corpus.files[path], FullPath(0, path), 0, get_location, check_mandatory_keys=False,
+                                              metrics=measured))
+        self.assertEqual(output, parse_file(corpus.files[path], FullPath(0, path), 0, corpus.get_location, check_mandatory_keys=False))
+        self.assertGreater(measured.resolver_calls, 0)
+        self.assertEqual(measured.lines, whole.lines)
+
+
+    def test_processes(self):
+        metrics = ParseMetrics()
+        metrics.add_parse(1, 0.5, {'one_line': 3})
+        metrics.add_resolution(0.002, [])
+        copy = pickle.loads(pickle.dumps(metrics))
+        self.assertEqual(metrics.as_dict(), copy.as_dict())
+        copy.add_phase('compile', 1.0) # The lock is recreated
+
+        names = ('full.pl', 'extend.pl', 'working.pl')
+        expected = ParseMetrics()
+        for name in names:
+            contents, path = self.read(name)
+            parse_file(contents, path, 0, base_get_location, check_mandatory_keys=False, metrics=expected)
+        jobs = [self.read(name) + (0,) for name in names]
+        metrics = ParseMetrics()
+        results = list(parse_many(jobs, base_get_location, max_workers=2, template_cache_size=0, check_mandatory_keys=False,
+                                  metrics=metrics))
+        self.assertTrue(all(result.output is not None for result in results))
+        measures, expected = metrics.as_dict(), expected.as_dict()
+        for name in ('parses', 'lines', 'resolver_calls', 'bytes_loaded', 'inheritance_depth'):
+            self.assertEqual(expected[name], measures[name], name)
+        self.assertEqual(sum(expected['resolver_buckets']), sum(measures['resolver_buckets']))
+        self.assertEqual(set(expected['phases']), set(measures['phases']))
+
+
+    def test_get_location(self):
+        metrics = ParseMetrics()
+        get_location = MeasuredGetLocation(base_get_location, metrics)
+        self.assertIsNone(get_location('missing.pl', self.dir, 0, 0))
+        result = get_location('working.pl', self.dir, 0, 0)
+        self.assertEqual(result, base_get_location('working.pl', self.dir, 0, 0))
+        self.assertEqual(metrics.resolver_calls, 2)
+        self.assertEqual(metrics.bytes_loaded, len(result.file))
+        self.assertFalse(hasattr(get_location, 'get_locations'))
+
+
+    def test_prometheus(self):
+        metrics = ParseMetrics()
+        metrics.add_parse(0, 0.5, {'one_line': 3, None: 1})
+        metrics.add_parse(2, 0.25, {'one_line': 1})
+        metrics.add_resolution(0.002, [None])
+        metrics.add_resolution(10.0, [])
+        metrics.add_phase('compile', 0.125)
+        text = to_prometheus(metrics, labels={'worker': 'a"b'})
+        lines = text.splitlines()
+        self.assertTrue(text.endswith('\n'))
+        self.assertIn('# TYPE platonparser_parses_total counter', lines)
+        self.assertIn('platonparser_parses_total{worker="a\\"b"} 2', lines)
+        self.assertIn('platonparser_parse_seconds_total{worker="a\\"b"} 0.5', lines)
+        self.assertIn('platonparser_lines_total{worker="a\\"b",kind="one_line"} 4', lines)
+        self.assertIn('platonparser_lines_total{worker="a\\"b",kind="unknown"} 1', lines)
+        self.assertIn('platonparser_phase_seconds_total{worker="a\\"b",phase="compile"} 0.125', lines)
+        self.assertIn('platonparser_resolver_seconds_bucket{worker="a\\"b",le="0.001"} 0', lines)
+        self.assertIn('platonparser_resolver_seconds_bucket{worker="a\\"b",le="0.005"} 1', lines)
+        self.assertIn('platonparser_resolver_seconds_bucket{worker="a\\"b",le="+Inf"} 2', lines)
+        self.assertIn('platonparser_resolver_seconds_count{worker="a\\"b"} 2', lines)
+        self.assertIn('platonparser_inheritance_depth_max{worker="a\\"b"} 2', lines)
+        self.assertEqual(len([line for line in lines if '_bucket' in line]), len(RESOLVER_BUCKETS))
+        self.assertIn('platonparser_bytes_loaded_total 0', to_prometheus(ParseMetrics()).splitlines())
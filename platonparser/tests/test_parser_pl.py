@@ -1,10 +1,17 @@
-import os, sys
+import os, time
+import random
+import threading
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
 import unittest
 
 import platonparser.parsers.pl as pl
 import platonparser.parser.parser_exceptions as exceptions
-from platonparser.parser.utils import base_get_location, FullPath
+from platonparser.parser.utils import base_get_location, FullPath, LocationResult
+from platonparser.parser.cache import PlanCache, TemplateCache
+from platonparser.parser.parser import ParserRegistry, async_parse_file, parse_file_stream
+from platonparser.tests.generators import CorpusSpec, generate_corpus, pathological_lines
 
 class TestPLParser(unittest.TestCase):
     def setUp(self):
@@ -16,7 +23,7 @@ class TestPLParser(unittest.TestCase):
         parser = pl.PLParser(contents, FullPath(0, path), 0, base_get_location, check_mandatory_keys=False)
         output = parser.parse()
         # warning
-        self.assertIn('Overwriting existing value at key "e.f.h"', output.warnings)
+        self.assertIn('Overwriting existing value at key "e.f.h"', [str(w) for w in output.warnings])
         # = += +
         self.assertEqual(output.data['title'], 'testtesttest')
          # = -= -
@@ -39,6 +46,264 @@ class TestPLParser(unittest.TestCase):
         self.assertIn((base_get_location('builder/before.py', self.dir, 0, 0).path, 'builder.py'), output.dependencies)
 
 
+    def test_template_cache(self):
+        path = os.path.join(self.dir, 'full.pl')
+        with open(path, 'rb') as file: contents = file.read()
+        expected = pl.PLParser(contents, FullPath(0, path), 0, base_get_location, check_mandatory_keys=False).parse()
+        cache = TemplateCache(maxsize=1)
+        for _ in range(3):
+            output = pl.PLParser(contents, FullPath(0, path), 0, base_get_location, check_mandatory_keys=False,
+                                 template_cache=cache).parse()
+            self.assertEqual(expected, output)
+            output.data['zzz'] = 'modified'
+        self.assertEqual((2, 1, 1, 1), cache.cache_info())
+
+
+    def test_template_cache_dependency_changed(self):
+        files = {}
+        def get_location(uri, directory, resource_id, circle_id):
+            path = os.path.join(directory, uri)
+            return LocationResult(files[path], FullPath(0, path), 0) if path in files else None
+        async def get_location_async(*args):
+            return get_location(*args)
+        parses = {
+            'sync': lambda: pl.PLParser(files['/e.pl'], FullPath(0, '/e.pl'), 0, get_location, check_mandatory_keys=False,
+                                        template_cache=cache).parse(),
+            'async': lambda: asyncio.run(async_parse_file(files['/e.pl'], FullPath(0, '/e.pl'), 0, get_location_async,
+                                                          check_mandatory_keys=False, template_cache=cache)),
+        }
+        for name, parse in parses.items():
+            files.update({'/u.pl': b'v=1\n', '/w.txt': b'a', '/t.pl': b'extends=u.pl\nw=@w.txt\n', '/e.pl': b'extends=t.pl\n'})
+            cache = TemplateCache()
+            self.assertEqual({'v': 1, 'w': 'a'}, parse().data, name)
+            self.assertEqual({'v': 1, 'w': 'a'}, parse().data, name)
+            self.assertEqual(1, cache.hits, name)
+            # Templates inheriting from or loading a changed file are out of date
+            files['/u.pl'] = b'v=2\n'
+            self.assertEqual({'v': 2, 'w': 'a'}, parse().data, name)
+            files['/w.txt'] = b'b'
+            self.assertEqual({'v': 2, 'w': 'b'}, parse().data, name)
+            self.assertEqual({'v': 2, 'w': 'b'}, parse().data, name)
+            self.assertEqual(3, cache.hits, name)
+
+
+    def test_lazy_template_cache(self):
+        files = {'/base.pl': b'form%{"opts": {"a": 1}}\n', '/ex1.pl': b'extends=base.pl\nform.opts.secret=42\n',
+                 '/ex2.pl': b'extends=base.pl\n'}
+        def get_location(uri, directory, resource_id, circle_id):
+            path = os.path.join(directory, uri)
+            return LocationResult(files[path], FullPath(0, path), 0) if path in files else None
+        for layered in (False, True):
+            cache = TemplateCache()
+            for name, expected in (('/ex1.pl', {'a': 1, 'secret': 42}), ('/ex2.pl', {'a': 1}), ('/ex1.pl', {'a': 1, 'secret': 42})):
+                output = pl.PLParser(files[name], FullPath(0, name), 0, get_location, check_mandatory_keys=False, lazy=True,
+                                     layered=layered, template_cache=cache).parse()
+                self.assertEqual(expected, output.data['form']['opts'])
+                output.data['form']['opts']['modified'] = True
+            self.assertEqual(2, cache.hits)
+
+
+    def test_layered_template_cache(self):
+        files = {'/base.pl': b'l=[1, 2]\nd%{"l": [3], "m": {"n": [4]}}\n', '/ex.pl': b'extends=base.pl\n'}
+        def get_location(uri, directory, resource_id, circle_id):
+            path = os.path.join(directory, uri)
+            return LocationResult(files[path], FullPath(0, path), 0) if path in files else None
+        for lazy in (False, True):
+            cache = TemplateCache()
+            for _ in range(3):
+                output = pl.PLParser(files['/ex.pl'], FullPath(0, '/ex.pl'), 0, get_location, check_mandatory_keys=False, lazy=lazy,
+                                     layered=True, template_cache=cache).parse()
+                self.assertEqual({'l': [1, 2], 'd': {'l': [3], 'm': {'n': [4]}}}, output.data)
+                # Mutable values of layered outputs are copied from the cached outputs when read
+                output.data['l'].append(0)
+                output.data['d']['l'].append(0)
+                output.data['d']['m']['n'].append(0)
+                self.assertEqual({'l': [1, 2, 0], 'd': {'l': [3, 0], 'm': {'n': [4, 0]}}}, output.data)
+            self.assertEqual(2, cache.hits)
+
+
+    def test_prefetch(self):
+        path = os.path.join(self.dir, 'full.pl')
+        with open(path, 'rb') as file: contents = file.read()
+        expected = pl.PLParser(contents, FullPath(0, path), 0, base_get_location, check_mandatory_keys=False).parse()
+        threads = set()
+        def get_location(*args):
+            threads.add(threading.current_thread())
+            return base_get_location(*args)
+        with ThreadPoolExecutor(4) as executor:
+            output = pl.PLParser(contents, FullPath(0, path), 0, get_location, check_mandatory_keys=False,
+                                 prefetch_executor=executor).parse()
+            self.assertEqual(expected, output)
+            self.assertNotIn(threading.current_thread(), threads)
+
+            contents = b'a=1\n\nb==\nc=@~/__\n==\nc=@~/__\n'
+            with self.assertRaises(exceptions.ParserFileNotFound) as context:
+                pl.PLParser(contents, FullPath(0, 'missing.pl'), 0, base_get_location, check_mandatory_keys=False,
+                            prefetch_executor=executor).parse()
+            self.assertEqual(6, context.exception.line_number)
+
+
+    def test_parse_async(self):
+        async def get_location(*args):
+            await asyncio.sleep(0)
+            return base_get_location(*args)
+        path = os.path.join(self.dir, 'full.pl')
+        with open(path, 'rb') as file: contents = file.read()
+        expected = pl.PLParser(contents, FullPath(0, path), 0, base_get_location, check_mandatory_keys=False).parse()
+        output = asyncio.run(async_parse_file(contents, FullPath(0, path), 0, get_location, check_mandatory_keys=False))
+        self.assertEqual(expected, output)
+
+        path = os.path.join(self.dir, 'extend_loop_1.pl')
+        with open(path, 'rb') as file: contents = file.read()
+        with self.assertRaises(exceptions.ParserInheritanceLoopError):
+            asyncio.run(async_parse_file(contents, FullPath(0, path), 0, get_location, check_mandatory_keys=False))
+        with self.assertRaises(exceptions.ParserFileNotFound) as context:
+            asyncio.run(async_parse_file(b'a=1\nb=@~/__', FullPath(0, path), 0, get_location, check_mandatory_keys=False))
+        self.assertEqual(2, context.exception.line_number)
+
+
+    def test_parse_async_evicted(self):
+        class EvictingCache(TemplateCache):
+            """Template cache whose entries are evicted (as by a concurrent parse) right after being found"""
+            def __contains__(self, key):
+                found = super().__contains__(key)
+                self.clear()
+                return found
+        class EvictingGetCache(TemplateCache):
+            """Template cache whose entries are evicted right after being taken"""
+            def get(self, key, get_location=None):
+                value = super().get(key, get_location)
+                self.clear()
+                return value
+        async def get_location(*args):
+            return base_get_location(*args)
+        path = os.path.join(self.dir, 'extend.pl')
+        with open(path, 'rb') as file: contents = file.read()
+        expected = pl.PLParser(contents, FullPath(0, path), 0, base_get_location, check_mandatory_keys=False).parse()
+        for cache in (EvictingCache(), EvictingGetCache()):
+            for _ in range(2):
+                output = asyncio.run(async_parse_file(contents, FullPath(0, path), 0, get_location, check_mandatory_keys=False,
+                                                      template_cache=cache))
+                self.assertEqual(expected, output)
+
+
+    def test_parse_stream(self):
+        for name in ('full.pl', 'working.pl', 'multiline_eval.pl'):
+            path = os.path.join(self.dir, name)
+            with open(path, 'rb') as file: contents = file.read()
+            expected = pl.PLParser(contents, FullPath(0, path), 0, base_get_location, check_mandatory_keys=False).parse()
+            for size in (1, 7, 4096):
+                chunks = (contents[i:i + size] for i in range(0, len(contents), size))
+                output = parse_file_stream(chunks, FullPath(0, path), 0, base_get_location, check_mandatory_keys=False)
+                self.assertEqual(expected, output)
+            with open(path, 'rb') as file:
+                self.assertEqual(expected, parse_file_stream(file, FullPath(0, path), 0, base_get_location, check_mandatory_keys=False))
+
+        parser = pl.PLParser(None, FullPath(0, 'stream.pl'), 0, base_get_location, check_mandatory_keys=False, lazy=True)
+        events = list(parser.iter_stream([b'a=1\nb.c=[1', b', 2]\n# comment\nd==\ntext\n==\na=2\n']))
+        self.assertEqual(events, [('a', 1), ('b.c', [1, 2]), ('d', 'text'), ('a', 2)])
+        self.assertEqual(parser.finish().data, {'a': 2, 'b': {'c': [1, 2]}, 'd': 'text'})
+
+        with self.assertRaises(exceptions.ParserInvalidFile):
+            parse_file_stream([b'a=1\n', b'b=\xff\n'], FullPath(0, 'stream.pl'), 0, base_get_location, check_mandatory_keys=False)
+        with self.assertRaises(exceptions.ParserSyntaxError) as context:
+            parse_file_stream([b'a=1\nb==\nc'], FullPath(0, 'stream.pl'), 0, base_get_location, check_mandatory_keys=False)
+        self.assertEqual(4, context.exception.line_number)
+
+
+    def test_validate(self):
+        path = os.path.join(self.dir, 'full.pl')
+        with open(path, 'rb') as file: contents = file.read()
+        self.assertEqual([], pl.PLParser(contents, FullPath(0, path), 0, None, check_mandatory_keys=False).validate())
+        errors = pl.PLParser(b'a=1\nb\na.b=2\nc+x\nd=:Unknown\ne==\n', FullPath(0, 'a.pl'), 0, None).validate()
+        self.assertEqual([(type(e), getattr(e, 'line_number', None)) for e in errors],
+                         [(exceptions.ParserSyntaxError, 2), (exceptions.ParserSemanticError, 3), (exceptions.ParserSemanticError, 4),
+                          (exceptions.ParserComponentNotFound, 5), (exceptions.ParserSyntaxError, 8)]
+                         + [(exceptions.ParserMissingKey, None)] * len(pl.MANDATORY_KEYS))
+        self.assertEqual([], pl.PLParser(b'extends=x.pl\na.b+1\n', FullPath(0, 'a.pl'), 0, None).validate())
+
+        # Files without references nor invalid JSON: validate finds no error before the one raised by parse, and finds
+        # the same error at its line (values that may be dictionaries are not known, errors after them can be missed)
+        rand = random.Random(0)
+        keys = ['a', 'a.b', 'a.b.c', 'b', 'b.', 'c.a']
+        values = ['1', '"x"', '[1]', '{"b": {"c": 1}}', '{"c": 2}']
+        for _ in range(500):
+            lines = []
+            for _ in range(rand.randrange(1, 6)):
+                key, value = rand.choice(keys), rand.choice(values)
+                lines.append(rand.choice([f'{key}={value}', f'{key}+{value}', f'{key}%{value}', f'{key}=:CodeEditor',
+                                          f'{key}==\n{value}\n==', f'{key}-=\n{value}\n=='] * 5 + [f'{key}-=\n{value}', f'{key} {value}']))
+            contents = '\n'.join(lines).encode()
+            errors = pl.PLParser(contents, FullPath(0, 'a.pl'), 0, None, check_mandatory_keys=False).validate()
+            try:
+                pl.PLParser(contents, FullPath(0, 'a.pl'), 0, None, check_mandatory_keys=False).parse()
+                self.assertEqual([], errors, contents)
+            except exceptions.ParserExceptionLine as e:
+                if errors:
+                    self.assertGreaterEqual(errors[0].line_number, e.line_number, contents)
+                    if errors[0].line_number == e.line_number:
+                        self.assertEqual(type(e), type(errors[0]), contents)
+            except TypeError:
+                pass # Appending to a dictionary
+
+
+    def test_lazy(self):
+        for filename in ('full.pl', 'multiline_eval.pl', 'json_from_file.pl'):
+            path = os.path.join(self.dir, filename)
+            with open(path, 'rb') as file: contents = file.read()
+            expected = pl.PLParser(contents, FullPath(0, path), 0, base_get_location, check_mandatory_keys=False).parse()
+            output = pl.PLParser(contents, FullPath(0, path), 0, base_get_location, check_mandatory_keys=False, lazy=True).parse()
+            self.assertEqual(expected, output)
+        # Overwritten values are never evaluated
+        contents = b'a%{a:a}\na=1\nb%{"c": 1}\nb.d=2'
+        with self.assertRaises(exceptions.ParserSyntaxError):
+            pl.PLParser(contents, FullPath(0, 'lazy.pl'), 0, base_get_location, check_mandatory_keys=False).parse()
+        output = pl.PLParser(contents, FullPath(0, 'lazy.pl'), 0, base_get_location, check_mandatory_keys=False, lazy=True).parse()
+        self.assertEqual({'a': 1, 'b': {'c': 1, 'd': 2}}, output.data)
+        with self.assertRaises(exceptions.ParserSyntaxError) as context:
+            pl.PLParser(b'a=1\nb%{a:a}', FullPath(0, 'lazy.pl'), 0, base_get_location, check_mandatory_keys=False, lazy=True).parse()
+        self.assertEqual(2, context.exception.line_number)
+
+        # Templates cached by lazy parses are not handed to eager parses, and the other way around
+        path = os.path.join(self.dir, 'extend.pl')
+        with open(path, 'rb') as file: contents = file.read()
+        expected = pl.PLParser(contents, FullPath(0, path), 0, base_get_location, check_mandatory_keys=False).parse()
+        cache = TemplateCache()
+        for lazy in (True, False, True):
+            output = pl.PLParser(contents, FullPath(0, path), 0, base_get_location, check_mandatory_keys=False, lazy=lazy,
+                                 template_cache=cache).parse()
+            self.assertEqual(expected, output)
+        self.assertEqual(1, cache.hits)
+
+
+    def test_lazy_inheritance(self):
+        """Lazy and eager parses of random files extending each other give the same outputs"""
+        rand = random.Random(0)
+        values = ['1', '"x"', '[1, 2]', '{"a": 1}', '{"b": {"c": 2}}']
+        files = {}
+        def get_location(uri, directory, resource_id, circle_id):
+            path = os.path.join(directory, uri)
+            return LocationResult(files[path], FullPath(0, path), 0) if path in files else None
+        def parse(path, **options):
+            try:
+                return pl.PLParser(files[path], FullPath(0, path), 0, get_location, check_mandatory_keys=False, **options).parse().data
+            except exceptions.ParserException as e:
+                return type(e)
+        for i in range(200):
+            lines = []
+            for _ in range(rand.randrange(1, 8)):
+                if i and rand.random() < 0.3:
+                    lines.append(f'extends={rand.randrange(max(0, i - 10), i)}.pl')
+                else:
+                    key = '.'.join(rand.choice('abc') for _ in range(rand.randrange(1, 3)))
+                    lines.append(f'{key}{rand.choice("=%")}{rand.choice(values)}')
+            path = f'/{i}.pl'
+            files[path] = '\n'.join(lines).encode()
+            expected = parse(path)
+            for options in ({'lazy': True}, {'layered': True}, {'lazy': True, 'layered': True}):
+                self.assertEqual(expected, parse(path, **options), (files[path], options))
+
+
     def test_json_from_file(self):
         path = os.path.join(self.dir, 'json_from_file.pl')
         with open(path, 'rb') as file:
@@ -107,6 +372,47 @@ class TestPLParser(unittest.TestCase):
             pl.PLParser(contents, FullPath(0, path), 0, base_get_location, check_mandatory_keys=False).parse()
 
 
+    def test_classify_line(self):
+        # Kinds must be the same as the ones given by trying every pattern in precedence order
+        patterns = [('extends', pl.EXTENDS_LINE), ('from_file', pl.FROM_FILE_LINE), ('url', pl.URL_LINE),
+                    ('component', pl.COMPONENT_LINE), ('dependency', pl.DEPENDENCY_FILE_LINE),
+                    ('comment', pl.COMMENT_LINE), ('one_line', pl.ONE_LINE), ('multi_line', pl.MULTI_LINE),
+                    ('empty', pl.EMPTY_LINE)]
+        lines = ['extends==', 'extends=@a.pl', 'template = a.pl # c', 'extends.a=1', 'a= =b', 'a= ', 'a=', 'a =$ b c',
+                 'a=:b', 'a =: Input', 'a+=@b', 'a+=', 'a+ =b', 'a-@b', 'a%@b', 'a%=', 'a%{"a": 1}', '@ a.pl [b]',
+                 '@', '  # c', '   ', '', '  a=1', '==', '1=a', 'a.b.c = 1 # c', 'a\t=\tb', 'a ==# c', 'a=$b']
+        for filename in os.listdir(self.dir):
+            if filename.endswith('.pl'):
+                with open(os.path.join(self.dir, filename)) as file:
+                    lines.extend(file.read().split('\n'))
+        for line in lines:
+            expected = next((kind for kind, pattern in patterns if pattern.match(line)), None)
+            kind, match = pl.classify_line(line)
+            self.assertEqual(expected, kind, line)
+            if kind is not None:
+                self.assertEqual(dict(patterns)[kind].match(line).groupdict(), match.groupdict())
+
+
+    def test_generated_corpus(self):
+        spec = CorpusSpec(seed=3, lines=50, depth=3, fanout=2, payload_size=100)
+        corpus = generate_corpus(spec)
+        self.assertEqual(corpus.files, generate_corpus(spec).files)
+        self.assertEqual((7, 8), (len(corpus.templates), len(corpus.exercises)))
+        root = corpus.templates[0]
+        root = pl.PLParser(corpus.files[root], FullPath(0, root), 0, corpus.get_location, check_mandatory_keys=False).parse()
+        for path in corpus.exercises:
+            output = pl.PLParser(corpus.files[path], FullPath(0, path), 0, corpus.get_location, check_mandatory_keys=False).parse()
+            self.assertLessEqual(root.data.keys(), output.data.keys())
+
+
+    def test_pathological_lines(self):
+        # Hostile lines must be classified in linear time: 10k characters in well under 50ms
+        for line in pathological_lines(10_000):
+            start = time.perf_counter()
+            pl.classify_line(line)
+            self.assertLess(time.perf_counter() - start, 0.05, repr(line[:20]))
+
+
     def test_parse_errors(self):
         with self.assertRaises(exceptions.ParserSemanticError):
             path = os.path.join(self.dir, "no_string_in_sub_key.pl")
@@ -169,6 +475,58 @@ class TestPLParser(unittest.TestCase):
             pl.PLParser(contents, FullPath(0, path), 0, 
                 base_get_location, check_mandatory_keys=False).parse()
 
+    def test_collect_comments_warnings(self):
+        path = os.path.join(self.dir, 'full.pl')
+        with open(path, 'rb') as file: contents = file.read()
+        output = pl.PLParser(contents, FullPath(0, path), 0, base_get_location, check_mandatory_keys=False).parse()
+        self.assertTrue(output.comments and output.warnings)
+        warning = next(w for w in output.warnings if w.key == 'e.f.h')
+        self.assertEqual(('overwrite', FullPath(0, path)), (warning.code, warning.path))
+        self.assertEqual(contents.decode().split('\n')[warning.line - 1].split('=')[0].strip(), 'e.f.h')
+        bare = pl.PLParser(contents, FullPath(0, path), 0, base_get_location, check_mandatory_keys=False,
+                           collect_comments=False, collect_warnings=False).parse()
+        self.assertEqual(([], []), (bare.comments, bare.warnings))
+        self.assertEqual(output.data, bare.data)
+
+        contents = b'a = 1\nb % {"c": [1, 2]}\n' + b'a = 2\nb = 3\n' * 5
+        output = pl.PLParser(contents, FullPath(0, 'a.pl'), 0, base_get_location, check_mandatory_keys=False, max_warnings=3).parse()
+        self.assertEqual([None, 1, None], [w.size for w in output.warnings[:3]])
+        self.assertEqual(('limit', 7), (output.warnings[3].code, output.warnings[3].size))
+        self.assertEqual('7 more warnings were left out', str(output.warnings[-1]))
+
+    def test_plan_cache(self):
+        def parse(contents, path, **options):
+            try:
+                return pl.PLParser(contents, FullPath(0, path), 0, base_get_location, check_mandatory_keys=False, **options).parse()
+            except exceptions.ParserException as e:
+                return (type(e), str(e))
+
+        plan_cache = PlanCache()
+        for filename in ('full.pl', 'extend.pl', 'syntax_error.pl', 'open_multiline.pl', 'multiline_eval.pl'):
+            path = os.path.join(self.dir, filename)
+            with open(path, 'rb') as file: contents = file.read()
+            expected = parse(contents, path)
+            self.assertEqual(expected, parse(contents, path, plan_cache=plan_cache))
+            # Second parse with the cached plans of the file and of the files it extends
+            self.assertEqual(expected, parse(contents, path, plan_cache=plan_cache))
+        self.assertGreater(plan_cache.hits, 5)
+        # Plans are shared by files with the same contents
+        contents = b'a.b = 1\nc ==\nx\n==\n'
+        parse(contents, 'b.pl', plan_cache=plan_cache)
+        hits = plan_cache.hits
+        self.assertEqual(parse(contents, 'a.pl'), parse(contents, 'a.pl', plan_cache=plan_cache))
+        self.assertEqual(hits + 1, plan_cache.hits)
+
+    def test_registry(self):
+        registry = ParserRegistry({'pl': 'platonparser.parsers.pl', 'plx': 'platonparser.parsers.pl:get_parser',
+                                   'missing': 'platonparser.parsers.missing'}, group='platonparser.tests.none')
+        self.assertIs(pl.PLParser, registry.get('pl').parser)
+        self.assertIs(pl.PLParser, registry.get('plx').parser)
+        with self.assertLogs('platonparser.parser.parser', 'ERROR'):
+            self.assertIsNone(registry.get('missing'))
+        self.assertIsNone(registry.get('unknown'))
+        self.assertEqual({}, registry.entry_points)
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,102 @@
+import os
+import asyncio
+import tempfile
+import threading
+import unittest
+
+import platonparser.parser.parser_exceptions as exceptions
+from platonparser.parser.utils import base_get_location, FullPath
+from platonparser.parser.cache import TemplateCache
+from platonparser.parser.depindex import DependencyIndex
+from platonparser.parser.parser import parse_file, async_parse_file, parse_file_stream
+from platonparser.parsers.pl import PLParser
+from platonparser.parsers.pltp import PLTPParser, PLTPOutput
+
+
+class TestPLTPParser(unittest.TestCase):
+    dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_pl')
+
+    def read(self, name):
+        path = os.path.join(self.dir, name)
+        with open(path, 'rb') as f:
+            return f.read(), FullPath(0, path)
+
+
+    def test_parse(self):
+        contents, path = self.read('working.pltp')
+        output = parse_file(contents, path, 0, base_get_location, check_mandatory_keys=False)
+        self.assertIsInstance(output, PLTPOutput)
+        self.assertEqual(output.data, {'title': 'Random pltp', 'introduction': 'Des tests'})
+        location = base_get_location('working.pl', self.dir, 0, 0)
+        expected = PLParser(location.file, location.path, location.circle_id, base_get_location,
+                            check_mandatory_keys=False).parse()
+        self.assertEqual(output.exercises, [expected])
+        self.assertEqual(PLTPOutput.from_bytes(output.to_bytes()), output)
+        self.assertEqual(parse_file_stream([contents], path, 0, base_get_location, check_mandatory_keys=False), output)
+
+
+    def test_exercises(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'template.pl'), 'w') as f:
+                f.write('title=Template\ntext==\nShared\n==\n')
+            lines = ['title=Activity', 'introduction=Intro']
+            for i in range(20):
+                with open(os.path.join(directory, f'exercise{i}.pl'), 'w') as f:
+                    f.write(f'extends=template.pl\nnumber={i}\n')
+                lines.append(f'@ exercise{i}.pl')
+            contents = '\n'.join(lines).encode()
+            path = FullPath(0, os.path.join(directory, 'activity.pltp'))
+            cache = TemplateCache()
+            output = PLTPParser(contents, path, 0, base_get_location, check_mandatory_keys=False, template_cache=cache,
+                                max_workers=4).parse()
+            self.assertEqual([exercise.data['number'] for exercise in output.exercises], list(range(20)))
+            self.assertTrue(all(exercise.data['text'] == 'Shared' for exercise in output.exercises))
+            self.assertEqual(len(cache), 1)
+            self.assertEqual(cache.misses, 1)
+
+            async def get_location(*args):
+                return base_get_location(*args)
+            self.assertEqual(asyncio.run(async_parse_file(contents, path, 0, get_location, check_mandatory_keys=False)), output)
+            self.assertEqual(PLTPParser(contents, path, 0, base_get_location, check_mandatory_keys=False, processes=True,
+                                        max_workers=2).parse(), output)
+
+            with open(os.path.join(directory, 'exercise7.pl'), 'w') as f:
+                f.write('extends=template.pl\nnumber\n')
+            with self.assertRaises(exceptions.ParserSyntaxError) as context:
+                PLTPParser(contents, path, 0, base_get_location, check_mandatory_keys=False).parse()
+            self.assertIn('exercise7.pl', str(context.exception))
+            with self.assertRaises(exceptions.ParserSyntaxError) as context:
+                PLTPParser(contents, path, 0, base_get_location, check_mandatory_keys=False, processes=True, max_workers=2).parse()
+            self.assertIn('exercise7.pl', str(context.exception))
+
+
+    def test_serial_exercises(self):
+        contents, path = self.read('working.pltp')
+        threads = set()
+        def get_location(uri, *args):
+            if uri == 'utils/sandboxio.py': # Referenced by the exercise
+                threads.add(threading.current_thread())
+            return base_get_location(uri, *args)
+        expected = parse_file(contents, path, 0, base_get_location, check_mandatory_keys=False)
+        for options in ({'lazy': True}, {'dependency_index': DependencyIndex()}, {}):
+            threads.clear()
+            parser = PLTPParser(contents, path, 0, get_location, check_mandatory_keys=False, **options)
+            self.assertEqual(not options, parser.concurrent_exercises)
+            self.assertEqual(expected, parser.parse())
+            self.assertEqual(not options, threading.current_thread() not in threads)
+
+
+    def test_errors(self):
+        contents, path = self.read('missing_pl.pltp')
+        with self.assertRaises(exceptions.ParserFileNotFound):
+            parse_file(contents, path, 0, base_get_location, check_mandatory_keys=False)
+        contents, path = self.read('test_missing_key.pltp')
+        with self.assertRaises(exceptions.ParserSyntaxError):
+            parse_file(contents, path, 0, base_get_location)
+        with self.assertRaises(exceptions.ParserMissingKey):
+            parse_file(b'title=Activity\n', FullPath(0, os.path.join(self.dir, 'activity.pltp')), 0, base_get_location)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
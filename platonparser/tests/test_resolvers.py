@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import weakref
+
+import unittest
+
+import platonparser.parsers.pl as pl
+import platonparser.parser.parser_exceptions as exceptions
+from platonparser.parser.resolvers import BatchResolver, MappedFileResolver, SQLiteResolver
+from platonparser.parser.utils import base_get_location, FullPath
+
+class TestResolvers(unittest.TestCase):
+    def setUp(self):
+        self.dir = 'fake_pl/'
+        self.resolver = SQLiteResolver()
+        self.resolver.add_tree(self.dir, 0)
+
+    def test_sqlite_batch(self):
+        path = os.path.join(self.dir, 'full.pl')
+        with open(path, 'rb') as file: contents = file.read()
+        expected = pl.PLParser(contents, FullPath(0, path), 0, base_get_location, check_mandatory_keys=False).parse()
+        output = pl.PLParser(contents, FullPath(0, '/full.pl'), 0, self.resolver, check_mandatory_keys=False).parse()
+        self.assertEqual(expected.data, output.data)
+        self.assertIn((FullPath(0, '/builder/before.py'), 'builder.py'), output.dependencies)
+        # Every URI of full.pl in one query, none for fake.pl
+        self.assertEqual(1, self.resolver.queries)
+
+    def test_single_uri_fallback(self):
+        get_location = BatchResolver(self.resolver.get_locations)
+        self.assertEqual(FullPath(0, '/utils/sandboxio.py'), get_location('../utils/sandboxio.py', '/grader', 0, 0).path)
+        self.assertIsNone(get_location('lib:utils/sandboxio.py', '/', 0, 0))
+        with self.assertRaises(exceptions.ParserFileNotFound):
+            pl.PLParser(b'a=@missing.pl', FullPath(0, '/a.pl'), 0, get_location, check_mandatory_keys=False).parse()
+
+    def test_mapped_files(self):
+        resolver = MappedFileResolver(min_size=0)
+        path = os.path.join(self.dir, 'full.pl')
+        with open(path, 'rb') as file: contents = file.read()
+        expected = pl.PLParser(contents, FullPath(0, path), 0, base_get_location, check_mandatory_keys=False).parse()
+        output = pl.PLParser(contents, FullPath(0, path), 0, resolver, check_mandatory_keys=False).parse()
+        self.assertEqual(expected, output)
+        self.assertIsInstance(resolver('working.pl', self.dir, 0, 0).file, memoryview)
+        # working.pl and fake.pl are referenced more than once
+        self.assertEqual(5, resolver.misses)
+        self.assertGreater(resolver.hits, 3)
+        self.assertIsNone(resolver('grader', self.dir, 0, 0))
+        self.assertIsInstance(MappedFileResolver()('working.pl', self.dir, 0, 0).file, bytes) # Smaller than min_size
+
+        tmp = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(tmp, 'a.pl'), 'wb') as file: file.write(b'')
+            self.assertEqual(b'', resolver('a.pl', tmp, 0, 0).file)
+            with open(os.path.join(tmp, 'a.pl'), 'wb') as file: file.write(b'a=1')
+            self.assertEqual(b'a=1', resolver('a.pl', tmp, 0, 0).file)
+
+            # Contents of evicted results can still be read, they are unmapped once unused
+            resolver = MappedFileResolver(maxsize=2, min_size=0)
+            results = []
+            for i in range(5):
+                with open(os.path.join(tmp, f'{i}.pl'), 'wb') as file: file.write(b'a=%d' % i)
+                results.append(resolver(f'{i}.pl', tmp, 0, 0))
+            mappings = [weakref.ref(result.file.obj) for result in results]
+            self.assertEqual(2, len(resolver.results))
+            self.assertEqual([b'a=%d' % i for i in range(5)], [bytes(result.file) for result in results])
+            del results
+            self.assertEqual([True, True, True, False, False], [mapping() is None for mapping in mappings])
+            self.assertEqual(b'a=0', resolver('0.pl', tmp, 0, 0).file)
+
+            # In lazy mode, loaded files are decoded when their value is evaluated
+            with open(os.path.join(tmp, 'invalid.txt'), 'wb') as file: file.write(b'\xff' * 10)
+            contents = b'a=@invalid.txt\nb=@0.pl\na=1\n'
+            with self.assertRaises(exceptions.ParserInvalidFileLine):
+                pl.PLParser(contents, FullPath(0, os.path.join(tmp, 'lazy.pl')), 0, resolver, check_mandatory_keys=False).parse()
+            output = pl.PLParser(contents, FullPath(0, os.path.join(tmp, 'lazy.pl')), 0, resolver, check_mandatory_keys=False,
+                                 lazy=True).parse()
+            self.assertEqual({'a': 1, 'b': 'a=0'}, output.data)
+            with self.assertRaises(exceptions.ParserInvalidFileLine) as context:
+                pl.PLParser(b'a=1\nb=@invalid.txt\n', FullPath(0, os.path.join(tmp, 'lazy.pl')), 0, resolver,
+                            check_mandatory_keys=False, lazy=True).parse()
+            self.assertEqual(2, context.exception.line_number)
+        finally:
+            shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    unittest.main()
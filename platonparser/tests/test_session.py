@@ -0,0 +1,74 @@
+import os
+import random
+
+import unittest
+
+import platonparser.parsers.pl as pl
+from platonparser.parser.session import PLSession
+from platonparser.parser.utils import base_get_location, FullPath
+
+# Lines inserted by the edits, followed by a newline
+LINES = ['x', 'title = other', 'title2 - A', 'e.f.g = 5', 'e.f = 5', '# comment', 'a.c%{"d": 1}', '@ utils/sandboxio.py',
+         'extends=fake.pl', 'text+=\nmore\n==', 'url=$image.png', 'c =: CodeEditor', 'zzz=overridden', 'test+@working.pl', '']
+
+
+class TestPLSession(unittest.TestCase):
+    def setUp(self):
+        self.dir = 'fake_pl/'
+
+    def parse(self, contents: str, path: FullPath):
+        """Output of a full parse, or the exception raised"""
+        try:
+            return pl.PLParser(contents.encode(), path, 0, base_get_location, check_mandatory_keys=False).parse()
+        except Exception as e:
+            return e
+
+    def test_edits(self):
+        path = os.path.join(self.dir, 'full.pl')
+        with open(path, 'rb') as file: contents = file.read()
+        fullpath = FullPath(0, path)
+        session = PLSession(contents, fullpath, 0, base_get_location, check_mandatory_keys=False)
+        self.assertEqual(self.parse(contents.decode(), fullpath), session.parse())
+        rand = random.Random(0)
+        for _ in range(500):
+            line = rand.randrange(len(session.lines))
+            choice = rand.random()
+            try:
+                if choice < 0.3:
+                    output = session.edit(line, 0, line, 0, rand.choice(LINES) + '\n')
+                elif choice < 0.6:
+                    output = session.edit(line, 0, line, len(session.lines[line]), rand.choice(LINES))
+                elif choice < 0.8 and line + 1 < len(session.lines):
+                    output = session.edit(line, 0, line + 1, 0, '')
+                else:
+                    column = rand.randrange(len(session.lines[line]) + 1)
+                    output = session.edit(line, column, line, column, rand.choice(('1', '=', '\n', '==')))
+            except Exception as e:
+                output = e
+            expected = self.parse(session.text, fullpath)
+            if isinstance(expected, Exception):
+                self.assertIs(type(expected), type(output))
+                self.assertEqual(str(expected), str(output))
+                # Back to the original contents
+                session.edit(0, 0, len(session.lines) - 1, len(session.lines[-1]), contents.decode())
+            else:
+                self.assertEqual(expected, output)
+                self.assertEqual(list(expected.data), list(output.data))
+
+
+    def test_origin(self):
+        path = os.path.join(self.dir, 'full.pl')
+        with open(path, 'rb') as file: contents = file.read()
+        session = PLSession(contents, FullPath(0, path), 0, base_get_location, check_mandatory_keys=False)
+        session.parse()
+        self.assertEqual((FullPath(0, path), 54), session.origin('e.f.h'))
+        self.assertEqual((FullPath(0, path), 57), session.origin('a'))
+        self.assertEqual(base_get_location('fake.pl', self.dir, 0, 0).path, session.origin('zzz')[0])
+        self.assertIsNone(session.origin('unknown'))
+        session.edit(53, 0, 53, 9, '')
+        self.assertEqual((FullPath(0, path), 50), session.origin('e.f.h'))
+        self.assertEqual(2, session.output.data['e']['f']['h'])
+
+
+if __name__ == '__main__':
+    unittest.main()
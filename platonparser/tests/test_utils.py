@@ -0,0 +1,129 @@
+import random
+from copy import deepcopy
+
+import unittest
+
+from platonparser.parser.parser import parse_file
+from platonparser.parser.utils import FullPath, LayeredDict, ParserOutput, base_get_location, iter_lines, recursive_update
+from platonparser.parsers.pl import get_namespace
+
+KEYS = ['a', 'b', 'c']
+VALUES = [1, 'x', [1, 2], {'a': 1}, {'b': {'c': 2}}]
+
+
+def random_data(rand: random.Random, depth: int = 0) -> dict:
+    data = {}
+    for key in rand.sample(KEYS, rand.randrange(len(KEYS) + 1)):
+        data[key] = random_data(rand, depth + 1) if depth < 2 and rand.random() < 0.5 else deepcopy(rand.choice(VALUES))
+    return data
+
+
+def random_write(rand: random.Random, expected: dict, layered: dict) -> bool:
+    """Writes the same random value, or deletes the same key, in both dictionaries. Returns True if a key was deleted"""
+    keys = [rand.choice(KEYS) for _ in range(rand.randrange(1, 4))]
+    value = deepcopy(rand.choice(VALUES))
+    operation = rand.random()
+    deleted = False
+    for data in (expected, layered):
+        try:
+            namespace, key = get_namespace(data, keys)
+        except TypeError:
+            continue
+        if operation < 0.2 and key in namespace:
+            del namespace[key]
+            deleted = True
+        elif operation < 0.4 and type(namespace.get(key)) is list:
+            namespace[key] = namespace[key] + [0]
+        else:
+            namespace[key] = deepcopy(value)
+    return deleted
+
+
+class TestLayeredDict(unittest.TestCase):
+    def assertLayered(self, expected: dict, layered: dict, deleted: bool):
+        flattened = layered.flatten() if type(layered) is LayeredDict else layered
+        self.assertEqual(expected, flattened)
+        self.assertEqual(expected, layered)
+        if not deleted:
+            self.assertEqual(repr(expected), repr(flattened))
+            self.assertEqual(list(expected), list(layered))
+
+    def test_overlay(self):
+        """Writes and overlays give the same data as writes and merges with recursive_update"""
+        rand = random.Random(0)
+        for _ in range(300):
+            expected, layered = {}, {}
+            layers = []
+            deleted = False
+            for _ in range(rand.randrange(1, 8)):
+                if rand.random() < 0.3:
+                    upper = random_data(rand)
+                    layers.append(deepcopy(upper))
+                    recursive_update(expected, deepcopy(upper))
+                    layered = LayeredDict.overlay(layered, upper)
+                else:
+                    deleted = random_write(rand, expected, layered) or deleted
+            self.assertLayered(expected, layered, deleted)
+            # Layers are never modified
+            self.assertEqual([deepcopy(layer) for layer in layers], layers)
+
+    def test_inheritance_chains(self):
+        """Files written and laid over each other like files extending templates, themselves extending templates, give
+        the same data as files merged with recursive_update"""
+        rand = random.Random(0)
+        files = []
+        for _ in range(300):
+            expected, layered = {}, {}
+            deleted = False
+            depth = 0
+            templates = [file for file in files if file[3] < 4]
+            for _ in range(rand.randrange(1, 10)):
+                if templates and rand.random() < 0.2:
+                    template_expected, template_layered, template_deleted, template_depth = rand.choice(templates)
+                    recursive_update(expected, deepcopy(template_expected))
+                    layered = LayeredDict.overlay(layered, template_layered)
+                    deleted = deleted or template_deleted
+                    depth = max(depth, template_depth + 1)
+                else:
+                    deleted = random_write(rand, expected, layered) or deleted
+            self.assertLayered(expected, layered, deleted)
+            files.append((deepcopy(expected), layered, deleted, depth))
+        # Templates are never modified by the files laid over them
+        for expected, layered, deleted, _ in files:
+            self.assertLayered(expected, layered, deleted)
+
+
+class TestIterLines(unittest.TestCase):
+    def test_chunks(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            text = ''.join(rng.choice('ab\né€😀 ') for _ in range(rng.randrange(50)))
+            data = text.encode()
+            cuts = sorted(rng.randrange(len(data) + 1) for _ in range(rng.randrange(5)))
+            chunks = [data[i:j] for i, j in zip([0] + cuts, cuts + [len(data)])]
+            self.assertEqual(list(iter_lines(chunks)), text.split('\n'))
+        with self.assertRaises(UnicodeDecodeError):
+            list(iter_lines([b'a\n\xc3']))
+
+
+class TestParserOutput(unittest.TestCase):
+    def test_bytes(self):
+        path = 'fake_pl/full.pl'
+        with open(path, 'rb') as file: contents = file.read()
+        expected = parse_file(contents, FullPath(0, path), 0, base_get_location, check_mandatory_keys=False)
+        for options in ({}, {'layered': True, 'lazy': True}):
+            output = parse_file(contents, FullPath(0, path), 0, base_get_location, check_mandatory_keys=False, **options)
+            decoded = ParserOutput.from_bytes(output.to_bytes())
+            self.assertEqual(expected, decoded)
+            self.assertIs(FullPath, type(decoded.path))
+            self.assertTrue(all(type(path) is FullPath for path, _ in decoded.dependencies))
+        output = ParserOutput(FullPath(0, 'a.pl'), 0, 'pl', data={'a': ({1, 2}, [b'x', 1.5, None])})
+        self.assertEqual(output, ParserOutput.from_bytes(output.to_bytes()))
+        with self.assertRaises(ValueError):
+            ParserOutput.from_bytes(b'{}')
+        with self.assertRaises(ValueError):
+            ParserOutput(FullPath(0, 'a.pl'), 0, 'pl', data={'a': object()}).to_bytes()
+
+
+if __name__ == '__main__':
+    unittest.main()
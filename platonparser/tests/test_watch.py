@@ -0,0 +1,90 @@
+import os
+import queue
+import shutil
+import tempfile
+
+import unittest
+
+from platonparser.parser.utils import FullPath
+from platonparser.parser.watch import Observer, Watcher
+
+class TestWatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.dir = os.path.join(self.tmp, 'fake_pl')
+        shutil.copytree('fake_pl/', self.dir)
+        self.watcher = Watcher(self.dir, max_workers=2, interval=0.01, debounce=0.01, use_watchdog=False, check_mandatory_keys=False)
+
+    def tearDown(self):
+        self.watcher.stop()
+        shutil.rmtree(self.tmp)
+
+    def path(self, filename):
+        return os.path.join(self.dir, filename)
+
+    def test_watch(self):
+        events = list(self.watcher.start())
+        filenames = [filename for filename in os.listdir(self.dir) if filename.endswith('.pl')]
+        self.assertEqual(len(filenames), len(events))
+
+        # Changes of a file are parsed again with the files depending on it, changes of other files are ignored
+        with open(self.path('fake.pl'), 'a') as file: file.write('\nzzz=changed\n')
+        with open(self.path('working.pla'), 'a') as file: file.write('\nchanged\n')
+        events = list(self.watcher.update(self.watcher.wait()))
+        self.assertEqual({('parsed', self.path('fake.pl')), ('parsed', self.path('full.pl'))},
+                         {(event.kind, event.result.path.path) for event in events})
+        self.assertEqual('changed', self.watcher.results[FullPath(-1, self.path('full.pl'))].output.data['zzz'])
+
+        with open(self.path('new.pl'), 'w') as file: file.write('extends=fake.pl\n')
+        os.remove(self.path('fake.pl'))
+        events = list(self.watcher.update(self.watcher.wait()))
+        self.assertEqual({('removed', self.path('fake.pl')), ('parsed', self.path('full.pl')), ('parsed', self.path('new.pl'))},
+                         {(event.kind, event.result.path.path) for event in events})
+        self.assertIsNotNone(self.watcher.results[FullPath(-1, self.path('full.pl'))].error)
+
+    def test_directories(self):
+        os.mkdir(self.path('sub'))
+        for name, contents in (('sub/template.pl', 'v=1\n'), ('sub/exercise.pl', 'extends=template.pl\n'),
+                               ('main.pl', 'extends=sub/template.pl\n')):
+            with open(self.path(name), 'w') as file: file.write(contents)
+        list(self.watcher.start())
+        kinds = lambda events: {(event.kind, os.path.relpath(event.result.path.path, self.dir), event.result.error is None)
+                                for event in events}
+        removed = {('removed', 'sub/template.pl', True), ('removed', 'sub/exercise.pl', True), ('parsed', 'main.pl', False)}
+
+        # Watchdog only reports the directories of a move or a deletion, not the files under them
+        os.rename(self.path('sub'), self.path('moved'))
+        events = list(self.watcher.update([self.path('sub'), self.path('moved')]))
+        self.assertEqual(removed | {('parsed', 'moved/template.pl', True), ('parsed', 'moved/exercise.pl', True)}, kinds(events))
+        self.watcher.poll()
+
+        # Polled, the files of a deleted directory are deleted
+        shutil.rmtree(self.path('moved'))
+        self.assertEqual({('removed', 'moved/template.pl', True), ('removed', 'moved/exercise.pl', True)},
+                         kinds(self.watcher.update(self.watcher.wait())))
+
+    @unittest.skipIf(Observer is None, 'watchdog is not installed')
+    def test_queue_handler(self):
+        from watchdog.events import DirDeletedEvent, DirModifiedEvent, DirMovedEvent, FileModifiedEvent
+        from platonparser.parser.watch import _QueueHandler
+        changes = queue.Queue()
+        handler = _QueueHandler(changes)
+        for event in (DirModifiedEvent('/a'), FileModifiedEvent('/a/b.pl'), DirMovedEvent('/a/c', '/d'), DirDeletedEvent('/e')):
+            handler.on_any_event(event)
+        self.assertEqual(['/a/b.pl', '/a/c', '/d', '/e'], [changes.get_nowait() for _ in range(changes.qsize())])
+
+    def test_grandparent_changed(self):
+        directory = os.path.join(self.tmp, 'chain')
+        os.mkdir(directory)
+        for name, contents in (('u.pl', 'v=1\n'), ('t.pl', 'extends=u.pl\n'), ('e.pl', 'extends=t.pl\n')):
+            with open(os.path.join(directory, name), 'w') as file: file.write(contents)
+        watcher = Watcher(directory, max_workers=1, interval=0.01, debounce=0.01, use_watchdog=False, check_mandatory_keys=False)
+        list(watcher.start())
+        for value in (2, 30, 400):
+            with open(os.path.join(directory, 'u.pl'), 'w') as file: file.write(f'v={value}\n')
+            list(watcher.update(watcher.wait()))
+            self.assertEqual(value, watcher.results[FullPath(-1, os.path.join(directory, 'e.pl'))].output.data['v'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,5 @@
 from setuptools import setup, find_packages
 
-setup(name='platonparser', version='1.0', packages=find_packages())
\ No newline at end of file
+setup(name='platonparser', version='1.0', packages=find_packages(),
+      entry_points={'console_scripts': ['platonparser=platonparser.parser.cli:main']},
+      extras_require={'watch': ['watchdog']})